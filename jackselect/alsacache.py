@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""Persistent on-disk cache of the capabilities of ALSA sound cards.
+
+Probing the capabilities of all PCM devices of a sound card is slow, but the
+result is the same as long as the same hardware is attached and the same
+alsa-lib version and kernel drivers are used. The cache stores the probe
+results per card, keyed on the card's identity, i.e. its ALSA card id, the
+vendor, model and serial number reported by udev, the alsa-lib version and
+the kernel release.
+
+"""
+
+import json
+import logging
+import os
+
+from pyudev import Context, DeviceNotFoundError, Devices
+from xdg import BaseDirectory as xdgbase
+
+from .alsainfo import AlsaCard, get_alsa_lib_version
+
+
+log = logging.getLogger(__name__)
+
+CACHE_VERSION = 2
+CACHE_FILE = ("jack-select", "alsainfo.json")
+
+
+class AlsaInfoCache:
+    """Cache of probed ALSA card capabilities stored in a JSON file.
+
+    The cache file is stored under ``<XDG_CACHE_HOME>/jack-select/`` by
+    default. Cache files written by other versions of this class or by
+    another version of alsa-lib are ignored.
+
+    """
+
+    def __init__(self, filename=None):
+        if filename is None:
+            filename = os.path.join(xdgbase.xdg_cache_home, *CACHE_FILE)
+
+        self.filename = filename
+        self.alsa_lib_version = get_alsa_lib_version()
+        self._context = Context()
+        self._entries = {}
+        self._dirty = False
+        self.load()
+
+    def get_identity(self, cardno):
+        """Return identity key for card with given number or None if unknown."""
+        try:
+            device = Devices.from_name(self._context, "sound", "card%i" % cardno)
+            card_id = device.attributes.asstring("id")
+        except (DeviceNotFoundError, KeyError, OSError) as exc:
+            log.debug("Could not determine identity of card #%i: %s", cardno, exc)
+            return None
+
+        props = device.properties
+        return "|".join(
+            (
+                card_id,
+                props.get("ID_VENDOR_ID", ""),
+                props.get("ID_MODEL_ID", ""),
+                props.get("ID_SERIAL", ""),
+                self.alsa_lib_version,
+                os.uname().release,
+            )
+        )
+
+    def get(self, cardno):
+        """Return cached (playback, capture) card info for card with given number.
+
+        Returns None if the card is not in the cache or its identity changed.
+
+        """
+        identity = self.get_identity(cardno)
+        entry = self._entries.get(identity) if identity else None
+
+        if entry:
+            try:
+                return tuple(
+                    AlsaCard.from_dict(entry[stream])._replace(cardno=cardno)
+                    for stream in ("playback", "capture")
+                )
+            except (KeyError, TypeError, ValueError) as exc:
+                log.debug("Invalid cache entry for card #%i: %s", cardno, exc)
+                del self._entries[identity]
+                self._dirty = True
+
+    def put(self, cardno, playback, capture):
+        """Store (playback, capture) card info for card with given number.
+
+        Card info with stale or incompletely probed device records (see
+        ``AlsaDevice.complete``) is not stored, so the card is probed again
+        once it is not busy anymore or the cause of the failure is gone.
+
+        """
+        if not all(dev.complete for card in (playback, capture) for dev in card.devices):
+            log.debug("Not caching incomplete device info for card #%i.", cardno)
+            return
+
+        identity = self.get_identity(cardno)
+
+        if identity:
+            self._entries[identity] = {
+                "playback": playback.to_dict(),
+                "capture": capture.to_dict(),
+            }
+            self._dirty = True
+
+    def load(self):
+        """Load cache entries from cache file, ignoring stale or invalid files."""
+        try:
+            with open(self.filename) as fp:
+                data = json.load(fp)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as exc:
+            log.warning("Could not read ALSA device info cache '%s': %s", self.filename, exc)
+            return
+
+        if (
+            not isinstance(data, dict)
+            or data.get("version") != CACHE_VERSION
+            or data.get("alsa_lib_version") != self.alsa_lib_version
+        ):
+            log.debug("ALSA device info cache '%s' is outdated. Ignoring it.", self.filename)
+            return
+
+        log.debug("Loaded ALSA device info cache from '%s'.", self.filename)
+        self._entries = data.get("cards", {})
+
+    def save(self):
+        """Write cache entries to cache file, if they changed since loading."""
+        if not self._dirty:
+            return
+
+        log.debug("Writing ALSA device info cache to '%s'.", self.filename)
+        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+        tmpfile = self.filename + ".tmp"
+
+        with open(tmpfile, "w") as fp:
+            json.dump(
+                {
+                    "version": CACHE_VERSION,
+                    "alsa_lib_version": self.alsa_lib_version,
+                    "cards": self._entries,
+                },
+                fp,
+            )
+
+        os.replace(tmpfile, self.filename)
+        self._dirty = False
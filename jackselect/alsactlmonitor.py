@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+"""Watch ALSA controls of sound cards for sample rate and clock source changes.
+
+Sound cards with external clocking (word clock, S/PDIF, ADAT) change their
+effective sample rate, or lose sync, without any udev event. Their drivers
+expose the clock source, the external sample rate and the sync status as
+controls, though, and notify value changes of them through the ALSA control
+interface.
+
+``AlsaCtlMonitor`` subscribes to the control events of the watched cards and
+adds the poll descriptors of their control handles to the GLib main loop, so
+changes are reported as soon as the driver signals them, without polling.
+
+"""
+
+import errno
+import logging
+import re
+from ctypes import byref, c_void_p, create_string_buffer
+
+from gi.repository import GLib
+
+from .alsainfo import LibAsoundError, PollFd, check_call, get_backend
+
+
+log = logging.getLogger(__name__)
+
+SND_CTL_NONBLOCK = 1
+SND_CTL_EVENT_ELEM = 0
+SND_CTL_EVENT_MASK_VALUE = 1 << 0
+SND_CTL_EVENT_MASK_REMOVE = 0xFFFFFFFF
+
+SND_CTL_ELEM_TYPE_BOOLEAN = 1
+SND_CTL_ELEM_TYPE_INTEGER = 2
+SND_CTL_ELEM_TYPE_ENUMERATED = 3
+SND_CTL_ELEM_TYPE_INTEGER64 = 6
+
+# Matches names of controls for the sample rate, clock source or clock sync
+# status, e.g. "Sample Clock Source", "External Rate" or "Word Clock Sync"
+CLOCK_CONTROL_PATTERN = r"clock|rate|sync|lock"
+
+
+def is_clock_control(name, pattern=CLOCK_CONTROL_PATTERN):
+    """Return whether control with given name concerns the sample rate or clock."""
+    return bool(re.search(pattern, name, re.I))
+
+
+def is_rate_control(name):
+    """Return whether control with given name reports a sample rate."""
+    return bool(re.search(r"\brate\b", name, re.I))
+
+
+def parse_rate(value):
+    """Return the sample rate in Hz given by a control value or None.
+
+    Integer values are taken as rates in Hz, enumerated item names like
+    ``"48000"``, ``"96kHz"`` or ``"44.1 kHz"`` are parsed. Values below
+    1000 Hz (e.g. 0 for "no external clock") give None.
+
+    """
+    if isinstance(value, bool) or value is None:
+        return None
+    elif isinstance(value, int):
+        rate = value
+    else:
+        match = re.match(r"\s*(\d+(?:\.\d+)?)\s*(k?)(?:hz)?\s*$", str(value), re.I)
+
+        if not match:
+            return None
+
+        rate = int(round(float(match.group(1)) * (1000 if match.group(2) else 1)))
+
+    return rate if rate >= 1000 else None
+
+
+class CtlWatch:
+    """Subscription to the events of the controls of one sound card.
+
+    ``callback`` is called with the card number, the name of the control and
+    its new value for each value change of a control, whose name matches
+    ``pattern``. The value is a bool, an int or, for enumerated controls, the
+    name of the selected item. It is None, if the control was removed or its
+    value could not be read.
+
+    The watch is closed when the card is removed.
+
+    """
+
+    _structs = (
+        ("event", "snd_ctl_event"),
+        ("elem_id", "snd_ctl_elem_id"),
+        ("elem_info", "snd_ctl_elem_info"),
+        ("elem_value", "snd_ctl_elem_value"),
+    )
+
+    def __init__(self, cardno, callback, pattern=CLOCK_CONTROL_PATTERN):
+        self.cardno = cardno
+        self.callback = callback
+        self.pattern = pattern
+        self.closed = False
+        self._lib = get_backend()
+        self._allocated = []
+        self._sources = []
+        self.handle = c_void_p()
+        hwdev = create_string_buffer("hw:{}".format(cardno).encode())
+        check_call(
+            self._lib.snd_ctl_open,
+            (byref(self.handle), hwdev, SND_CTL_NONBLOCK),
+            "Could not open control interface of card #{}:".format(cardno),
+        )
+
+        try:
+            for attr, struct in self._structs:
+                ptr = c_void_p()
+                check_call(
+                    getattr(self._lib, struct + "_malloc"),
+                    (byref(ptr),),
+                    "Could not allocate memory for {}_t.".format(struct),
+                )
+                self._allocated.append((struct, ptr))
+                setattr(self, attr, ptr)
+
+            check_call(
+                self._lib.snd_ctl_subscribe_events,
+                (self.handle, 1),
+                "Could not subscribe to control events of card #{}:".format(cardno),
+            )
+            count = self._lib.snd_ctl_poll_descriptors_count(self.handle)
+            pollfds = (PollFd * max(count, 0))()
+            count = self._lib.snd_ctl_poll_descriptors(self.handle, pollfds, len(pollfds))
+        except LibAsoundError:
+            self.close()
+            raise
+
+        for pollfd in pollfds[: max(count, 0)]:
+            self._sources.append(
+                GLib.io_add_watch(
+                    pollfd.fd,
+                    GLib.PRIORITY_DEFAULT,
+                    GLib.IO_IN | GLib.IO_ERR | GLib.IO_HUP,
+                    self._handle_events,
+                )
+            )
+
+        log.debug("Watching clock controls of card #%i.", cardno)
+
+    def _handle_events(self, fd, condition):
+        # handle all queued events, so a burst of events needs only one wakeup
+        while not self.closed:
+            err = self._lib.snd_ctl_read(self.handle, self.event)
+
+            if err == 0 or err == -errno.EAGAIN:
+                return True
+            elif err < 0:
+                log.debug("Card #%i gone, no longer watching its controls.", self.cardno)
+                self.close()
+                break
+
+            if self._lib.snd_ctl_event_get_type(self.event) != SND_CTL_EVENT_ELEM:
+                continue
+
+            mask = self._lib.snd_ctl_event_elem_get_mask(self.event)
+            name = self._lib.snd_ctl_event_elem_get_name(self.event).decode()
+
+            if not is_clock_control(name, self.pattern):
+                continue
+
+            if mask == SND_CTL_EVENT_MASK_REMOVE:
+                self.callback(self.cardno, name, None)
+            elif mask & SND_CTL_EVENT_MASK_VALUE:
+                self.callback(self.cardno, name, self._read_value())
+
+        return False
+
+    def _read_value(self):
+        lib = self._lib
+        lib.snd_ctl_event_elem_get_id(self.event, self.elem_id)
+        lib.snd_ctl_elem_info_set_id(self.elem_info, self.elem_id)
+        lib.snd_ctl_elem_value_set_id(self.elem_value, self.elem_id)
+
+        if (
+            lib.snd_ctl_elem_info(self.handle, self.elem_info) < 0
+            or lib.snd_ctl_elem_read(self.handle, self.elem_value) < 0
+        ):
+            return None
+
+        elem_type = lib.snd_ctl_elem_info_get_type(self.elem_info)
+
+        if elem_type == SND_CTL_ELEM_TYPE_BOOLEAN:
+            return bool(lib.snd_ctl_elem_value_get_boolean(self.elem_value, 0))
+        elif elem_type == SND_CTL_ELEM_TYPE_INTEGER:
+            return lib.snd_ctl_elem_value_get_integer(self.elem_value, 0)
+        elif elem_type == SND_CTL_ELEM_TYPE_INTEGER64:
+            return lib.snd_ctl_elem_value_get_integer64(self.elem_value, 0)
+        elif elem_type == SND_CTL_ELEM_TYPE_ENUMERATED:
+            item = lib.snd_ctl_elem_value_get_enumerated(self.elem_value, 0)
+            lib.snd_ctl_elem_info_set_item(self.elem_info, item)
+
+            if lib.snd_ctl_elem_info(self.handle, self.elem_info) < 0:
+                return item
+
+            return lib.snd_ctl_elem_info_get_item_name(self.elem_info).decode()
+
+    def close(self):
+        """Remove poll descriptors from the main loop and close the control handle."""
+        if self.closed:
+            return
+
+        self.closed = True
+
+        while self._sources:
+            GLib.source_remove(self._sources.pop())
+
+        if self.handle:
+            self._lib.snd_ctl_close(self.handle)
+
+        while self._allocated:
+            struct, ptr = self._allocated.pop()
+            getattr(self._lib, struct + "_free")(ptr)
+
+
+class AlsaCtlMonitor:
+    """Report changes of the sample rate and clock controls of a set of sound cards.
+
+    ``callback`` is called with the card number, control name and value as
+    described for ``CtlWatch``. Use ``watch`` to set the cards to watch,
+    e.g. the cards used by the active JACK preset.
+
+    """
+
+    def __init__(self, callback, pattern=CLOCK_CONTROL_PATTERN):
+        self.callback = callback
+        self.pattern = pattern
+        self._watches = {}
+
+    @property
+    def cards(self):
+        """Return set of numbers of the watched cards."""
+        return {cardno for cardno, watch in self._watches.items() if not watch.closed}
+
+    def watch(self, cardnos):
+        """Watch the cards with given numbers and stop watching all other cards.
+
+        Cards, whose watch was closed since they were removed, are watched
+        again, if they are given.
+
+        """
+        cardnos = set(cardnos)
+
+        for cardno, watch in list(self._watches.items()):
+            if watch.closed or cardno not in cardnos:
+                watch.close()
+                del self._watches[cardno]
+
+        for cardno in sorted(cardnos - set(self._watches)):
+            try:
+                self._watches[cardno] = CtlWatch(cardno, self.callback, self.pattern)
+            except LibAsoundError as exc:
+                log.warning("Could not watch controls of card #%i: %s", cardno, exc)
+
+    def close(self):
+        """Stop watching all cards."""
+        self.watch(())
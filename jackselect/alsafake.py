@@ -0,0 +1,1165 @@
+# -*- coding: utf-8 -*-
+"""A simulated libasound backend for exercising the ALSA probing code.
+
+``FakeLibAsound`` implements the subset of the libasound API used by
+``jackselect.alsainfo`` in pure Python. It describes virtual sound cards, PCM
+devices and their capabilities and can inject per-call latency and errors.
+This allows to test and benchmark probing and the device change handling
+with any number of cards on machines without sound hardware.
+
+Install it with ``jackselect.alsainfo.set_backend`` or by setting the
+environment variable ``JACKSELECT_ALSA_BACKEND`` to ``fake`` (for a set of
+generated cards) or ``fake:<path>`` (for cards described in a JSON file)
+before ``jackselect.alsainfo`` is imported.
+
+A card description is a dict like this (all keys except ``id`` and
+``devices`` are optional)::
+
+    {
+        "id": "USB",
+        "name": "USB Audio Interface",
+        "latency": {"snd_pcm_open": 0.05},
+        "errors": {"snd_pcm_hw_params_any": -5},
+        "devices": [
+            {
+                "devno": 0,
+                "id": "USB Audio",
+                "name": "USB Audio",
+                "subdevices": 1,
+                "busy": false,
+                "playback": {
+                    "channels": [2, 8],
+                    "rates": [44100, 48000, 96000],
+                    "periods": [2, 32],
+                    "buffer_sizes": [32, 65536],
+                    "formats": ["S16_LE", "S24_3LE", "S32_LE"]
+                },
+                "capture": {...}
+            }
+        ]
+    }
+
+``channels`` and ``rates`` are lists of the supported values, ``periods``
+and ``buffer_sizes`` are ``[min, max]`` ranges. ``rates`` may also be a
+continuous interval like ``{"min": 44100, "max": 192000, "openmin": true}``,
+as reported by devices with a sample rate converter, whose bounds are
+excluded if ``openmin`` resp. ``openmax`` is true. A stream direction, which
+is not given, is not supported by the device.
+
+``controls`` is an optional list of control elements of the card like
+``{"name": "Sample Clock Source", "type": "enumerated", "items": ["Internal",
+"Word Clock"], "value": "Internal"}``. The type is ``"boolean"``,
+``"integer"`` (the default) or ``"enumerated"``. Changing a control with
+``FakeLibAsound.set_control`` sends a control event to subscribed control
+handles of the card (see ``jackselect.alsactlmonitor``).
+
+Cards with the key ``"midi_ports"`` set to a number have a sequencer
+client with this number of MIDI hardware ports. Further sequencer clients
+(e.g. of MIDI applications) can be added with
+``FakeLibAsound.add_seq_client``. Adding and removing sequencer clients sends
+announce events to open sequencer handles (see ``jackselect.alsaseq``).
+
+``latency`` maps function names to the number of seconds a call of this
+function for this card is delayed, ``errors`` maps function names to the
+(negative) error code returned by calls of it for this card. Both can also
+be given for all cards when creating a ``FakeLibAsound`` instance.
+
+A ``FakeLibAsound`` instance writes a simulated ``/proc/asound`` tree for
+its cards to the ``procfs`` directory given when creating it or, by default,
+to a temporary directory, which is removed again with the instance. The tree
+is kept up to date when cards are added or removed, so enumerating cards
+from procfs works without sound hardware. Cards with the key
+``"usb": true`` in their description get a ``stream<N>`` file for each PCM
+device like USB audio devices.
+
+"""
+
+import errno
+import json
+import os
+import shutil
+import tempfile
+import time
+from collections import namedtuple
+from ctypes import c_char_p, c_int
+
+
+SND_PCM_STREAMS = ("playback", "capture")
+SND_CTL_EVENT_ELEM = 0
+SND_CTL_EVENT_MASK_VALUE = 1 << 0
+SND_CTL_ELEM_TYPES = {"boolean": 1, "integer": 2, "enumerated": 3}
+POLLIN = 0x1
+SND_SEQ_KERNEL_CLIENT = 2
+SND_SEQ_USER_CLIENT = 1
+SND_SEQ_EVENT_CLIENT_START = 60
+SND_SEQ_EVENT_CLIENT_EXIT = 61
+# READ | WRITE | DUPLEX | SUBS_READ | SUBS_WRITE
+SEQ_PORT_CAPS = 0x73
+# MIDI_GENERIC | HARDWARE | PORT, MIDI_GENERIC | SOFTWARE | PORT
+SEQ_PORT_TYPE_HARDWARE = 0x90002
+SEQ_PORT_TYPE_SOFTWARE = 0xA0002
+DEFAULT_CAPS = {
+    "channels": [2],
+    "rates": [44100, 48000, 88200, 96000],
+    "periods": [2, 32],
+    "buffer_sizes": [64, 65536],
+    "formats": ["S16_LE", "S32_LE"],
+}
+
+
+def _deref(arg):
+    # Get the ctypes object passed by reference via byref()
+    return getattr(arg, "_obj", arg)
+
+
+def _value(arg):
+    # Get the Python value of a ctypes object or pass through a Python value
+    return getattr(arg, "value", arg)
+
+
+def _int_range(values):
+    # A [min, max] pair describes a range, everything else a list of values
+    return range(values[0], values[1] + 1)
+
+
+class _Interval(namedtuple("_Interval", ("min", "max", "openmin", "openmax"))):
+    """A continuous interval of values, whose bounds are excluded if they are open."""
+
+    __slots__ = ()
+
+    def __bool__(self):
+        return self.min < self.max or (
+            self.min == self.max and not (self.openmin or self.openmax)
+        )
+
+    def __contains__(self, value):
+        return (self.min < value if self.openmin else self.min <= value) and (
+            value < self.max if self.openmax else value <= self.max
+        )
+
+
+def _interval(values):
+    # A dict describes a continuous interval, everything else a list of values
+    if isinstance(values, dict):
+        return _Interval(
+            values["min"],
+            values["max"],
+            bool(values.get("openmin")),
+            bool(values.get("openmax")),
+        )
+
+    return tuple(sorted(values))
+
+
+def _narrow_min(values, minimum):
+    if isinstance(values, range):
+        return range(max(minimum, values.start), values.stop)
+    elif isinstance(values, _Interval):
+        return values._replace(min=minimum, openmin=False) if minimum > values.min else values
+
+    return tuple(v for v in values if v >= minimum)
+
+
+def _bound(values, pos):
+    # Return the minimum (pos=0) or maximum (pos=-1) and its direction
+    if isinstance(values, _Interval):
+        if pos == 0:
+            return values.min, 1 if values.openmin else 0
+
+        return values.max, -1 if values.openmax else 0
+
+    return values[pos], 0
+
+
+def make_card(cardno, channels=2, ndevices=1, **kwargs):
+    """Return a description of a generated card with given number of PCM devices.
+
+    ``channels`` is the (fixed) number of channels of each device. Additional
+    keyword arguments are added to the card description.
+
+    """
+    caps = dict(DEFAULT_CAPS, channels=[channels])
+    card = {
+        "id": "Card%i" % cardno,
+        "name": "Simulated Card %i" % cardno,
+        "devices": [
+            {
+                "devno": devno,
+                "id": "PCM%i" % devno,
+                "name": "Simulated PCM %i" % devno,
+                "playback": caps,
+                "capture": caps,
+            }
+            for devno in range(ndevices)
+        ],
+    }
+    card.update(kwargs)
+    return card
+
+
+class _Handle:
+    """Base class for objects referred to by the opaque pointers of the fake API."""
+
+    _registry = {}
+
+    def __init__(self):
+        self.handle = id(self)
+        self._registry[self.handle] = self
+
+    @classmethod
+    def get(cls, ptr):
+        return cls._registry[_value(ptr)]
+
+    def release(self):
+        self._registry.pop(self.handle, None)
+
+
+class _Struct(_Handle):
+    """An allocated info, parameter or mask structure."""
+
+    def __init__(self):
+        super().__init__()
+        self.card = None
+        self.device = None
+        self.devno = 0
+        self.subdevice = 0
+        self.stream = 0
+        self.caps = None
+
+
+class _Ctl(_Handle):
+    def __init__(self, card):
+        super().__init__()
+        self.card = card
+        self.events = []
+        self.pipe = None
+        self.disconnected = False
+
+    def notify(self, event=None):
+        """Queue control event and wake up poll descriptor, if subscribed."""
+        if self.pipe is None:
+            return
+
+        if event is None:
+            self.disconnected = True
+        else:
+            self.events.append(event)
+
+        os.write(self.pipe[1], b"\0")
+
+    def release(self):
+        super().release()
+
+        if self.pipe is not None:
+            for fd in self.pipe:
+                os.close(fd)
+
+            self.pipe = None
+
+
+class _Pcm(_Handle):
+    def __init__(self, card, device, stream):
+        super().__init__()
+        self.card = card
+        self.device = device
+        self.stream = stream
+
+
+class _Seq(_Handle):
+    def __init__(self, client):
+        super().__init__()
+        self.client = client
+        self.name = "Client-%i" % client
+        self.ports = []
+        self.events = []
+        self.announce = False
+        self.pipe = os.pipe()
+        self.event = None
+        os.set_blocking(self.pipe[0], False)
+
+    def notify(self, event_type, client):
+        """Queue announce event and wake up poll descriptor, if subscribed."""
+        if self.announce:
+            self.events.append((event_type, client))
+            os.write(self.pipe[1], b"\0")
+
+    def release(self):
+        super().release()
+
+        for fd in self.pipe:
+            os.close(fd)
+
+
+class FakeLibAsound:
+    """Pure Python stand-in for the libasound functions used by ``jackselect.alsainfo``.
+
+    ``cards`` is a list of card descriptions (see the module documentation).
+    ``latency`` and ``errors`` are dicts which inject delays and errors into
+    calls of the given functions for all cards. The simulated procfs tree is
+    written to a temporary directory, if no ``procfs`` directory is given.
+
+    """
+
+    def __init__(self, cards=(), latency=None, errors=None, version="1.2.99-fake", procfs=None):
+        self.cards = {}
+        self.latency = latency or {}
+        self.errors = errors or {}
+        self.version = version
+        self.procfs = None
+        self.calls = {}
+        self.seq_clients = {}
+        self._tmpdir = None
+
+        for cardno, card in enumerate(cards):
+            self.add_card(card, cardno)
+
+        if not procfs:
+            self._tmpdir = tempfile.TemporaryDirectory(prefix="jackselect-fake-asound-")
+            procfs = self._tmpdir.name
+
+        self.write_procfs(procfs)
+
+    @classmethod
+    def from_file(cls, filename):
+        """Create backend from JSON file with a list of card descriptions.
+
+        The file may also contain a dict with the keys ``cards``, ``latency``,
+        ``errors`` and ``procfs``.
+
+        """
+        with open(filename) as fp:
+            data = json.load(fp)
+
+        if isinstance(data, list):
+            data = {"cards": data}
+
+        return cls(**data)
+
+    @classmethod
+    def generate(cls, ncards=4, **kwargs):
+        """Create backend with ``ncards`` generated cards (see ``make_card``)."""
+        return cls([make_card(cardno) for cardno in range(ncards)], **kwargs)
+
+    # Simulating hotplugging
+
+    def add_card(self, card, cardno=None):
+        """Add a card with given description and return its card number."""
+        if cardno is None:
+            cardno = next(i for i in range(len(self.cards) + 1) if i not in self.cards)
+
+        self.cards[cardno] = dict(card, cardno=cardno)
+
+        if self.procfs:
+            self.write_procfs(self.procfs)
+
+        if card.get("midi_ports"):
+            self._announce(SND_SEQ_EVENT_CLIENT_START, self._card_seq_client(cardno))
+
+        return cardno
+
+    def remove_card(self, cardno):
+        """Remove card with given number."""
+        card = self.cards.pop(cardno)
+
+        for ctl in self._ctl_handles(card):
+            ctl.notify()
+
+        if card.get("midi_ports"):
+            self._announce(SND_SEQ_EVENT_CLIENT_EXIT, self._card_seq_client(cardno))
+
+        if self.procfs:
+            self.write_procfs(self.procfs)
+
+    def set_busy(self, cardno, devno=0, busy=True):
+        """Mark PCM device of card as in use by another application or not."""
+        self._find_device(self.cards[cardno], devno)["busy"] = busy
+
+        if self.procfs:
+            self.write_procfs(self.procfs)
+
+    def set_control(self, cardno, name, value):
+        """Set value of control of card and send a control event for it."""
+        card = self.cards[cardno]
+        control = self._find_control(card, name)
+
+        if control is None:
+            raise KeyError(name)
+
+        control["value"] = value
+
+        for ctl in self._ctl_handles(card):
+            ctl.notify({"name": name, "mask": SND_CTL_EVENT_MASK_VALUE})
+
+    def add_seq_client(self, name, ports=1, client=None):
+        """Add a user sequencer client with given number of software ports.
+
+        Returns the client number.
+
+        """
+        if client is None:
+            clients = self._get_seq_clients()
+            client = next(n for n in range(128, 192) if n not in clients)
+
+        self.seq_clients[client] = {
+            "name": name,
+            "type": SND_SEQ_USER_CLIENT,
+            "card": -1,
+            "ports": [
+                ("%s port %i" % (name, port), SEQ_PORT_CAPS, SEQ_PORT_TYPE_SOFTWARE)
+                for port in range(ports)
+            ],
+        }
+        self._announce(SND_SEQ_EVENT_CLIENT_START, client)
+        return client
+
+    def remove_seq_client(self, client):
+        """Remove user sequencer client with given number."""
+        del self.seq_clients[client]
+        self._announce(SND_SEQ_EVENT_CLIENT_EXIT, client)
+
+    # Simulated procfs
+
+    def write_procfs(self, path):
+        """Write a simulated ``/proc/asound`` tree for the cards to given directory.
+
+        The backend's ``procfs`` attribute is set to the path, which makes
+        ``jackselect.alsainfo.enumerate_cards`` read this tree.
+
+        """
+        os.makedirs(path, exist_ok=True)
+
+        for entry in os.listdir(path):
+            entry = os.path.join(path, entry)
+
+            if os.path.islink(entry):
+                os.unlink(entry)
+            elif os.path.basename(entry).startswith("card") and entry[-1].isdigit():
+                shutil.rmtree(entry)
+
+        lines = []
+
+        for cardno, card in sorted(self.cards.items()):
+            name = card.get("name", card["id"])
+            lines.append("%2i [%-15s]: Fake - %s\n" % (cardno, card["id"], name))
+            lines.append("                      %s\n" % name)
+            carddir = os.path.join(path, "card%i" % cardno)
+            os.makedirs(carddir)
+
+            with open(os.path.join(carddir, "id"), "w") as fp:
+                fp.write(card["id"] + "\n")
+
+            os.symlink("card%i" % cardno, os.path.join(path, card["id"]))
+
+            for device in card["devices"]:
+                self._write_procfs_device(carddir, cardno, card, device)
+
+        with open(os.path.join(path, "cards"), "w") as fp:
+            fp.write("".join(lines) if lines else "--- no soundcards ---\n")
+
+        self.procfs = path
+
+    def _write_procfs_device(self, carddir, cardno, card, device):
+        devno = device.get("devno", 0)
+        nsubd = device.get("subdevices", 1)
+        usb_stream = []
+
+        for stream, suffix in zip(SND_PCM_STREAMS, "pc"):
+            caps = self._caps(device, SND_PCM_STREAMS.index(stream))
+
+            if caps is None:
+                continue
+
+            pcmdir = os.path.join(carddir, "pcm%i%s" % (devno, suffix))
+            info = [
+                ("card", cardno),
+                ("device", devno),
+                ("subdevice", 0),
+                ("stream", stream.upper()),
+                ("id", device["id"]),
+                ("name", device.get("name", device["id"])),
+                ("subname", "subdevice #0"),
+                ("class", 0),
+                ("subclass", 0),
+                ("subdevices_count", nsubd),
+                ("subdevices_avail", 0 if device.get("busy") else nsubd),
+            ]
+
+            for subd in range(nsubd):
+                subdir = os.path.join(pcmdir, "sub%i" % subd)
+                os.makedirs(subdir)
+
+                with open(os.path.join(subdir, "info"), "w") as fp:
+                    for key, value in info:
+                        if key == "subdevice":
+                            value = subd
+                        elif key == "subname":
+                            value = "subdevice #%i" % subd
+
+                        fp.write("%s: %s\n" % (key, value))
+
+                with open(os.path.join(subdir, "status"), "w") as fp:
+                    if device.get("busy"):
+                        fp.write("state: RUNNING\nowner_pid   : 1\n")
+                    else:
+                        fp.write("closed\n")
+
+            with open(os.path.join(pcmdir, "info"), "w") as fp:
+                fp.write("".join("%s: %s\n" % item for item in info))
+
+            usb_stream.append(
+                "\n%s:\n  Status: Stop\n  Interface 1\n    Altset 1\n" % stream.capitalize()
+            )
+            usb_stream.append("    Format: %s\n" % ", ".join(caps["formats"]))
+
+            for channels in caps["channels"]:
+                usb_stream.append("    Channels: %i\n" % channels)
+
+            if isinstance(caps["rates"], dict):
+                rates = "%i - %i (continuous)" % (caps["rates"]["min"], caps["rates"]["max"])
+            else:
+                rates = ", ".join(str(rate) for rate in caps["rates"])
+
+            usb_stream.append("    Rates: %s\n" % rates)
+
+        if card.get("usb") and usb_stream:
+            with open(os.path.join(carddir, "stream%i" % devno), "w") as fp:
+                fp.write("%s at usb-fake, high speed : USB Audio\n" % card.get("name", card["id"]))
+                fp.write("".join(usb_stream))
+
+    # Helpers
+
+    def _call(self, name, card=None):
+        """Count call, apply injected latency and return injected error or 0."""
+        self.calls[name] = self.calls.get(name, 0) + 1
+        latency = self.latency.get(name, 0)
+        err = self.errors.get(name, 0)
+
+        if card is not None:
+            latency += card.get("latency", {}).get(name, 0)
+            err = card.get("errors", {}).get(name, err)
+
+        if latency:
+            time.sleep(latency)
+
+        return err
+
+    def _find_card(self, name):
+        if name.startswith("hw:"):
+            name = name[3:]
+
+        for cardno, card in self.cards.items():
+            if name in (str(cardno), card["id"]):
+                return card
+
+    def _find_device(self, card, devno):
+        for device in card["devices"]:
+            if device.get("devno", 0) == devno:
+                return device
+
+    def _find_control(self, card, name):
+        for control in card.get("controls", ()):
+            if control["name"] == name:
+                return control
+
+    def _ctl_handles(self, card):
+        return [
+            handle
+            for handle in list(_Handle._registry.values())
+            if isinstance(handle, _Ctl) and handle.card is card
+        ]
+
+    def _card_seq_client(self, cardno):
+        # kernel clients of cards are numbered like by the ALSA sequencer core
+        return 16 + 4 * cardno
+
+    def _seq_handles(self):
+        return [handle for handle in list(_Handle._registry.values()) if isinstance(handle, _Seq)]
+
+    def _get_seq_clients(self):
+        """Return dict mapping client numbers to client descriptions of all sequencer clients."""
+        clients = {
+            0: {
+                "name": "System",
+                "type": SND_SEQ_KERNEL_CLIENT,
+                "card": -1,
+                "ports": [("Timer", 0x23, 0), ("Announce", 0x21, 0)],
+            },
+            14: {
+                "name": "Midi Through",
+                "type": SND_SEQ_KERNEL_CLIENT,
+                "card": -1,
+                "ports": [("Midi Through Port-0", SEQ_PORT_CAPS, SEQ_PORT_TYPE_SOFTWARE)],
+            },
+        }
+
+        for cardno, card in self.cards.items():
+            if card.get("midi_ports"):
+                clients[self._card_seq_client(cardno)] = {
+                    "name": card.get("name", card["id"]),
+                    "type": SND_SEQ_KERNEL_CLIENT,
+                    "card": cardno,
+                    "ports": [
+                        (
+                            "%s MIDI %i" % (card.get("name", card["id"]), port + 1),
+                            SEQ_PORT_CAPS,
+                            SEQ_PORT_TYPE_HARDWARE,
+                        )
+                        for port in range(card["midi_ports"])
+                    ],
+                }
+
+        clients.update(self.seq_clients)
+
+        for seq in self._seq_handles():
+            clients[seq.client] = {
+                "name": seq.name,
+                "type": SND_SEQ_USER_CLIENT,
+                "card": -1,
+                "ports": seq.ports,
+            }
+
+        return clients
+
+    def _announce(self, event_type, client):
+        for seq in self._seq_handles():
+            seq.notify(event_type, client)
+
+    def _caps(self, device, stream):
+        caps = device.get(SND_PCM_STREAMS[stream])
+
+        if caps is not None:
+            caps = dict(DEFAULT_CAPS, **caps)
+            return {
+                "channels": tuple(sorted(caps["channels"])),
+                "rates": _interval(caps["rates"]),
+                "periods": _int_range(caps["periods"]),
+                "buffer_sizes": _int_range(caps["buffer_sizes"]),
+                "formats": caps["formats"],
+            }
+
+    # General
+
+    def snd_asoundlib_version(self):
+        return self.version.encode()
+
+    def snd_strerror(self, err):
+        return os.strerror(-err).encode()
+
+    def snd_card_next(self, c_card):
+        self._call("snd_card_next")
+        c_card = _deref(c_card)
+        c_card.value = min((n for n in self.cards if n > c_card.value), default=-1)
+        return 0
+
+    # Structure allocation
+
+    def _malloc(self, ptr):
+        _deref(ptr).value = _Struct().handle
+        return 0
+
+    def _free(self, ptr):
+        _Struct.get(ptr).release()
+
+    snd_ctl_card_info_malloc = snd_pcm_info_malloc = _malloc
+    snd_pcm_hw_params_malloc = snd_pcm_format_mask_malloc = _malloc
+    snd_ctl_card_info_free = snd_pcm_info_free = _free
+    snd_pcm_hw_params_free = snd_pcm_format_mask_free = _free
+    snd_ctl_event_malloc = snd_ctl_elem_id_malloc = _malloc
+    snd_ctl_elem_info_malloc = snd_ctl_elem_value_malloc = _malloc
+    snd_ctl_event_free = snd_ctl_elem_id_free = _free
+    snd_ctl_elem_info_free = snd_ctl_elem_value_free = _free
+    snd_seq_client_info_malloc = snd_seq_port_info_malloc = _malloc
+    snd_seq_client_info_free = snd_seq_port_info_free = _free
+
+    # Control interface
+
+    def snd_ctl_open(self, c_handle, name, mode):
+        card = self._find_card(_value(name).decode())
+        err = self._call("snd_ctl_open", card)
+
+        if card is None:
+            return -errno.ENOENT
+        elif err:
+            return err
+
+        _deref(c_handle).value = _Ctl(card).handle
+        return 0
+
+    def snd_ctl_close(self, c_handle):
+        self._call("snd_ctl_close")
+        _Ctl.get(c_handle).release()
+        return 0
+
+    def snd_ctl_card_info(self, c_handle, c_info):
+        card = _Ctl.get(c_handle).card
+        err = self._call("snd_ctl_card_info", card)
+
+        if not err:
+            _Struct.get(c_info).card = card
+
+        return err
+
+    def snd_ctl_card_info_get_id(self, c_info):
+        return _Struct.get(c_info).card["id"].encode()
+
+    def snd_ctl_card_info_get_name(self, c_info):
+        card = _Struct.get(c_info).card
+        return card.get("name", card["id"]).encode()
+
+    def snd_ctl_pcm_next_device(self, c_handle, c_dev):
+        card = _Ctl.get(c_handle).card
+        err = self._call("snd_ctl_pcm_next_device", card)
+        c_dev = _deref(c_dev)
+        devnos = [dev.get("devno", 0) for dev in card["devices"]]
+        c_dev.value = min((n for n in devnos if n > c_dev.value), default=-1)
+        return err
+
+    def snd_ctl_pcm_info(self, c_handle, c_pcminfo):
+        card = _Ctl.get(c_handle).card
+        err = self._call("snd_ctl_pcm_info", card)
+        info = _Struct.get(c_pcminfo)
+        device = self._find_device(card, info.devno)
+
+        if err:
+            return err
+        elif device is None or self._caps(device, info.stream) is None:
+            return -errno.ENOENT
+
+        info.card = card
+        info.device = device
+        return 0
+
+    # Control events
+
+    def snd_ctl_subscribe_events(self, c_handle, subscribe):
+        ctl = _Ctl.get(c_handle)
+        err = self._call("snd_ctl_subscribe_events", ctl.card)
+
+        if not err and _value(subscribe) and ctl.pipe is None:
+            ctl.pipe = os.pipe()
+            os.set_blocking(ctl.pipe[0], False)
+
+        return err
+
+    def snd_ctl_poll_descriptors_count(self, c_handle):
+        return 1 if _Ctl.get(c_handle).pipe is not None else 0
+
+    def snd_ctl_poll_descriptors(self, c_handle, pollfds, space):
+        ctl = _Ctl.get(c_handle)
+
+        if ctl.pipe is None or _value(space) < 1:
+            return 0
+
+        pollfds[0].fd = ctl.pipe[0]
+        pollfds[0].events = POLLIN
+        return 1
+
+    def snd_ctl_read(self, c_handle, c_event):
+        ctl = _Ctl.get(c_handle)
+        err = self._call("snd_ctl_read", ctl.card)
+
+        if err:
+            return err
+        elif ctl.disconnected:
+            return -errno.ENODEV
+        elif not ctl.events:
+            return -errno.EAGAIN
+
+        os.read(ctl.pipe[0], 1)
+        event = _Struct.get(c_event)
+        event.card = ctl.card
+        event.caps = ctl.events.pop(0)
+        return 1
+
+    def snd_ctl_event_get_type(self, c_event):
+        return SND_CTL_EVENT_ELEM
+
+    def snd_ctl_event_elem_get_mask(self, c_event):
+        return _Struct.get(c_event).caps["mask"]
+
+    def snd_ctl_event_elem_get_name(self, c_event):
+        return _Struct.get(c_event).caps["name"].encode()
+
+    def snd_ctl_event_elem_get_id(self, c_event, c_id):
+        _Struct.get(c_id).caps = {"name": _Struct.get(c_event).caps["name"]}
+
+    # Control elements
+
+    def snd_ctl_elem_info_set_id(self, c_info, c_id):
+        _Struct.get(c_info).caps = dict(_Struct.get(c_id).caps, item=0)
+
+    def snd_ctl_elem_value_set_id(self, c_value, c_id):
+        _Struct.get(c_value).caps = dict(_Struct.get(c_id).caps)
+
+    def _read_elem(self, name, c_handle, c_struct):
+        card = _Ctl.get(c_handle).card
+        err = self._call(name, card)
+        struct = _Struct.get(c_struct)
+        control = self._find_control(card, struct.caps["name"])
+
+        if err:
+            return err
+        elif control is None:
+            return -errno.ENOENT
+
+        struct.card = card
+        struct.caps["control"] = control
+        return 0
+
+    def snd_ctl_elem_info(self, c_handle, c_info):
+        return self._read_elem("snd_ctl_elem_info", c_handle, c_info)
+
+    def snd_ctl_elem_read(self, c_handle, c_value):
+        return self._read_elem("snd_ctl_elem_read", c_handle, c_value)
+
+    def snd_ctl_elem_info_get_type(self, c_info):
+        return SND_CTL_ELEM_TYPES[_Struct.get(c_info).caps["control"].get("type", "integer")]
+
+    def snd_ctl_elem_info_set_item(self, c_info, item):
+        _Struct.get(c_info).caps["item"] = _value(item)
+
+    def snd_ctl_elem_info_get_item_name(self, c_info):
+        caps = _Struct.get(c_info).caps
+        return caps["control"]["items"][caps["item"]].encode()
+
+    def snd_ctl_elem_value_get_boolean(self, c_value, idx):
+        return int(bool(_Struct.get(c_value).caps["control"]["value"]))
+
+    def snd_ctl_elem_value_get_integer(self, c_value, idx):
+        return int(_Struct.get(c_value).caps["control"]["value"])
+
+    def snd_ctl_elem_value_get_enumerated(self, c_value, idx):
+        control = _Struct.get(c_value).caps["control"]
+        value = control["value"]
+        return control["items"].index(value) if isinstance(value, str) else value
+
+    # Sequencer
+
+    def snd_seq_open(self, c_seq, name, streams, mode):
+        err = self._call("snd_seq_open")
+
+        if not err:
+            clients = self._get_seq_clients()
+            client = next(n for n in range(128, 192) if n not in clients)
+            _deref(c_seq).value = _Seq(client).handle
+
+        return err
+
+    def snd_seq_close(self, c_seq):
+        self._call("snd_seq_close")
+        _Seq.get(c_seq).release()
+        return 0
+
+    def snd_seq_set_client_name(self, c_seq, name):
+        _Seq.get(c_seq).name = _value(name).decode()
+        return 0
+
+    def snd_seq_client_id(self, c_seq):
+        return _Seq.get(c_seq).client
+
+    def snd_seq_create_simple_port(self, c_seq, name, caps, port_type):
+        seq = _Seq.get(c_seq)
+        seq.ports.append((_value(name).decode(), _value(caps), _value(port_type)))
+        return len(seq.ports) - 1
+
+    def snd_seq_connect_from(self, c_seq, port, src_client, src_port):
+        seq = _Seq.get(c_seq)
+        err = self._call("snd_seq_connect_from")
+
+        if not err and (_value(src_client), _value(src_port)) == (0, 1):
+            seq.announce = True
+
+        return err
+
+    def snd_seq_poll_descriptors_count(self, c_seq, events):
+        return 1
+
+    def snd_seq_poll_descriptors(self, c_seq, pollfds, space, events):
+        if _value(space) < 1:
+            return 0
+
+        pollfds[0].fd = _Seq.get(c_seq).pipe[0]
+        pollfds[0].events = POLLIN
+        return 1
+
+    def snd_seq_event_input(self, c_seq, c_event):
+        from .alsaseq import SndSeqEvent
+
+        seq = _Seq.get(c_seq)
+        err = self._call("snd_seq_event_input")
+
+        if err:
+            return err
+        elif not seq.events:
+            return -errno.EAGAIN
+
+        os.read(seq.pipe[0], 1)
+        event_type, client = seq.events.pop(0)
+        seq.event = SndSeqEvent(type=event_type)
+        seq.event.addr.client = client
+        _deref(c_event).contents = seq.event
+        return len(seq.events)
+
+    def snd_seq_client_info_set_client(self, c_info, client):
+        _Struct.get(c_info).caps = {"client": _value(client)}
+
+    def snd_seq_query_next_client(self, c_seq, c_info):
+        info = _Struct.get(c_info)
+        clients = self._get_seq_clients()
+        client = min((n for n in clients if n > info.caps["client"]), default=None)
+
+        if client is None:
+            return -errno.ENOENT
+
+        info.caps = dict(clients[client], client=client)
+        return 0
+
+    def snd_seq_client_info_get_client(self, c_info):
+        return _Struct.get(c_info).caps["client"]
+
+    def snd_seq_client_info_get_name(self, c_info):
+        return _Struct.get(c_info).caps["name"].encode()
+
+    def snd_seq_client_info_get_type(self, c_info):
+        return _Struct.get(c_info).caps["type"]
+
+    def snd_seq_client_info_get_card(self, c_info):
+        return _Struct.get(c_info).caps["card"]
+
+    def snd_seq_port_info_set_client(self, c_info, client):
+        _Struct.get(c_info).caps = {"client": _value(client), "port": -1}
+
+    def snd_seq_port_info_set_port(self, c_info, port):
+        _Struct.get(c_info).caps["port"] = _value(port)
+
+    def snd_seq_query_next_port(self, c_seq, c_info):
+        info = _Struct.get(c_info)
+        client = self._get_seq_clients().get(info.caps["client"])
+        port = info.caps["port"] + 1
+
+        if client is None or port >= len(client["ports"]):
+            return -errno.ENOENT
+
+        name, caps, port_type = client["ports"][port]
+        info.caps.update(port=port, name=name, caps=caps, type=port_type)
+        return 0
+
+    def snd_seq_port_info_get_port(self, c_info):
+        return _Struct.get(c_info).caps["port"]
+
+    def snd_seq_port_info_get_name(self, c_info):
+        return _Struct.get(c_info).caps["name"].encode()
+
+    def snd_seq_port_info_get_capability(self, c_info):
+        return _Struct.get(c_info).caps["caps"]
+
+    def snd_seq_port_info_get_type(self, c_info):
+        return _Struct.get(c_info).caps["type"]
+
+    # PCM info
+
+    def snd_pcm_info_set_device(self, c_pcminfo, devno):
+        _Struct.get(c_pcminfo).devno = _value(devno)
+
+    def snd_pcm_info_set_subdevice(self, c_pcminfo, subdevice):
+        _Struct.get(c_pcminfo).subdevice = _value(subdevice)
+
+    def snd_pcm_info_set_stream(self, c_pcminfo, stream):
+        _Struct.get(c_pcminfo).stream = _value(stream)
+
+    def snd_pcm_info_get_id(self, c_pcminfo):
+        return _Struct.get(c_pcminfo).device["id"].encode()
+
+    def snd_pcm_info_get_name(self, c_pcminfo):
+        device = _Struct.get(c_pcminfo).device
+        return device.get("name", device["id"]).encode()
+
+    def snd_pcm_info_get_subdevices_count(self, c_pcminfo):
+        return _Struct.get(c_pcminfo).device.get("subdevices", 1)
+
+    def snd_pcm_info_get_subdevice_name(self, c_pcminfo):
+        return ("subdevice #%i" % _Struct.get(c_pcminfo).subdevice).encode()
+
+    # PCM
+
+    def snd_pcm_open(self, c_pcm, name, stream, mode):
+        cardname, _, devno = _value(name).decode().partition(",")
+        card = self._find_card(cardname)
+        err = self._call("snd_pcm_open", card)
+        device = self._find_device(card, int(devno or 0)) if card else None
+        stream = _value(stream)
+
+        if device is None or self._caps(device, stream) is None:
+            return -errno.ENOENT
+        elif err:
+            return err
+        elif device.get("busy"):
+            return -errno.EBUSY
+
+        _deref(c_pcm).value = _Pcm(card, device, stream).handle
+        return 0
+
+    def snd_pcm_nonblock(self, c_pcm, nonblock):
+        return self._call("snd_pcm_nonblock", _Pcm.get(c_pcm).card)
+
+    def snd_pcm_close(self, c_pcm):
+        pcm = _Pcm.get(c_pcm)
+        self._call("snd_pcm_close", pcm.card)
+        pcm.release()
+        return 0
+
+    # Hardware parameters
+
+    def snd_pcm_hw_params_any(self, c_pcm, c_params):
+        pcm = _Pcm.get(c_pcm)
+        err = self._call("snd_pcm_hw_params_any", pcm.card)
+
+        if not err:
+            params = _Struct.get(c_params)
+            params.card = pcm.card
+            params.caps = self._caps(pcm.device, pcm.stream)
+
+        return err
+
+    def snd_pcm_hw_params_copy(self, c_dst, c_src):
+        src = _Struct.get(c_src)
+        dst = _Struct.get(c_dst)
+        dst.card = src.card
+        dst.caps = dict(src.caps)
+
+    def _get(self, name, param, c_params, c_val, c_dir=None, pos=0):
+        params = _Struct.get(c_params)
+        err = self._call(name, params.card)
+
+        if not err:
+            value, dir = _bound(params.caps[param], pos)
+            _deref(c_val).value = value
+
+            if c_dir is not None:
+                _deref(c_dir).value = dir
+
+        return err
+
+    def _test(self, name, param, c_params, value):
+        params = _Struct.get(c_params)
+        err = self._call(name, params.card)
+        return err or (0 if _value(value) in params.caps[param] else -errno.EINVAL)
+
+    def _set_min(self, name, param, c_params, c_val, c_dir=None):
+        params = _Struct.get(c_params)
+        err = self._call(name, params.card)
+        c_val = _deref(c_val)
+        values = _narrow_min(params.caps[param], c_val.value)
+
+        if err:
+            return err
+        elif not values:
+            return -errno.EINVAL
+
+        params.caps[param] = values
+        c_val.value, dir = _bound(values, 0)
+
+        if c_dir is not None:
+            _deref(c_dir).value = dir
+
+        return 0
+
+    def snd_pcm_hw_params_get_channels_min(self, c_params, c_val):
+        return self._get("snd_pcm_hw_params_get_channels_min", "channels", c_params, c_val)
+
+    def snd_pcm_hw_params_get_channels_max(self, c_params, c_val):
+        return self._get("snd_pcm_hw_params_get_channels_max", "channels", c_params, c_val, pos=-1)
+
+    def snd_pcm_hw_params_test_channels(self, c_pcm, c_params, value):
+        return self._test("snd_pcm_hw_params_test_channels", "channels", c_params, value)
+
+    def snd_pcm_hw_params_set_channels_min(self, c_pcm, c_params, c_val):
+        return self._set_min("snd_pcm_hw_params_set_channels_min", "channels", c_params, c_val)
+
+    def snd_pcm_hw_params_get_rate_min(self, c_params, c_val, c_dir):
+        return self._get("snd_pcm_hw_params_get_rate_min", "rates", c_params, c_val, c_dir)
+
+    def snd_pcm_hw_params_get_rate_max(self, c_params, c_val, c_dir):
+        return self._get("snd_pcm_hw_params_get_rate_max", "rates", c_params, c_val, c_dir, -1)
+
+    def snd_pcm_hw_params_test_rate(self, c_pcm, c_params, value, dir):
+        return self._test("snd_pcm_hw_params_test_rate", "rates", c_params, value)
+
+    def snd_pcm_hw_params_set_rate_min(self, c_pcm, c_params, c_val, c_dir):
+        return self._set_min("snd_pcm_hw_params_set_rate_min", "rates", c_params, c_val, c_dir)
+
+    def snd_pcm_hw_params_get_periods_min(self, c_params, c_val, c_dir):
+        return self._get("snd_pcm_hw_params_get_periods_min", "periods", c_params, c_val, c_dir)
+
+    def snd_pcm_hw_params_get_periods_max(self, c_params, c_val, c_dir):
+        return self._get(
+            "snd_pcm_hw_params_get_periods_max", "periods", c_params, c_val, c_dir, -1
+        )
+
+    def snd_pcm_hw_params_get_buffer_size_min(self, c_params, c_val):
+        return self._get("snd_pcm_hw_params_get_buffer_size_min", "buffer_sizes", c_params, c_val)
+
+    def snd_pcm_hw_params_get_buffer_size_max(self, c_params, c_val):
+        return self._get(
+            "snd_pcm_hw_params_get_buffer_size_max", "buffer_sizes", c_params, c_val, pos=-1
+        )
+
+    def snd_pcm_hw_params_test_buffer_size(self, c_pcm, c_params, value):
+        return self._test("snd_pcm_hw_params_test_buffer_size", "buffer_sizes", c_params, value)
+
+    def snd_pcm_hw_params_set_buffer_size_min(self, c_pcm, c_params, c_val):
+        return self._set_min(
+            "snd_pcm_hw_params_set_buffer_size_min", "buffer_sizes", c_params, c_val
+        )
+
+    # Sample formats
+
+    def snd_pcm_hw_params_get_format_mask(self, c_params, c_fmask):
+        from .alsainfo import SndPcmFormat
+
+        params = _Struct.get(c_params)
+        self._call("snd_pcm_hw_params_get_format_mask", params.card)
+        _Struct.get(c_fmask).caps = {SndPcmFormat[name] for name in params.caps["formats"]}
+
+    def snd_pcm_format_mask_test(self, c_fmask, fmt):
+        return 1 if _value(fmt) in _Struct.get(c_fmask).caps else 0
+
+    def snd_pcm_format_name(self, fmt):
+        from .alsainfo import SndPcmFormat
+
+        return SndPcmFormat(_value(fmt)).name.encode()
+
+
+# Mark return types like those of the ctypes functions of the real library
+for _name, _func in list(vars(FakeLibAsound).items()):
+    if _name.startswith("snd_"):
+        _func.restype = c_int
+
+for _name in (
+    "snd_asoundlib_version",
+    "snd_ctl_card_info_get_id",
+    "snd_ctl_card_info_get_name",
+    "snd_ctl_elem_info_get_item_name",
+    "snd_ctl_event_elem_get_name",
+    "snd_pcm_format_name",
+    "snd_seq_client_info_get_name",
+    "snd_seq_port_info_get_name",
+    "snd_pcm_info_get_id",
+    "snd_pcm_info_get_name",
+    "snd_pcm_info_get_subdevice_name",
+    "snd_strerror",
+):
+    getattr(FakeLibAsound, _name).restype = c_char_p
+
+for _name in (
+    "snd_ctl_elem_info_set_id",
+    "snd_ctl_elem_info_set_item",
+    "snd_ctl_elem_value_set_id",
+    "snd_ctl_event_elem_get_id",
+    "snd_seq_client_info_set_client",
+    "snd_seq_port_info_set_client",
+    "snd_seq_port_info_set_port",
+    "snd_pcm_hw_params_copy",
+    "snd_pcm_hw_params_get_format_mask",
+):
+    getattr(FakeLibAsound, _name).restype = None
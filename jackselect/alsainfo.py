@@ -1,12 +1,21 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import argparse
+import errno
+import json
 import logging
+import os
+import re
 import sys
 from collections import namedtuple
 from ctypes import (
+    Structure,
     c_char_p,
     c_int,
+    c_long,
+    c_longlong,
+    c_short,
     c_uint,
     c_ulong,
     c_void_p,
@@ -16,13 +25,23 @@ from ctypes import (
 )
 from enum import IntEnum
 from textwrap import indent
+from time import perf_counter
+from types import MappingProxyType
 
 
 log = logging.getLogger(__name__)
 
 
 class LibAsoundError(Exception):
-    pass
+    def __init__(self, msg, errno=None):
+        super().__init__(msg)
+        self.errno = errno
+
+
+class PollFd(Structure):
+    """``struct pollfd`` as filled in by the ``snd_*_poll_descriptors`` functions."""
+
+    _fields_ = [("fd", c_int), ("events", c_short), ("revents", c_short)]
 
 
 class SndPcmStream(IntEnum):
@@ -198,25 +217,130 @@ PCM_RATES = (
     192000,
 )
 PCM_BUFFER_SIZES = (32, 64, 128, 256, 512, 1024, 2048, 4096)
+# Bit values of the sample rates / buffer sizes in capability bitmasks
+PCM_RATE_BITS = {rate: 1 << i for i, rate in enumerate(PCM_RATES)}
+PCM_BUFFER_SIZE_BITS = {size: 1 << i for i, size in enumerate(PCM_BUFFER_SIZES)}
+# ALSA names of all sample formats, which are the same as the enum member names
+PCM_FORMAT_NAMES = {fmt: fmt.name for fmt in SndPcmFormat}
 SND_PCM_NONBLOCK = 1
+PROBE_METHODS = ("range", "exhaustive")
+
+ALSA_BACKEND_ENV = "JACKSELECT_ALSA_BACKEND"
+PROC_ASOUND = "/proc/asound"
+
+
+def load_libasound():
+    """Load the libasound shared library and set up function return types."""
+    lib = cdll.LoadLibrary("libasound.so.2")
+    lib.snd_ctl_card_info_get_id.restype = c_char_p
+    lib.snd_ctl_card_info_get_name.restype = c_char_p
+    lib.snd_ctl_event_elem_get_id.restype = None
+    lib.snd_ctl_event_elem_get_mask.restype = c_uint
+    lib.snd_ctl_event_elem_get_name.restype = c_char_p
+    lib.snd_ctl_elem_info_get_item_name.restype = c_char_p
+    lib.snd_ctl_elem_info_set_id.restype = None
+    lib.snd_ctl_elem_info_set_item.restype = None
+    lib.snd_ctl_elem_value_get_boolean.restype = c_long
+    lib.snd_ctl_elem_value_get_enumerated.restype = c_uint
+    lib.snd_ctl_elem_value_get_integer.restype = c_long
+    lib.snd_ctl_elem_value_get_integer64.restype = c_longlong
+    lib.snd_ctl_elem_value_set_id.restype = None
+    lib.snd_seq_client_info_get_name.restype = c_char_p
+    lib.snd_seq_client_info_set_client.restype = None
+    lib.snd_seq_port_info_get_capability.restype = c_uint
+    lib.snd_seq_port_info_get_name.restype = c_char_p
+    lib.snd_seq_port_info_get_type.restype = c_uint
+    lib.snd_seq_port_info_set_client.restype = None
+    lib.snd_seq_port_info_set_port.restype = None
+    lib.snd_pcm_hw_params_copy.restype = None
+    lib.snd_pcm_hw_params_get_format_mask.restype = None
+    lib.snd_pcm_info_get_id.restype = c_char_p
+    lib.snd_pcm_info_get_name.restype = c_char_p
+    lib.snd_pcm_info_get_subdevice_name.restype = c_char_p
+    lib.snd_pcm_format_name.restype = c_char_p
+    lib.snd_strerror.restype = c_char_p
+    lib.snd_asoundlib_version.restype = c_char_p
+    return lib
+
+
+def load_backend(spec=None):
+    """Return the backend object providing the libasound functions.
+
+    ``spec`` is ``"libasound"`` for the real library, ``"fake"`` for a
+    simulated backend with generated cards or ``"fake:<path>"`` for a
+    simulated backend with the cards described in the given JSON file (see
+    ``jackselect.alsafake``). If ``spec`` is None, the value of the
+    environment variable ``JACKSELECT_ALSA_BACKEND`` is used, which defaults
+    to ``"libasound"``.
+
+    """
+    if spec is None:
+        spec = os.environ.get(ALSA_BACKEND_ENV, "libasound")
+
+    name, _, arg = spec.partition(":")
+
+    if name == "libasound":
+        return load_libasound()
+    elif name == "fake":
+        from .alsafake import FakeLibAsound
+
+        return FakeLibAsound.from_file(arg) if arg else FakeLibAsound.generate()
+
+    raise ValueError("Unknown ALSA backend: {}".format(spec))
+
+
+def set_backend(backend):
+    """Set the backend object used for all libasound function calls.
+
+    Returns the previously used backend.
+
+    """
+    global _lib
+    old, _lib = _lib, backend
+    return old
+
+
+_lib = load_backend()
+
+
+def get_backend():
+    """Return the backend object currently used for libasound function calls."""
+    return _lib
+
 
-_lib = cdll.LoadLibrary("libasound.so.2")
-_lib.snd_ctl_card_info_get_id.restype = c_char_p
-_lib.snd_ctl_card_info_get_name.restype = c_char_p
-_lib.snd_pcm_hw_params_get_format_mask.restype = None
-_lib.snd_pcm_info_get_id.restype = c_char_p
-_lib.snd_pcm_info_get_name.restype = c_char_p
-_lib.snd_pcm_info_get_subdevice_name.restype = c_char_p
-_lib.snd_pcm_format_name.restype = c_char_p
-_lib.snd_strerror.restype = c_char_p
+def get_alsa_lib_version():
+    """Return version of the alsa-lib shared library as a string."""
+    return _lib.snd_asoundlib_version().decode()
+
+
+def values_to_mask(values, bits):
+    """Return bitmask of given values using the bit values from the ``bits`` dict."""
+    mask = 0
+
+    for value in values:
+        mask |= bits[value]
+
+    return mask
+
+
+def mask_to_values(mask, bits):
+    """Return tuple of the values from the ``bits`` dict, whose bits are set in ``mask``."""
+    return tuple(value for value, bit in bits.items() if mask & bit)
 
 
 def decode_format_mask(fmask):
-    return (
-        (fmt, _lib.snd_pcm_format_name(c_int(fmt)).decode())
-        for fmt in SndPcmFormat
-        if _lib.snd_pcm_format_mask_test(fmask, c_int(fmt)) > 0
-    )
+    """Return bitmask of the sample formats set in an ALSA format mask structure.
+
+    Bit ``n`` of the result is set, if the format with value ``n`` is set.
+
+    """
+    mask = 0
+
+    for fmt in SndPcmFormat:
+        if _lib.snd_pcm_format_mask_test(fmask, c_int(fmt)) > 0:
+            mask |= 1 << fmt
+
+    return mask
 
 
 def check_call(fn, args, msg="{errmsg}", **kwargs):
@@ -225,7 +349,7 @@ def check_call(fn, args, msg="{errmsg}", **kwargs):
         if "{errmsg}" not in msg:
             msg += " {errmsg}"
         errmsg = _lib.snd_strerror(err).decode("utf-8")
-        raise LibAsoundError(msg.format(errmsg=errmsg, **kwargs))
+        raise LibAsoundError(msg.format(errmsg=errmsg, **kwargs), err)
 
 
 class AlsaCard(namedtuple("AlsaCard", ("cardno", "id", "name", "devices"))):
@@ -240,6 +364,19 @@ class AlsaCard(namedtuple("AlsaCard", ("cardno", "id", "name", "devices"))):
         s += "])"
         return s
 
+    def to_dict(self):
+        """Return card info as a dict suitable for serialisation to JSON."""
+        card = self._asdict()
+        card["devices"] = [dev.to_dict() for dev in self.devices]
+        return card
+
+    @classmethod
+    def from_dict(cls, card):
+        """Create card info from a dict as returned by ``to_dict``."""
+        card = dict(card)
+        card["devices"] = [AlsaDevice.from_dict(dev) for dev in card["devices"]]
+        return cls(**card)
+
 
 class AlsaDevice(
     namedtuple(
@@ -249,15 +386,31 @@ class AlsaDevice(
             "id",
             "name",
             "stream",
-            "buffer_sizes",
+            "buffer_size_mask",
             "periods",
             "channels",
-            "rates",
-            "formats",
+            "rate_mask",
+            "format_mask",
             "subdevices",
+            "stale",
         ),
+        defaults=(False,),
     )
 ):
+    """Capabilities of an ALSA PCM device for one stream direction.
+
+    The supported buffer sizes (from ``PCM_BUFFER_SIZES``), sample rates (from
+    ``PCM_RATES``) and sample formats are stored as integer bitmasks (see
+    ``PCM_BUFFER_SIZE_BITS``, ``PCM_RATE_BITS`` and ``decode_format_mask``).
+    Use the ``supports_*`` methods to test for a value or the ``buffer_sizes``,
+    ``rates`` and ``formats`` properties to get the supported values as tuples.
+
+    A capability is None, if it could not be probed. If ``stale`` is true,
+    the device was busy when probing it and the capabilities were carried
+    over from the last successful probe, if there was one.
+
+    """
+
     __slots__ = ()
 
     def __repr__(self):
@@ -265,344 +418,1386 @@ class AlsaDevice(
         for name, value in self._asdict().items():
             if name == "stream":
                 value = str(value)
-            elif name == "formats" and value is not None:
-                value = tuple(f[1] for f in value)
+            elif name == "buffer_size_mask":
+                name, value = "buffer_sizes", self.buffer_sizes
+            elif name == "rate_mask":
+                name, value = "rates", self.rates
+            elif name == "format_mask":
+                name = "formats"
+                value = None if value is None else tuple(f[1] for f in self.formats)
 
             s += "    {}: {},\n".format(name, value)
 
         s += ")"
         return s
 
+    @property
+    def buffer_sizes(self):
+        """Return tuple of supported buffer sizes or None if unknown."""
+        if self.buffer_size_mask is not None:
+            return mask_to_values(self.buffer_size_mask, PCM_BUFFER_SIZE_BITS)
 
-def get_cards(stream=SndPcmStream.PLAYBACK):
-    if stream not in SndPcmStream:
-        raise Exception("Unknown stream type: {}".format(stream))
+    @property
+    def rates(self):
+        """Return tuple of supported sample rates or None if unknown."""
+        if self.rate_mask is not None:
+            return mask_to_values(self.rate_mask, PCM_RATE_BITS)
 
-    cards = []
+    @property
+    def formats(self):
+        """Return tuple of ``(SndPcmFormat, name)`` of supported sample formats or None."""
+        if self.format_mask is not None:
+            return tuple(
+                (fmt, name)
+                for fmt, name in PCM_FORMAT_NAMES.items()
+                if self.format_mask & (1 << fmt)
+            )
+
+    @property
+    def complete(self):
+        """Return whether all capabilities are probed and not carried over from a busy device."""
+        return not self.stale and None not in (
+            self.buffer_size_mask,
+            self.periods,
+            self.channels,
+            self.rate_mask,
+            self.format_mask,
+        )
+
+    def supports_buffer_size(self, size):
+        """Return whether buffer size is supported, or None if this is unknown.
+
+        Only sizes in ``PCM_BUFFER_SIZES`` are probed, for all other sizes None
+        is returned.
+
+        """
+        bit = PCM_BUFFER_SIZE_BITS.get(size)
+
+        if bit is not None and self.buffer_size_mask is not None:
+            return bool(self.buffer_size_mask & bit)
+
+    def supports_rate(self, rate):
+        """Return whether sample rate is supported, or None if this is unknown.
+
+        Only rates in ``PCM_RATES`` are probed, for all other rates None is
+        returned.
+
+        """
+        bit = PCM_RATE_BITS.get(rate)
+
+        if bit is not None and self.rate_mask is not None:
+            return bool(self.rate_mask & bit)
+
+    def supports_format(self, fmt):
+        """Return whether given ``SndPcmFormat`` is supported, or None if this is unknown."""
+        if self.format_mask is not None:
+            return bool(self.format_mask & (1 << fmt))
+
+    def to_dict(self):
+        """Return device info as a dict suitable for serialisation to JSON."""
+        dev = self._asdict()
+        dev["stream"] = int(self.stream)
+        return dev
+
+    @classmethod
+    def from_dict(cls, dev):
+        """Create device info from a dict as returned by ``to_dict``."""
+        dev = dict(dev)
+        dev["stream"] = SndPcmStream(dev["stream"])
+
+        for name in ("periods", "channels"):
+            if dev[name] is not None:
+                dev[name] = tuple(dev[name])
+
+        dev["subdevices"] = list(dev["subdevices"])
+        return cls(**dev)
+
+
+class AlsaDeviceRef(namedtuple("AlsaDeviceRef", ("card", "device"))):
+    """Reference to an ``AlsaCard`` and one of its devices as found by a device name lookup.
+
+    For card-level device names (e.g. ``hw:0``), ``device`` is the card's PCM
+    device #0, which ALSA uses by default, or None if the card has no such
+    device.
+
+    """
+
+    __slots__ = ()
+
+
+def build_device_index(cards):
+    """Return a read-only dict mapping all ALSA device names of given cards to their devices.
+
+    The keys are all the forms of ``hw`` device names, which can be used to
+    refer to a card or one of its devices, i.e. ``hw:<cardno>``,
+    ``hw:<card id>``, ``hw:<cardno>,<devno>``, ``hw:<card id>,<devno>`` and
+    ``hw:<card id>,<device id>``. The values are ``AlsaDeviceRef`` instances.
+
+    Cards without devices are not included.
+
+    """
+    index = {}
+
+    for card in cards:
+        if not card.devices:
+            continue
+
+        dev0 = next((dev for dev in card.devices if dev.devno == 0), None)
+        index["hw:%i" % card.cardno] = index["hw:%s" % card.id] = AlsaDeviceRef(card, dev0)
+
+        for dev in card.devices:
+            ref = AlsaDeviceRef(card, dev)
+            index["hw:%i,%i" % (card.cardno, dev.devno)] = ref
+            index["hw:%s,%i" % (card.id, dev.devno)] = ref
+            index["hw:%s,%s" % (card.id, dev.id)] = ref
+
+    return MappingProxyType(index)
+
+
+def has_stale_devices(cards):
+    """Return whether given (playback, capture) card info tuple has any stale devices.
+
+    Cards with stale devices, i.e. devices which were busy when probing
+    them, are not considered probed, so they are probed again later.
+
+    """
+    return any(dev.stale for card in cards for dev in card.devices)
+
+
+def get_card_numbers():
+    """Return list of the numbers of all ALSA sound cards present."""
+    cardnos = []
     c_card = c_int(-1)
-    c_dev = c_int(-1)
+
+    while True:
+        _lib.snd_card_next(byref(c_card))
+        if c_card.value < 0:
+            log.debug("End of card enumeration list reached.")
+            break
+
+        cardnos.append(c_card.value)
+
+    return cardnos
+
+
+def _probe_values(set_min, c_pcm_p, c_params_p, candidates, c_type=c_uint, has_dir=False):
+    """Return tuple of those values from sorted ``candidates`` supported by a PCM device.
+
+    Instead of testing each candidate separately, ``set_min`` (one of the
+    ``snd_pcm_hw_params_set_<param>_min`` functions) is used to restrict the
+    configuration space to values greater or equal to the next candidate. The
+    refined minimum then is the next supported value, so all candidates below
+    it can be skipped with no further calls. ``c_params_p`` is narrowed in the
+    process, so it should point to a scratch copy of the configuration space.
+
+    """
+    supported = []
+    c_val = c_type()
+    c_dir = c_int()
+    i = 0
+
+    while i < len(candidates):
+        c_val.value = candidates[i]
+        c_dir.value = 0
+        args = (c_pcm_p, c_params_p, byref(c_val)) + ((byref(c_dir),) if has_dir else ())
+
+        if set_min(*args) < 0:
+            # no supported value >= candidate
+            break
+
+        # refined minimum is an open interval boundary, i.e. not supported
+        value = c_val.value + (1 if c_dir.value > 0 else 0)
+
+        while i < len(candidates) and candidates[i] < value:
+            i += 1
+
+        if i < len(candidates) and candidates[i] == value:
+            supported.append(value)
+            i += 1
+
+    return tuple(supported)
+
+
+class ProbeContext:
+    """ALSA info and parameter structures used for probing cards and PCM devices.
+
+    The structures are allocated once when the context is created and are
+    re-used for all cards and devices probed with it. Use the context as a
+    context manager or call ``close`` to free them again.
+
+    If ``timings`` is true, the time spent in each phase of probing each card
+    and device is recorded in the ``timings`` list (see ``lap_timer``).
+
+    """
+
+    _structs = (
+        ("card_info", "snd_ctl_card_info"),
+        ("pcm_info", "snd_pcm_info"),
+        ("hw_params", "snd_pcm_hw_params"),
+        ("hw_params_scratch", "snd_pcm_hw_params"),
+        ("format_mask", "snd_pcm_format_mask"),
+    )
+
+    def __init__(self, timings=False):
+        self.timings = [] if timings else None
+        self._allocated = []
+
+        try:
+            for attr, struct in self._structs:
+                ptr = c_void_p()
+                check_call(
+                    getattr(_lib, struct + "_malloc"),
+                    (byref(ptr),),
+                    "Could not allocate memory for {}_t.".format(struct),
+                )
+                self._allocated.append((struct, ptr))
+                setattr(self, attr, ptr)
+        except LibAsoundError:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def lap_timer(self, start=None, **key):
+        """Return a function to record the time spent in named probe phases.
+
+        Each call of the returned function with a phase name adds the time
+        passed since the previous call (or since the creation of the function)
+        to the time recorded for this phase. The phase times are stored in a
+        dict under the key ``phases`` in a new record in ``timings``, which
+        also contains the given keyword arguments.
+
+        The first phase starts at ``start`` (a ``time.perf_counter`` value),
+        if given, or when the function is created. If timing is not enabled, a
+        function doing nothing is returned.
+
+        """
+        if self.timings is None:
+            return lambda phase: None
+
+        phases = {}
+        self.timings.append(dict(key, phases=phases))
+        last = perf_counter() if start is None else start
+
+        def lap(phase):
+            nonlocal last
+            now = perf_counter()
+            phases[phase] = phases.get(phase, 0.0) + now - last
+            last = now
+
+        return lap
+
+    def close(self):
+        """Free all allocated structures."""
+        while self._allocated:
+            struct, ptr = self._allocated.pop()
+            getattr(_lib, struct + "_free")(ptr)
+
+
+def _get_procfs():
+    return getattr(_lib, "procfs", None) or PROC_ASOUND
+
+
+def is_pcm_busy(card_id, devno, stream, procfs=None):
+    """Return whether all subdevices of a PCM device are in use according to procfs.
+
+    Returns None if the status of the subdevices can not be determined.
+    ``procfs`` defaults to the same directory as for ``enumerate_cards``.
+
+    """
+    suffix = "p" if stream == SndPcmStream.PLAYBACK else "c"
+    pcmdir = os.path.join(procfs or _get_procfs(), card_id, "pcm%i%s" % (devno, suffix))
+
+    try:
+        subdirs = [entry for entry in os.listdir(pcmdir) if re.match(r"sub\d+$", entry)]
+    except OSError:
+        return None
+
+    if not subdirs:
+        return None
+
+    for subdir in subdirs:
+        status = _read_proc_file(os.path.join(pcmdir, subdir, "status"))
+
+        if status is None:
+            return None
+        elif status.strip() == "closed":
+            return False
+
+    return True
+
+
+def _probe_pcm_device(ctx, c_handle_p, card_id, devno, stream, method="range", previous=None):
+    """Probe capabilities of a PCM device for given stream direction.
+
+    ``ctx`` is the ``ProbeContext`` providing the ALSA structures to use.
+    ``c_handle_p`` must be an open control handle for the card with the given
+    id. Returns an ``AlsaDevice`` instance or None, if the card has no PCM
+    device with given number for the given stream direction.
+
+    If the device is busy, i.e. in use by another application like JACK, it is
+    not opened. Instead the capabilities of the ``previous`` ``AlsaDevice``
+    record for this device are returned, if given, or None for all of them,
+    and the record is flagged as ``stale``. Whether the device is busy is
+    checked via procfs (see ``is_pcm_busy``) or, if that is not possible,
+    by trying to open it.
+
+    ``method`` selects how the supported channel counts, sample rates and
+    buffer sizes are determined. ``"range"`` (the default) uses refinement of
+    the configuration space to skip unsupported values (see ``_probe_values``),
+    ``"exhaustive"`` tests every candidate value separately.
+
+    """
     c_dir = c_int(0)
     c_min = c_uint()
     c_max = c_uint()
     c_min_long = c_ulong()
     c_max_long = c_ulong()
-    c_handle_p = c_void_p()
     c_pcm_p = c_void_p()
-    c_info_p = c_void_p()
-    c_pcminfo_p = c_void_p()
-    c_fmask_p = c_void_p()
-    c_params_p = c_void_p()
+    c_pcminfo_p = ctx.pcm_info
+    c_fmask_p = ctx.format_mask
+    c_params_p = ctx.hw_params
+    c_scratch_p = ctx.hw_params_scratch
 
     s_stream = "playback" if stream == SndPcmStream.PLAYBACK else "capture"
+    lap = ctx.lap_timer(card=card_id, device=devno, stream=s_stream)
 
-    # card enumeration
-    while True:
-        _lib.snd_card_next(byref(c_card))
-        if c_card.value < 0:
-            log.debug("End of card enumeration list reached.")
-            break
+    _lib.snd_pcm_info_set_device(c_pcminfo_p, c_int(devno))
+    _lib.snd_pcm_info_set_subdevice(c_pcminfo_p, 0)
+    _lib.snd_pcm_info_set_stream(c_pcminfo_p, c_int(stream))
 
-        hwdev = "hw:{}".format(c_card.value)
-        b_hwdev = create_string_buffer(hwdev.encode())
+    err = _lib.snd_ctl_pcm_info(c_handle_p, c_pcminfo_p)
+    if err < 0:
+        errmsg = _lib.snd_strerror(err).decode("utf-8")
+        log.debug(
+            "Could not get info for PCM %s device #%i. %s",
+            s_stream,
+            devno,
+            errmsg,
+        )
+        return None
+
+    device_id = bytes.decode(_lib.snd_pcm_info_get_id(c_pcminfo_p))
+    device_name = bytes.decode(_lib.snd_pcm_info_get_name(c_pcminfo_p))
+    log.debug(
+        'Discovered %s device #%i "%s" ("%s").',
+        s_stream,
+        devno,
+        device_id,
+        device_name,
+    )
 
-        err = _lib.snd_ctl_open(byref(c_handle_p), b_hwdev, c_card)
-        if err < 0:
-            _lib.snd_ctl_close(c_handle_p)
-            continue
+    # count subdevices
+    nsubd = _lib.snd_pcm_info_get_subdevices_count(c_pcminfo_p)
+    log.debug("Device has %i subdevice(s).", nsubd)
+
+    subdevices = []
+    lap("info")
+    # open sound device
+    hwdev = "hw:{},{}".format(card_id, devno)
+    b_hwdev = create_string_buffer(hwdev.encode("ascii"))
+    buffer_size_mask = periods = channels = rate_mask = format_mask = None
+    busy = is_pcm_busy(card_id, devno, stream)
+
+    try:
+        if busy:
+            msg = "PCM {} device '{}' is busy.".format(s_stream, hwdev)
+            raise LibAsoundError(msg, -errno.EBUSY)
 
         check_call(
-            _lib.snd_ctl_card_info_malloc,
-            (byref(c_info_p),),
-            "Could not allocate memory for snd_ctl_card_info_t.",
+            _lib.snd_pcm_open,
+            (byref(c_pcm_p), b_hwdev, c_int(stream), SND_PCM_NONBLOCK),
+            "Could not open PCM {stream} device '{dev}'.",
+            stream=s_stream,
+            dev=hwdev,
         )
-        _lib.snd_ctl_card_info(c_handle_p, c_info_p)
-
-        devices = []
-        card = AlsaCard(
-            cardno=c_card.value,
-            id=_lib.snd_ctl_card_info_get_id(c_info_p).decode(),
-            name=_lib.snd_ctl_card_info_get_name(c_info_p).decode(),
-            devices=devices,
-        )
-        log.debug('Discovered card #%i "%s" ("%s").', card.cardno, card.id, card.name)
-        cards.append(card)
+        check_call(_lib.snd_pcm_nonblock, (c_pcm_p, 1), "Nonblock setting error: ")
+    except LibAsoundError as exc:
+        lap("open")
+
+        if exc.errno == -errno.EBUSY:
+            busy = True
+            log.debug(str(exc))
+        else:
+            log.warning(str(exc))
+    else:
+        lap("open")
 
-        # device enumeration
-        while True:
-            _lib.snd_ctl_pcm_next_device(c_handle_p, byref(c_dev))
-            if c_dev.value < 0:
-                log.debug("End of device enumeration list reached.")
-                break
+        try:
+            # Get hardware parameter space
+            check_call(
+                _lib.snd_pcm_hw_params_any,
+                (c_pcm_p, c_params_p),
+                "Could not get params for {stream} device '{dev}'.",
+                stream=s_stream,
+                dev=hwdev,
+            )
+
+            lap("params")
 
+            # Get supported channel counts
             check_call(
-                _lib.snd_pcm_info_malloc,
-                (byref(c_pcminfo_p),),
-                "Could not allocate memory for snd_pcm_info_t.",
+                _lib.snd_pcm_hw_params_get_channels_min,
+                (c_params_p, byref(c_min)),
+                "Could not get minimum channels count.",
             )
-            _lib.snd_pcm_info_set_device(c_pcminfo_p, c_dev)
-            _lib.snd_pcm_info_set_subdevice(c_pcminfo_p, 0)
-            _lib.snd_pcm_info_set_stream(c_pcminfo_p, c_int(stream))
 
-            err = _lib.snd_ctl_pcm_info(c_handle_p, c_pcminfo_p)
-            if err < 0:
-                errmsg = _lib.snd_strerror(err).decode("utf-8")
-                log.debug(
-                    "Could not get info for PCM %s device #%i. %s",
-                    s_stream,
-                    c_dev.value,
-                    errmsg,
+            check_call(
+                _lib.snd_pcm_hw_params_get_channels_max,
+                (c_params_p, byref(c_max)),
+                "Could not get maximum channels count.",
+            )
+
+            log.debug("Min/max channels: %i, %i", c_min.value, c_max.value)
+            if method == "exhaustive":
+                channels = tuple(
+                    ch
+                    for ch in range(c_min.value, c_max.value + 1)
+                    if _lib.snd_pcm_hw_params_test_channels(c_pcm_p, c_params_p, ch) == 0
+                )
+            elif c_min.value == c_max.value:
+                channels = (c_min.value,)
+            else:
+                _lib.snd_pcm_hw_params_copy(c_scratch_p, c_params_p)
+                channels = _probe_values(
+                    _lib.snd_pcm_hw_params_set_channels_min,
+                    c_pcm_p,
+                    c_scratch_p,
+                    range(c_min.value, c_max.value + 1),
                 )
-                continue
 
-            device_id = bytes.decode(_lib.snd_pcm_info_get_id(c_pcminfo_p))
-            device_name = bytes.decode(_lib.snd_pcm_info_get_name(c_pcminfo_p))
-            log.debug(
-                'Discovered %s device #%i "%s" ("%s").',
-                s_stream,
-                c_dev.value,
-                device_id,
-                device_name,
+            lap("channels")
+
+            # Get supported sample rates
+            check_call(
+                _lib.snd_pcm_hw_params_get_rate_min,
+                (c_params_p, byref(c_min), byref(c_dir)),
+                "Could not get minimum sample rate.",
             )
 
-            # count subdevices
-            nsubd = _lib.snd_pcm_info_get_subdevices_count(c_pcminfo_p)
-            log.debug("Device has %i subdevice(s).", nsubd)
+            check_call(
+                _lib.snd_pcm_hw_params_get_rate_max,
+                (c_params_p, byref(c_max), byref(c_dir)),
+                "Could not get maximum sample rate.",
+            )
 
-            subdevices = []
-            # open sound device
-            hwdev = "hw:{},{}".format(card.id, c_dev.value)
-            b_hwdev = create_string_buffer(hwdev.encode("ascii"))
-            buffer_sizes = periods = channels = rates = formats = None
+            log.debug("Min/max sample rate: %i, %i", c_min.value, c_max.value)
+            if method == "exhaustive":
+                rates = (
+                    rate
+                    for rate in PCM_RATES
+                    if c_min.value <= rate <= c_max.value
+                    and _lib.snd_pcm_hw_params_test_rate(c_pcm_p, c_params_p, rate, 0) == 0
+                )
+            else:
+                _lib.snd_pcm_hw_params_copy(c_scratch_p, c_params_p)
+                rates = _probe_values(
+                    _lib.snd_pcm_hw_params_set_rate_min,
+                    c_pcm_p,
+                    c_scratch_p,
+                    [rate for rate in PCM_RATES if c_min.value <= rate <= c_max.value],
+                    has_dir=True,
+                )
+
+            rate_mask = values_to_mask(rates, PCM_RATE_BITS)
+            lap("rates")
 
+            # Get supported sample formats
             try:
                 check_call(
-                    _lib.snd_pcm_open,
-                    (byref(c_pcm_p), b_hwdev, c_int(stream), SND_PCM_NONBLOCK),
-                    "Could not open PCM {stream} device '{dev}'.",
-                    stream=s_stream,
-                    dev=hwdev,
+                    _lib.snd_pcm_hw_params_get_format_mask,
+                    (c_params_p, c_fmask_p),
+                    "Could not get sample formats.",
                 )
-                check_call(_lib.snd_pcm_nonblock, (c_pcm_p, 1), "Nonblock setting error: ")
+
             except LibAsoundError as exc:
-                log.warning(str(exc))
+                log.error(str(exc))
             else:
-                try:
-                    # Get hardware parameter space
-                    check_call(
-                        _lib.snd_pcm_hw_params_malloc,
-                        (byref(c_params_p),),
-                        "Could not allocate memory for snd_pcm_hw_params_t.",
-                    )
-                    check_call(
-                        _lib.snd_pcm_hw_params_any,
-                        (c_pcm_p, c_params_p),
-                        "Could not get params for {stream} device '{dev}'.",
-                        stream=s_stream,
-                        dev=hwdev,
-                    )
+                format_mask = decode_format_mask(c_fmask_p)
+                log.debug(
+                    "Sample formats: %s",
+                    ",".join(
+                        name for fmt, name in PCM_FORMAT_NAMES.items() if format_mask & (1 << fmt)
+                    ),
+                )
 
-                    # Get supported channel counts
-                    check_call(
-                        _lib.snd_pcm_hw_params_get_channels_min,
-                        (c_params_p, byref(c_min)),
-                        "Could not get minimum channels count.",
-                    )
+            lap("formats")
 
-                    check_call(
-                        _lib.snd_pcm_hw_params_get_channels_max,
-                        (c_params_p, byref(c_max)),
-                        "Could not get maximum channels count.",
-                    )
+            # Get supported period times
+            check_call(
+                _lib.snd_pcm_hw_params_get_periods_min,
+                (c_params_p, byref(c_min), byref(c_dir)),
+                "Could not get minimum periods count.",
+            )
 
-                    log.debug("Min/max channels: %i, %i", c_min.value, c_max.value)
-                    channels = tuple(
-                        ch
-                        for ch in range(c_min.value, c_max.value + 1)
-                        if _lib.snd_pcm_hw_params_test_channels(c_pcm_p, c_params_p, ch) == 0
-                    )
+            check_call(
+                _lib.snd_pcm_hw_params_get_periods_max,
+                (c_params_p, byref(c_max), byref(c_dir)),
+                "Could not get minimum periods count.",
+            )
 
-                    # Get supported sample rates
-                    check_call(
-                        _lib.snd_pcm_hw_params_get_rate_min,
-                        (c_params_p, byref(c_min), byref(c_dir)),
-                        "Could not get minimum sample rate.",
-                    )
+            log.debug("Min/max periods count: (%i, %i)", c_min.value, c_max.value)
+            periods = (c_min.value, c_max.value)
 
-                    check_call(
-                        _lib.snd_pcm_hw_params_get_rate_max,
-                        (c_params_p, byref(c_max), byref(c_dir)),
-                        "Could not get maximum sample rate.",
-                    )
+            lap("periods")
 
-                    log.debug("Min/max sample rate: %i, %i", c_min.value, c_max.value)
-                    rates = tuple(
-                        rate
-                        for rate in PCM_RATES
-                        if c_min.value <= rate <= c_max.value
-                        and _lib.snd_pcm_hw_params_test_rate(c_pcm_p, c_params_p, rate, 0) == 0
-                    )
+            # Get supported buffer sizes
+            check_call(
+                _lib.snd_pcm_hw_params_get_buffer_size_min,
+                (c_params_p, byref(c_min_long)),
+                "Could not get minimum buffer time.",
+            )
 
-                    # Get supported sample formats
-                    check_call(
-                        _lib.snd_pcm_format_mask_malloc,
-                        (byref(c_fmask_p),),
-                        "Could not allocate memory for snd_pcm_format_mask_t.",
-                    )
-                    try:
-                        check_call(
-                            _lib.snd_pcm_hw_params_get_format_mask,
-                            (c_params_p, c_fmask_p),
-                            "Could not get sample formats.",
-                        )
-
-                    except LibAsoundError as exc:
-                        log.error(str(exc))
-                    else:
-                        formats = tuple(decode_format_mask(c_fmask_p))
-                        log.debug("Sample formats: %s", ",".join(f[1] for f in formats))
-                    finally:
-                        _lib.snd_pcm_format_mask_free(c_fmask_p)
-
-                    # Get supported period times
-                    check_call(
-                        _lib.snd_pcm_hw_params_get_periods_min,
-                        (c_params_p, byref(c_min), byref(c_dir)),
-                        "Could not get minimum periods count.",
-                    )
+            check_call(
+                _lib.snd_pcm_hw_params_get_buffer_size_max,
+                (c_params_p, byref(c_max_long)),
+                "Could not get minimum buffer time.",
+            )
 
-                    check_call(
-                        _lib.snd_pcm_hw_params_get_periods_max,
-                        (c_params_p, byref(c_max), byref(c_dir)),
-                        "Could not get minimum periods count.",
-                    )
+            log.debug(
+                "Min/max buffer time: (%i, %i) us",
+                c_min_long.value,
+                c_max_long.value,
+            )
+            if method == "exhaustive":
+                buffer_sizes = (
+                    size
+                    for size in PCM_BUFFER_SIZES
+                    if c_min_long.value <= size <= c_max_long.value
+                    and _lib.snd_pcm_hw_params_test_buffer_size(c_pcm_p, c_params_p, size) == 0
+                )
+            else:
+                _lib.snd_pcm_hw_params_copy(c_scratch_p, c_params_p)
+                buffer_sizes = _probe_values(
+                    _lib.snd_pcm_hw_params_set_buffer_size_min,
+                    c_pcm_p,
+                    c_scratch_p,
+                    [
+                        size
+                        for size in PCM_BUFFER_SIZES
+                        if c_min_long.value <= size <= c_max_long.value
+                    ],
+                    c_type=c_ulong,
+                )
+
+            buffer_size_mask = values_to_mask(buffer_sizes, PCM_BUFFER_SIZE_BITS)
+            lap("buffer_sizes")
+
+            # List subdevices
+            for subd in range(0, nsubd):
+                _lib.snd_pcm_info_set_subdevice(c_pcminfo_p, c_int(subd))
+                sub_name = _lib.snd_pcm_info_get_subdevice_name(c_pcminfo_p).decode()
+                log.debug('Discovered subdevice: "%s"', sub_name)
+                subdevices.append(sub_name)
+
+            lap("subdevices")
+        except LibAsoundError as exc:
+            log.warning(exc)
+        finally:
+            _lib.snd_pcm_close(c_pcm_p)
+
+    # carry over records with any known capabilities, including those of USB
+    # devices enumerated from procfs (see ``enumerate_cards``)
+    if busy and previous is not None and any(
+        value is not None
+        for value in (
+            previous.buffer_size_mask,
+            previous.periods,
+            previous.channels,
+            previous.rate_mask,
+            previous.format_mask,
+        )
+    ):
+        log.debug("Using last known capabilities of busy device '%s'.", hwdev)
+        return previous._replace(id=device_id, name=device_name, stale=True)
+
+    return AlsaDevice(
+        devno=devno,
+        id=device_id,
+        name=device_name,
+        stream=stream,
+        buffer_size_mask=buffer_size_mask,
+        periods=periods,
+        channels=channels,
+        rate_mask=rate_mask,
+        format_mask=format_mask,
+        subdevices=subdevices,
+        stale=bool(busy),
+    )
 
-                    log.debug("Min/max periods count: (%i, %i)", c_min.value, c_max.value)
-                    periods = (c_min.value, c_max.value)
 
-                    # Get supported buffer sizes
-                    check_call(
-                        _lib.snd_pcm_hw_params_get_buffer_size_min,
-                        (c_params_p, byref(c_min_long)),
-                        "Could not get minimum buffer time.",
-                    )
+def probe_cards(
+    cardno=None, streams=tuple(SndPcmStream), method="range", ctx=None, previous=None
+):
+    """Probe ALSA sound cards and their PCM devices for given stream directions.
 
-                    check_call(
-                        _lib.snd_pcm_hw_params_get_buffer_size_max,
-                        (c_params_p, byref(c_max_long)),
-                        "Could not get minimum buffer time.",
-                    )
+    Each card and each of its PCM devices is only visited once and the card's
+    control handle and info is shared by the probes for all stream directions.
 
-                    log.debug(
-                        "Min/max buffer time: (%i, %i) us",
-                        c_min_long.value,
-                        c_max_long.value,
-                    )
-                    buffer_sizes = tuple(
-                        size
-                        for size in PCM_BUFFER_SIZES
-                        if c_min_long.value <= size <= c_max_long.value
-                        and _lib.snd_pcm_hw_params_test_buffer_size(c_pcm_p, c_params_p, size) == 0
+    Returns a list with a ``(playback, capture)`` tuple of ``AlsaCard``
+    instances for each card. The entry for a stream direction not given in
+    ``streams`` is None.
+
+    If ``cardno`` is given, only the card with this number is probed and the
+    returned list is empty if no such card exists.
+
+    See ``_probe_pcm_device`` for the possible values of ``method``.
+
+    If no ``ProbeContext`` is passed as ``ctx``, a new one is created for this
+    call and freed when it returns.
+
+    ``previous`` is a dict mapping card numbers to ``(playback, capture)``
+    tuples of ``AlsaCard`` instances from an earlier probe. The device records
+    of busy devices are carried over from them (see ``_probe_pcm_device``).
+
+    """
+    if method not in PROBE_METHODS:
+        raise ValueError("Unknown probe method: {}".format(method))
+
+    for stream in streams:
+        if stream not in SndPcmStream:
+            raise Exception("Unknown stream type: {}".format(stream))
+
+    if ctx is None:
+        with ProbeContext() as ctx:
+            return probe_cards(
+                cardno=cardno, streams=streams, method=method, ctx=ctx, previous=previous
+            )
+
+    cards = []
+    cardnos = get_card_numbers() if cardno is None else (cardno,)
+    c_dev = c_int(-1)
+    c_handle_p = c_void_p()
+    c_info_p = ctx.card_info
+
+    # card enumeration
+    for c_card in map(c_int, cardnos):
+        start = perf_counter()
+        hwdev = "hw:{}".format(c_card.value)
+        b_hwdev = create_string_buffer(hwdev.encode())
+
+        err = _lib.snd_ctl_open(byref(c_handle_p), b_hwdev, 0)
+        if err < 0:
+            log.debug("Could not open control interface of card #%i.", c_card.value)
+            continue
+
+        # only record timings of cards, which could be opened
+        lap = ctx.lap_timer(card=c_card.value, start=start)
+
+        try:
+            _lib.snd_ctl_card_info(c_handle_p, c_info_p)
+
+            card_id = _lib.snd_ctl_card_info_get_id(c_info_p).decode()
+            card_name = _lib.snd_ctl_card_info_get_name(c_info_p).decode()
+            log.debug('Discovered card #%i "%s" ("%s").', c_card.value, card_id, card_name)
+            devices = {stream: [] for stream in streams}
+            prev_devices = {}
+
+            for prev_card in (previous or {}).get(c_card.value) or ():
+                if prev_card is not None and prev_card.id == card_id:
+                    for dev in prev_card.devices:
+                        prev_devices[(dev.devno, dev.stream)] = dev
+
+            # device enumeration
+            while True:
+                _lib.snd_ctl_pcm_next_device(c_handle_p, byref(c_dev))
+                if c_dev.value < 0:
+                    log.debug("End of device enumeration list reached.")
+                    break
+
+                for stream in streams:
+                    device = _probe_pcm_device(
+                        ctx,
+                        c_handle_p,
+                        card_id,
+                        c_dev.value,
+                        stream,
+                        method,
+                        prev_devices.get((c_dev.value, stream)),
                     )
 
-                    # List subdevices
-                    for subd in range(0, nsubd):
-                        _lib.snd_pcm_info_set_subdevice(c_pcminfo_p, c_int(subd))
-                        sub_name = _lib.snd_pcm_info_get_subdevice_name(c_pcminfo_p).decode()
-                        log.debug('Discovered subdevice: "%s"', sub_name)
-                        subdevices.append(sub_name)
-                except LibAsoundError as exc:
-                    log.warning(exc)
-                finally:
-                    _lib.snd_pcm_close(c_pcm_p)
-                    _lib.snd_pcm_hw_params_free(c_params_p)
-                    _lib.snd_pcm_info_free(c_pcminfo_p)
-
-            devices.append(
-                AlsaDevice(
-                    devno=c_dev.value,
-                    id=device_id,
-                    name=device_name,
-                    stream=stream,
-                    buffer_sizes=buffer_sizes,
-                    periods=periods,
-                    channels=channels,
-                    rates=rates,
-                    formats=formats,
-                    subdevices=subdevices,
-                )
+                    if device:
+                        devices[stream].append(device)
+        finally:
+            _lib.snd_ctl_close(c_handle_p)
+            lap("total")
+
+        cards.append(
+            tuple(
+                AlsaCard(cardno=c_card.value, id=card_id, name=card_name, devices=devices[stream])
+                if stream in devices
+                else None
+                for stream in SndPcmStream
             )
+        )
+
+    return cards
+
+
+def get_cards(stream=SndPcmStream.PLAYBACK, cardno=None, method="range"):
+    """Probe ALSA sound cards and their PCM devices for given stream direction.
+
+    If ``cardno`` is given, only the card with this number is probed and the
+    returned list is empty if no such card exists.
+
+    """
+    return [
+        cards[stream] for cards in probe_cards(cardno=cardno, streams=(stream,), method=method)
+    ]
+
+
+def _read_proc_file(path):
+    try:
+        with open(path, errors="replace") as fp:
+            return fp.read()
+    except OSError:
+        return None
+
+
+def _parse_proc_info(text):
+    """Return dict of the ``key: value`` lines of an ALSA procfs info file."""
+    info = {}
+
+    for line in text.splitlines():
+        key, sep, value = line.partition(":")
+
+        if sep:
+            info[key.strip()] = value.strip()
+
+    return info
+
+
+def _parse_usb_stream(text):
+    """Return capabilities per stream direction from a USB audio ``stream<N>`` procfs file.
+
+    Returns a dict mapping ``SndPcmStream`` values to dicts with the sets of
+    channel counts, sample rates and sample formats of all alternate settings
+    of the interface for this direction.
+
+    """
+    caps = {}
+    current = None
+
+    for line in text.splitlines():
+        stripped = line.strip()
+
+        if stripped in ("Playback:", "Capture:"):
+            stream = SndPcmStream.PLAYBACK if stripped == "Playback:" else SndPcmStream.CAPTURE
+            current = caps.setdefault(stream, {"channels": set(), "rates": set(), "formats": set()})
+            continue
+        elif current is None or ":" not in stripped:
+            continue
+
+        key, _, value = stripped.partition(":")
+        value = value.strip()
+
+        if key == "Channels" and value.isdigit():
+            current["channels"].add(int(value))
+        elif key == "Format":
+            for name in value.split(","):
+                fmt = SndPcmFormat.__members__.get(name.strip())
 
-        _lib.snd_ctl_close(c_handle_p)
-        _lib.snd_ctl_card_info_free(c_info_p)
+                if fmt is not None:
+                    current["formats"].add(fmt)
+        elif key == "Rates":
+            match = re.match(r"(\d+)\s*-\s*(\d+)", value)
+
+            if match:
+                # continuous rate range
+                low, high = int(match.group(1)), int(match.group(2))
+                current["rates"].update(rate for rate in PCM_RATES if low <= rate <= high)
+            else:
+                rates = (int(rate) for rate in value.split(",") if rate.strip().isdigit())
+                current["rates"].update(rate for rate in rates if rate in PCM_RATE_BITS)
+
+    return caps
+
+
+def _enumerate_pcm_device(carddir, devno, stream):
+    """Return ``AlsaDevice`` for PCM device from its procfs info or None if it has none."""
+    suffix = "p" if stream == SndPcmStream.PLAYBACK else "c"
+    pcmdir = os.path.join(carddir, "pcm%i%s" % (devno, suffix))
+    text = _read_proc_file(os.path.join(pcmdir, "info"))
+
+    if text is None:
+        return None
+
+    info = _parse_proc_info(text)
+    subdevices = []
+
+    for subd in range(int(info.get("subdevices_count", 0))):
+        subinfo = _read_proc_file(os.path.join(pcmdir, "sub%i" % subd, "info"))
+        subdevices.append(_parse_proc_info(subinfo or "").get("subname", ""))
+
+    channels = rate_mask = format_mask = None
+    stream_text = _read_proc_file(os.path.join(carddir, "stream%i" % devno))
+
+    if stream_text:
+        caps = _parse_usb_stream(stream_text).get(stream)
+
+        if caps:
+            channels = tuple(sorted(caps["channels"])) or None
+            rate_mask = values_to_mask(caps["rates"], PCM_RATE_BITS) if caps["rates"] else None
+            format_mask = sum(1 << fmt for fmt in caps["formats"]) or None
+
+    return AlsaDevice(
+        devno=devno,
+        id=info.get("id", ""),
+        name=info.get("name", ""),
+        stream=stream,
+        buffer_size_mask=None,
+        periods=None,
+        channels=channels,
+        rate_mask=rate_mask,
+        format_mask=format_mask,
+        subdevices=subdevices,
+    )
+
+
+def get_card_id(cardno, procfs=None):
+    """Return id of the card with given number from procfs or None if not found."""
+    card_id = _read_proc_file(os.path.join(procfs or _get_procfs(), "card%i" % cardno, "id"))
+    return card_id.strip() if card_id is not None else None
+
+
+def enumerate_cards(cardno=None, streams=tuple(SndPcmStream), procfs=None):
+    """List ALSA sound cards and their PCM devices from the ALSA procfs tree.
+
+    Unlike ``probe_cards``, this neither calls into alsa-lib nor opens any
+    control or PCM device, so it is fast and works for devices in use by
+    another application. The returned list has the same form as the one
+    returned by ``probe_cards``, but the capabilities of the devices are None,
+    i.e. unknown. Only for USB audio devices, the channel counts, sample rates
+    and sample formats are filled in from the interface's ``stream<N>`` file.
+
+    ``procfs`` defaults to the value of the ``procfs`` attribute of the ALSA
+    backend, if it has one (see ``jackselect.alsafake``), or to
+    ``/proc/asound``.
+
+    """
+    if procfs is None:
+        procfs = _get_procfs()
+
+    cards = []
+    card_names = {}
+
+    for line in (_read_proc_file(os.path.join(procfs, "cards")) or "").splitlines():
+        # e.g. " 0 [PCH            ]: HDA-Intel - HDA Intel PCH"
+        match = re.match(r"\s*(\d+)\s+\[.*\]:\s*.*? - (.*)$", line)
+
+        if match:
+            card_names[int(match.group(1))] = match.group(2).strip()
+
+    for num in sorted(card_names) if cardno is None else (cardno,):
+        carddir = os.path.join(procfs, "card%i" % num)
+        card_id = get_card_id(num, procfs)
+
+        if card_id is None:
+            log.debug("Card #%i not found in '%s'.", num, procfs)
+            continue
+        devices = {stream: [] for stream in streams}
+        devnos = set()
+
+        try:
+            entries = os.listdir(carddir)
+        except OSError:
+            entries = ()
+
+        for entry in entries:
+            match = re.match(r"pcm(\d+)[pc]$", entry)
+
+            if match:
+                devnos.add(int(match.group(1)))
+
+        for devno in sorted(devnos):
+            for stream in streams:
+                device = _enumerate_pcm_device(carddir, devno, stream)
+
+                if device:
+                    devices[stream].append(device)
+
+        log.debug('Enumerated card #%i "%s" from procfs.', num, card_id)
+        cards.append(
+            tuple(
+                AlsaCard(
+                    cardno=num,
+                    id=card_id,
+                    name=card_names.get(num, card_id),
+                    devices=devices[stream],
+                )
+                if stream in devices
+                else None
+                for stream in SndPcmStream
+            )
+        )
 
     return cards
 
 
+def compare_probe_methods(cardno=None):
+    """Probe cards with all probe methods and return list of differences found.
+
+    Each difference is reported as a tuple ``(cardno, devno, stream, name,
+    values)``, where ``values`` is a dict mapping probe method to the value
+    of the device capability ``name`` found with this method.
+
+    """
+    results = {method: probe_cards(cardno=cardno, method=method) for method in PROBE_METHODS}
+    diffs = []
+
+    for cards in zip(*results.values()):
+        for streamcards in zip(*cards):
+            for devices in zip(*(card.devices for card in streamcards)):
+                for name in ("channels", "rates", "buffer_sizes"):
+                    values = {
+                        method: getattr(dev, name) for method, dev in zip(PROBE_METHODS, devices)
+                    }
+
+                    if len(set(values.values())) > 1:
+                        dev = devices[0]
+                        diffs.append((streamcards[0].cardno, dev.devno, dev.stream, name, values))
+
+    return diffs
+
+
 class AlsaInfo:
-    def __init__(self, deferred=True):
+    """Cache of the PCM devices of all ALSA sound cards and their capabilities.
+
+    Probe results are stored per card, keyed by card number, so that single
+    cards can be re-probed or dropped when they change, without touching the
+    cached data of the other cards.
+
+    If a ``cache`` object is given (see ``jackselect.alsacache``), probe
+    results for cards, whose identity has not changed, are taken from it
+    instead of probing the card again, and new probe results are stored in it.
+
+    If ``lazy`` is true, cards not found in the cache are only listed from the
+    ALSA procfs tree (see ``enumerate_cards``) and the capabilities of their
+    devices are probed on demand (see ``probe_card`` and ``find_device``).
+
+    ``probe_func`` is the function used for probing cards and defaults to
+    ``probe_cards``. Pass a ``jackselect.alsaworker.IsolatedProbe`` instance
+    to probe in a child process.
+
+    """
+
+    def __init__(self, deferred=True, cache=None, lazy=False, probe_func=None):
+        self.cache = cache
+        self.lazy = lazy
+        self.probe_func = probe_func or probe_cards
+        self.readonly = False
+        self.generation = 0
+        self._playback = None
+        self._capture = None
+        self._index = {}
+        # numbers of the cards, whose device capabilities have been probed
+        self._probed = set()
+
         if not deferred:
-            _ = self.devices  # noqa
+            self.scan()
 
-    def _make_device_list(self, cards):
-        devs = []
-        for card in cards:
-            if not card.devices:
-                continue
+    @classmethod
+    def from_cards(cls, cards, generation=0, probed=None):
+        """Create a read-only snapshot from a dict of already probed cards.
+
+        ``cards`` maps card numbers to ``(playback, capture)`` tuples of
+        ``AlsaCard`` instances. The card data of the returned instance can
+        not be updated. ``probed`` is an iterable of the numbers of the cards,
+        whose device capabilities have been probed, and defaults to all cards.
+
+        """
+        info = cls()
+        info.readonly = True
+        info.generation = generation
+        info._playback = MappingProxyType({cardno: c[0] for cardno, c in cards.items()})
+        info._capture = MappingProxyType({cardno: c[1] for cardno, c in cards.items()})
+        info._probed = set(cards if probed is None else probed)
+        return info
+
+    def _get_cached(self, cardno):
+        if self.cache is not None:
+            cached = self.cache.get(cardno)
+
+            if cached:
+                log.debug("Using cached device info for card #%i.", cardno)
+                self._probed.add(cardno)
+                return cached
+
+    def _probe_card(self, cardno, ctx=None, full=None, use_cache=True):
+        cached = self._get_cached(cardno) if use_cache else None
+
+        if cached:
+            return cached
+
+        if not (full if full is not None else not self.lazy):
+            self._probed.discard(cardno)
+            enumerated = enumerate_cards(cardno=cardno)
+            return enumerated[0] if enumerated else None
+
+        previous = None
+
+        if self._playback is not None and cardno in self._playback:
+            previous = {cardno: (self._playback[cardno], self._capture[cardno])}
+
+        probed = self.probe_func(cardno=cardno, ctx=ctx, previous=previous)
+
+        if not probed:
+            return None
+
+        if self.cache is not None:
+            self.cache.put(cardno, *probed[0])
+
+        # cards with busy devices are probed again on the next access
+        if has_stale_devices(probed[0]):
+            self._probed.discard(cardno)
+        else:
+            self._probed.add(cardno)
+
+        return probed[0]
+
+    def _save_cache(self):
+        if self.cache is not None:
+            try:
+                self.cache.save()
+            except OSError as exc:
+                log.warning("Could not save ALSA device info cache: %s", exc)
+
+    def scan(self):
+        """Probe all sound cards for playback and capture devices.
+
+        In lazy mode, cards not found in the cache are only enumerated.
+
+        """
+        playback = {}
+        capture = {}
+        self._probed = set()
+
+        if self.lazy:
+            for enumerated in enumerate_cards():
+                cardno = enumerated[0].cardno
+                playback[cardno], capture[cardno] = self._get_cached(cardno) or enumerated
+        else:
+            with ProbeContext() as ctx:
+                for cardno in get_card_numbers():
+                    probed = self._probe_card(cardno, ctx)
+
+                    if probed:
+                        playback[cardno], capture[cardno] = probed
+
+        self._playback = playback
+        self._capture = capture
+        self._index = {}
+        self._save_cache()
+
+    def update_card(self, cardno):
+        """Re-probe the card with given number and update cached device info.
+
+        The card is probed even if it is found in the persistent cache, since
+        its state may have changed. If the card can not be found anymore, it
+        is removed from the cache.
+
+        """
+        # Not probed yet, will be probed completely on first access
+        if self._playback is None:
+            return
+
+        probed = self._probe_card(cardno, use_cache=False)
+
+        if probed:
+            log.debug("Updating device info for card #%i.", cardno)
+            self._playback[cardno], self._capture[cardno] = probed
+            self._save_cache()
+        elif self._playback.pop(cardno, None):
+            log.debug("Card #%i not found anymore, removing it.", cardno)
+            self._capture.pop(cardno, None)
+            self._probed.discard(cardno)
+
+        self._index = {}
+
+    def remove_card(self, cardno):
+        """Remove cached device info for the card with given number."""
+        for cards in (self._playback, self._capture):
+            if cards:
+                cards.pop(cardno, None)
+
+        self._probed.discard(cardno)
+        self._index = {}
+
+    def is_probed(self, cardno):
+        """Return whether the device capabilities of the card with given number are known."""
+        return cardno in self._probed
+
+    def probe_card(self, cardno):
+        """Probe device capabilities of the card with given number, if not done yet.
+
+        Returns True if the capabilities are known afterwards. Capabilities of
+        busy devices are carried over from the last probe, and the card is
+        probed again on the next call. The card data of read-only snapshots is
+        never probed.
+
+        """
+        if cardno in self._probed:
+            return True
+        elif self.readonly or self._playback is None or cardno not in self._playback:
+            return False
+
+        log.debug("Probing device capabilities of card #%i on demand.", cardno)
+        probed = self._probe_card(cardno, full=True)
+
+        if not probed:
+            return False
+
+        self._playback[cardno], self._capture[cardno] = probed
+        self._index = {}
+        self._save_cache()
+        return True
+
+    def get_card(self, key, stream=SndPcmStream.PLAYBACK):
+        """Return cached card info for given card number or id or None."""
+        if stream == SndPcmStream.PLAYBACK:
+            cards = self.playback_cards
+        else:
+            cards = self.capture_cards
+
+        if isinstance(key, int):
+            return cards.get(key)
+
+        for card in cards.values():
+            if card.id == key:
+                return card
+
+    def get_index(self, stream):
+        """Return index of device names for given stream direction.
+
+        See ``build_device_index`` for details. The index is built only once
+        after the card data has been probed or updated.
+
+        """
+        index = self._index.get(stream)
+
+        if index is None:
+            if stream == SndPcmStream.PLAYBACK:
+                cards = self.playback_cards
+            else:
+                cards = self.capture_cards
+
+            self._index[stream] = index = build_device_index(cards.values())
+
+        return index
+
+    def find_device(self, name, stream=None, probe=False):
+        """Look up ALSA device by name and return an ``AlsaDeviceRef`` or None.
+
+        If ``stream`` is None, the device is searched for playback first and
+        then for capture. If ``probe`` is true and the capabilities of the
+        device's card have not been probed yet, they are probed first (see
+        ``probe_card``).
 
-            devs.append("hw:%i" % card.cardno)
-            devs.append("hw:%s" % card.id)
+        """
+        for stream in SndPcmStream if stream is None else (stream,):
+            ref = self.get_index(stream).get(name)
+
+            if ref:
+                cardno = ref.card.cardno
+
+                if probe and not self.is_probed(cardno) and self.probe_card(cardno):
+                    ref = self.get_index(stream).get(name)
+
+                return ref
+
+    @property
+    def cards(self):
+        """Return dict mapping card numbers to (playback, capture) card info tuples."""
+        capture = self.capture_cards
+        return {cardno: (card, capture[cardno]) for cardno, card in self.playback_cards.items()}
 
-            for dev in card.devices:
-                devs.append("hw:%i,%i" % (card.cardno, dev.devno))
-                devs.append("hw:%s,%i" % (card.id, dev.devno))
-                devs.append("hw:%s,%s" % (card.id, dev.id))
+    @property
+    def playback_cards(self):
+        if self._playback is None:
+            self.scan()
+        return self._playback
 
-        return devs
+    @property
+    def capture_cards(self):
+        if self._capture is None:
+            self.scan()
+        return self._capture
 
     @property
     def playback_devices(self):
-        cards = getattr(self, "_playback", None)
-        if cards is None:
-            self._playback = cards = get_cards(stream=SndPcmStream.PLAYBACK)
-        return self._make_device_list(cards)
+        return list(self.get_index(SndPcmStream.PLAYBACK))
 
     @property
     def capture_devices(self):
-        cards = getattr(self, "_capture", None)
-        if cards is None:
-            self._capture = cards = get_cards(stream=SndPcmStream.CAPTURE)
-        return self._make_device_list(cards)
+        return list(self.get_index(SndPcmStream.CAPTURE))
 
     @property
     def devices(self):
-        devs = set(self.playback_devices)
-        return list(devs.union(self.capture_devices))
+        devs = set(self.get_index(SndPcmStream.PLAYBACK))
+        return list(devs.union(self.get_index(SndPcmStream.CAPTURE)))
 
 
-if __name__ == "__main__":
+def _stats(values):
+    values = [v * 1000.0 for v in values]
+    return {
+        "min": round(min(values), 3),
+        "mean": round(sum(values) / len(values), 3),
+        "max": round(max(values), 3),
+    }
+
+
+def benchmark(runs=10, method="range"):
+    """Probe all cards ``runs`` times and return timing statistics.
+
+    Returns a dict, which can be serialised as JSON, with the minimum, mean
+    and maximum wall time in milliseconds of complete probe runs, of probing
+    each card, of probing each PCM device of each card for each stream
+    direction and of each phase of probing a device.
+
+    """
+    totals = []
+    card_times = {}
+    device_times = {}
+    card_ids = {}
+
+    for _ in range(runs):
+        with ProbeContext(timings=True) as ctx:
+            start = perf_counter()
+            cards = probe_cards(method=method, ctx=ctx)
+            totals.append(perf_counter() - start)
+
+        for playback, capture in cards:
+            card_ids[playback.cardno] = playback.id
+
+        for record in ctx.timings:
+            phases = record["phases"]
+
+            if not phases:
+                continue
+            elif "device" in record:
+                key = (record["card"], record["device"], record["stream"])
+                device_times.setdefault(key, []).append(phases)
+            elif "total" in phases:
+                card_times.setdefault(record["card"], []).append(phases["total"])
+
+    result = {
+        "alsa_lib_version": get_alsa_lib_version(),
+        "method": method,
+        "runs": runs,
+        "total": _stats(totals),
+        "cards": {},
+    }
+
+    for cardno, times in sorted(card_times.items()):
+        card_id = card_ids.get(cardno, str(cardno))
+        devices = {}
+
+        for (dev_card, devno, stream), phase_list in sorted(device_times.items()):
+            if dev_card != card_id:
+                continue
+
+            phase_names = sorted(set().union(*phase_list))
+            devices["{},{}".format(devno, stream)] = {
+                "total": _stats([sum(phases.values()) for phases in phase_list]),
+                "phases": {
+                    name: _stats([phases.get(name, 0.0) for phases in phase_list])
+                    for name in phase_names
+                },
+            }
+
+        result["cards"]["hw:{}".format(card_id)] = {
+            "cardno": cardno,
+            "total": _stats(times),
+            "devices": devices,
+        }
+
+    return result
+
+
+def _positive_int(value):
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+
+    if number < 1:
+        raise argparse.ArgumentTypeError("must be a positive integer: {!r}".format(value))
+
+    return number
+
+
+def main(args=None):
+    ap = argparse.ArgumentParser(
+        prog="python -m jackselect.alsainfo",
+        description="List ALSA sound cards and the capabilities of their PCM devices.",
+    )
+    ap.add_argument(
+        "-b",
+        "--bench",
+        metavar="RUNS",
+        type=_positive_int,
+        help="Probe all cards RUNS times and print timing statistics as JSON.",
+    )
+    ap.add_argument(
+        "--compare",
+        action="store_true",
+        help="Compare results of all probe methods and report differences.",
+    )
+    ap.add_argument(
+        "-e",
+        "--enumerate",
+        action="store_true",
+        help="Only list cards and devices from the ALSA procfs tree without probing them.",
+    )
+    ap.add_argument(
+        "-m",
+        "--method",
+        choices=PROBE_METHODS,
+        default="range",
+        help="Method for probing supported values (default: %(default)s).",
+    )
+    ap.add_argument("-r", "--capture", action="store_true", help="List capture devices.")
+    ap.add_argument("-v", "--verbose", action="store_true", help="Enable debug logging.")
+    args = ap.parse_args(args if args is not None else sys.argv[1:])
+
     logging.basicConfig(
-        level=logging.DEBUG if "-v" in sys.argv[1:] else logging.INFO,
+        level=logging.DEBUG if args.verbose else logging.INFO,
         format="[%(name)s] %(levelname)s: %(message)s",
     )
 
-    ai = AlsaInfo()
+    if args.bench is not None:
+        print(json.dumps(benchmark(args.bench, args.method), indent=2))
+        return
 
-    if "-r" in sys.argv:
-        for card in get_cards(stream=SndPcmStream.CAPTURE):
-            print(card)
+    if args.compare:
+        diffs = compare_probe_methods()
 
-        for card in ai.capture_devices:
-            print(card)
+        for cardno, devno, stream, name, values in diffs:
+            print("hw:{},{} {} {}: {}".format(cardno, devno, stream.name.lower(), name, values))
 
-        print("Capture devices")
-        print("----------------\n")
+        print("{} difference(s) found.".format(len(diffs)))
+        return 1 if diffs else 0
 
+    stream = SndPcmStream.CAPTURE if args.capture else SndPcmStream.PLAYBACK
+
+    if args.enumerate:
+        cards = [card[stream] for card in enumerate_cards(streams=(stream,))]
     else:
-        for card in get_cards(stream=SndPcmStream.PLAYBACK):
-            print(card)
+        cards = get_cards(stream=stream, method=args.method)
+
+    for card in cards:
+        print(card)
+
+    print("{} devices".format(stream.name.capitalize()))
+    print("----------------\n")
 
-        print("Playback devices")
-        print("----------------\n")
+    for dev in sorted(build_device_index(cards)):
+        print(dev)
 
-        for card in ai.playback_devices:
-            print(card)
+
+if __name__ == "__main__":
+    sys.exit(main() or 0)
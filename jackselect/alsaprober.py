@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""Probe ALSA sound cards in background threads outside of the GLib main loop."""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from gi.repository import GLib
+
+from .alsainfo import (
+    AlsaInfo,
+    ProbeContext,
+    enumerate_cards,
+    get_card_numbers,
+    has_stale_devices,
+    probe_cards,
+)
+
+
+log = logging.getLogger(__name__)
+
+MAX_WORKERS = 4
+
+
+class AlsaProber:
+    """Probe ALSA sound cards in parallel on a small pool of worker threads.
+
+    Each call to ``probe`` starts a new probe run and increases the generation
+    counter. When all cards of a run have been probed, an immutable
+    ``AlsaInfo`` snapshot is built from the results in the GLib main loop and
+    passed to ``callback``. Results of runs superseded by a newer run are
+    discarded, the cards of a superseded run are probed again by the newer run
+    instead.
+
+    The first probe run immediately passes a snapshot to ``callback``, which
+    lists the cards and devices found in the ALSA procfs tree, but has the
+    capabilities of devices not in the cache unknown (see
+    ``jackselect.alsainfo.enumerate_cards``).
+
+    Devices busy while probing keep the capabilities from the last published
+    snapshot (see ``jackselect.alsainfo.probe_cards``). Their cards are not
+    marked as probed in the snapshot and are probed again by the next run.
+
+    If a ``cache`` object is given (see ``jackselect.alsacache``), it is only
+    accessed from the main loop. See ``jackselect.alsainfo.AlsaInfo`` for
+    ``probe_func``.
+
+    """
+
+    def __init__(self, callback, cache=None, max_workers=MAX_WORKERS, probe_func=None):
+        self.callback = callback
+        self.cache = cache
+        self.probe_func = probe_func or probe_cards
+        self.generation = 0
+        self.alsainfo = None
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="alsaprober")
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # probe contexts of the worker threads not in use by a running probe
+        self._idle_contexts = set()
+        self._closed = False
+        self._pending = {}
+        # set of card numbers of the currently running probe run,
+        # None if no probe run is running, True if all cards are probed
+        self._inflight = None
+        # numbers of the cards with change events since the last published snapshot
+        self._changed = set()
+
+    def probe(self, cardnos=None):
+        """Start probing cards with given numbers or all cards if ``cardnos`` is None.
+
+        Cards of the last published snapshot not given in ``cardnos`` are
+        passed on to the new snapshot unchanged. Given cards, which can not be
+        found anymore, are removed from it. Given cards are always probed,
+        even if they are found in the cache, since they changed.
+
+        """
+        # cards of superseded runs, which changed, are not taken from the cache either
+        self._changed.update(cardnos or ())
+
+        if cardnos is None or self._inflight is True or self.alsainfo is None:
+            self._inflight = True
+        else:
+            # cards with devices, which were busy, are probed again as well
+            unprobed = (c for c in self.alsainfo.cards if not self.alsainfo.is_probed(c))
+            self._inflight = set(cardnos).union(self._inflight or (), unprobed)
+
+        self.generation += 1
+        generation = self.generation
+
+        if self._inflight is True:
+            cardnos = get_card_numbers()
+            cards = {}
+        else:
+            cardnos = sorted(self._inflight)
+            cards = {
+                cardno: card
+                for cardno, card in self.alsainfo.cards.items()
+                if cardno not in self._inflight
+            }
+
+        log.debug("Starting ALSA probe run #%i for card(s) %r.", generation, cardnos)
+
+        if self.alsainfo is None:
+            self._publish_enumerated(generation)
+
+        previous = self.alsainfo.cards
+        to_probe = []
+
+        for cardno in cardnos:
+            if self.cache is not None and cardno not in self._changed:
+                cached = self.cache.get(cardno)
+            else:
+                cached = None
+
+            if cached:
+                log.debug("Using cached device info for card #%i.", cardno)
+                cards[cardno] = cached
+            else:
+                to_probe.append(cardno)
+
+        with self._lock:
+            self._pending = {"generation": generation, "remaining": len(to_probe)}
+
+        if not to_probe:
+            GLib.idle_add(self._publish, generation, cards, {})
+            return generation
+
+        results = {}
+
+        for cardno in to_probe:
+            future = self._executor.submit(self._probe_card, cardno, previous)
+            future.add_done_callback(
+                lambda future, cardno=cardno: self._probe_done(
+                    generation, cardno, future, cards, results
+                )
+            )
+
+        return generation
+
+    def _publish_enumerated(self, generation):
+        # Called in the main loop
+        cards = {}
+        probed = set()
+
+        for enumerated in enumerate_cards():
+            cardno = enumerated[0].cardno
+            cached = self.cache.get(cardno) if self.cache is not None else None
+
+            if cached:
+                probed.add(cardno)
+
+            cards[cardno] = cached or enumerated
+
+        log.debug("Publishing enumerated ALSA device info for %i card(s).", len(cards))
+        self.alsainfo = AlsaInfo.from_cards(cards, generation=generation, probed=probed)
+        self.callback(self.alsainfo)
+
+    def _probe_card(self, cardno, previous):
+        # Called in the worker thread, which keeps its probe context for re-use
+        with self._lock:
+            if self._closed:
+                return None
+
+            if self.probe_func is not probe_cards:
+                # probing in a child process (see 'jackselect.alsaworker') needs no context
+                ctx = None
+            else:
+                ctx = getattr(self._local, "ctx", None)
+
+                if ctx is None:
+                    self._local.ctx = ctx = ProbeContext()
+
+                self._idle_contexts.discard(ctx)
+
+        if ctx is None:
+            return self.probe_func(cardno=cardno, previous=previous)
+
+        try:
+            return self.probe_func(cardno=cardno, ctx=ctx, previous=previous)
+        finally:
+            with self._lock:
+                if self._closed:
+                    ctx.close()
+                else:
+                    self._idle_contexts.add(ctx)
+
+    def _probe_done(self, generation, cardno, future, cards, results):
+        # Called in the worker thread
+        try:
+            probed = future.result()
+        except Exception as exc:
+            log.warning("Could not probe card #%i: %s", cardno, exc)
+            probed = None
+
+        with self._lock:
+            if self._pending.get("generation") != generation:
+                return
+
+            results[cardno] = probed[0] if probed else None
+            self._pending["remaining"] -= 1
+
+            if self._pending["remaining"]:
+                return
+
+        GLib.idle_add(self._publish, generation, cards, results)
+
+    def _publish(self, generation, cards, results):
+        # Called in the main loop
+        if generation != self.generation:
+            log.debug("Discarding results of superseded ALSA probe run #%i.", generation)
+            return False
+
+        for cardno, probed in results.items():
+            if probed:
+                cards[cardno] = probed
+
+                if self.cache is not None:
+                    self.cache.put(cardno, *probed)
+            else:
+                log.debug("Card #%i not found.", cardno)
+
+        if self.cache is not None:
+            try:
+                self.cache.save()
+            except OSError as exc:
+                log.warning("Could not save ALSA device info cache: %s", exc)
+
+        self._inflight = None
+        self._changed = set()
+        probed = {cardno for cardno, card in cards.items() if not has_stale_devices(card)}
+        self.alsainfo = AlsaInfo.from_cards(cards, generation=generation, probed=probed)
+        log.debug("Publishing ALSA device info snapshot #%i.", generation)
+        self.callback(self.alsainfo)
+        return False
+
+    def shutdown(self):
+        """Stop worker threads, discarding results of any running probe run.
+
+        Queued probes are skipped. The probe contexts of the worker threads are
+        freed, those in use by a running probe when it is finished.
+
+        """
+        self.generation += 1
+        self._executor.shutdown(wait=False)
+
+        with self._lock:
+            self._closed = True
+
+            while self._idle_contexts:
+                self._idle_contexts.pop().close()
@@ -0,0 +1,456 @@
+# -*- coding: utf-8 -*-
+"""Enumerate ALSA sequencer clients and ports and watch for changes.
+
+The ALSA-MIDI to JACK bridge (a2jmidid) bridges the ports of ALSA sequencer
+clients. ``AlsaSeqInfo`` is an immutable snapshot of the clients and ports
+present, indexed by address, name and sound card, which lets jack-select
+tell which MIDI hardware and software ports there are without starting the
+bridge.
+
+``AlsaSeqMonitor`` keeps such a snapshot up to date. It subscribes to the
+announce port of the sequencer's system client, which broadcasts an event
+whenever a client or port appears, changes or goes away, and adds the poll
+descriptors of its sequencer handle to the GLib main loop. The snapshot is
+only rebuilt after announce events, never by polling.
+
+Like ``jackselect.alsainfo``, this module calls the libasound functions of
+the backend set there (see ``jackselect.alsainfo.load_backend``).
+
+"""
+
+import argparse
+import errno
+import json
+import logging
+import sys
+from collections import namedtuple
+from ctypes import POINTER, Structure, byref, c_ubyte, c_uint, c_void_p
+from types import MappingProxyType
+
+from gi.repository import GLib
+
+from .alsainfo import LibAsoundError, PollFd, check_call, get_backend
+
+
+log = logging.getLogger(__name__)
+
+SND_SEQ_OPEN_DUPLEX = 3
+SND_SEQ_NONBLOCK = 1
+SND_SEQ_CLIENT_SYSTEM = 0
+SND_SEQ_PORT_SYSTEM_ANNOUNCE = 1
+SND_SEQ_USER_CLIENT = 1
+SND_SEQ_KERNEL_CLIENT = 2
+POLLIN = 0x1
+
+SND_SEQ_PORT_CAP_READ = 1 << 0
+SND_SEQ_PORT_CAP_WRITE = 1 << 1
+SND_SEQ_PORT_CAP_DUPLEX = 1 << 4
+SND_SEQ_PORT_CAP_SUBS_READ = 1 << 5
+SND_SEQ_PORT_CAP_SUBS_WRITE = 1 << 6
+SND_SEQ_PORT_CAP_NO_EXPORT = 1 << 7
+
+SND_SEQ_PORT_TYPE_MIDI_GENERIC = 1 << 1
+SND_SEQ_PORT_TYPE_HARDWARE = 1 << 16
+SND_SEQ_PORT_TYPE_SOFTWARE = 1 << 17
+SND_SEQ_PORT_TYPE_PORT = 1 << 19
+SND_SEQ_PORT_TYPE_APPLICATION = 1 << 20
+
+# Announce event types of the system client (SND_SEQ_EVENT_CLIENT_START ... PORT_CHANGE)
+ANNOUNCE_EVENTS = {
+    60: "client start",
+    61: "client exit",
+    62: "client change",
+    63: "port start",
+    64: "port exit",
+    65: "port change",
+}
+
+# Time in milliseconds to wait for further announce events before rebuilding the snapshot
+SETTLE_TIME = 250
+CLIENT_NAME = b"jack-select"
+
+
+class SndSeqAddr(Structure):
+    _fields_ = [("client", c_ubyte), ("port", c_ubyte)]
+
+
+class SndSeqEvent(Structure):
+    """The leading fields of ``snd_seq_event_t`` including the address of announce events."""
+
+    _fields_ = [
+        ("type", c_ubyte),
+        ("flags", c_ubyte),
+        ("tag", c_ubyte),
+        ("queue", c_ubyte),
+        ("time", c_uint * 2),
+        ("source", SndSeqAddr),
+        ("dest", SndSeqAddr),
+        ("addr", SndSeqAddr),
+    ]
+
+
+class SeqPort(namedtuple("SeqPort", ("client", "port", "name", "caps", "type"))):
+    """An ALSA sequencer port with its capability and type bitmasks."""
+
+    __slots__ = ()
+
+    @property
+    def address(self):
+        return "%i:%i" % (self.client, self.port)
+
+    @property
+    def readable(self):
+        """Return whether other clients can subscribe to MIDI events sent from the port."""
+        return bool(self.caps & SND_SEQ_PORT_CAP_READ and self.caps & SND_SEQ_PORT_CAP_SUBS_READ)
+
+    @property
+    def writable(self):
+        """Return whether other clients can subscribe to send MIDI events to the port."""
+        return bool(self.caps & SND_SEQ_PORT_CAP_WRITE and self.caps & SND_SEQ_PORT_CAP_SUBS_WRITE)
+
+    @property
+    def is_hardware(self):
+        return bool(self.type & SND_SEQ_PORT_TYPE_HARDWARE)
+
+    @property
+    def exportable(self):
+        """Return whether the port can be connected to and may be exported to JACK."""
+        return (self.readable or self.writable) and not self.caps & SND_SEQ_PORT_CAP_NO_EXPORT
+
+
+class SeqClient(namedtuple("SeqClient", ("client", "name", "type", "card", "ports"))):
+    """An ALSA sequencer client and its ports.
+
+    ``card`` is the number of the sound card of a kernel client or -1.
+
+    """
+
+    __slots__ = ()
+
+    @property
+    def is_kernel(self):
+        return self.type == SND_SEQ_KERNEL_CLIENT
+
+    def to_dict(self):
+        """Return client info as a dict suitable for serialisation to JSON."""
+        client = self._asdict()
+        client["ports"] = [port._asdict() for port in self.ports]
+        return client
+
+
+def get_seq_clients(c_seq_p):
+    """Return list of ``SeqClient`` instances for all clients of sequencer handle.
+
+    The system client and the client of the handle itself are not included.
+
+    """
+    lib = get_backend()
+    c_cinfo_p = c_void_p()
+    c_pinfo_p = c_void_p()
+    check_call(lib.snd_seq_client_info_malloc, (byref(c_cinfo_p),))
+
+    try:
+        check_call(lib.snd_seq_port_info_malloc, (byref(c_pinfo_p),))
+    except LibAsoundError:
+        lib.snd_seq_client_info_free(c_cinfo_p)
+        raise
+
+    own_client = lib.snd_seq_client_id(c_seq_p)
+    clients = []
+
+    try:
+        lib.snd_seq_client_info_set_client(c_cinfo_p, -1)
+
+        while lib.snd_seq_query_next_client(c_seq_p, c_cinfo_p) >= 0:
+            clientno = lib.snd_seq_client_info_get_client(c_cinfo_p)
+
+            if clientno in (SND_SEQ_CLIENT_SYSTEM, own_client):
+                continue
+
+            ports = []
+            lib.snd_seq_port_info_set_client(c_pinfo_p, clientno)
+            lib.snd_seq_port_info_set_port(c_pinfo_p, -1)
+
+            while lib.snd_seq_query_next_port(c_seq_p, c_pinfo_p) >= 0:
+                ports.append(
+                    SeqPort(
+                        clientno,
+                        lib.snd_seq_port_info_get_port(c_pinfo_p),
+                        lib.snd_seq_port_info_get_name(c_pinfo_p).decode(),
+                        lib.snd_seq_port_info_get_capability(c_pinfo_p),
+                        lib.snd_seq_port_info_get_type(c_pinfo_p),
+                    )
+                )
+
+            clients.append(
+                SeqClient(
+                    clientno,
+                    lib.snd_seq_client_info_get_name(c_cinfo_p).decode(),
+                    lib.snd_seq_client_info_get_type(c_cinfo_p),
+                    lib.snd_seq_client_info_get_card(c_cinfo_p),
+                    tuple(ports),
+                )
+            )
+    finally:
+        lib.snd_seq_port_info_free(c_pinfo_p)
+        lib.snd_seq_client_info_free(c_cinfo_p)
+
+    return clients
+
+
+def open_seq(name=CLIENT_NAME):
+    """Open a non-blocking sequencer handle with given client name and return it."""
+    lib = get_backend()
+    c_seq_p = c_void_p()
+    check_call(
+        lib.snd_seq_open,
+        (byref(c_seq_p), b"default", SND_SEQ_OPEN_DUPLEX, SND_SEQ_NONBLOCK),
+        "Could not open ALSA sequencer:",
+    )
+    lib.snd_seq_set_client_name(c_seq_p, name)
+    return c_seq_p
+
+
+class AlsaSeqInfo:
+    """Immutable snapshot of ALSA sequencer clients and their ports.
+
+    ``generation`` counts the snapshots built by an ``AlsaSeqMonitor``.
+
+    """
+
+    def __init__(self, clients=(), generation=0):
+        self.generation = generation
+        self.clients = MappingProxyType({client.client: client for client in clients})
+        ports = {}
+        names = {}
+        cards = {}
+
+        for client in self.clients.values():
+            for port in client.ports:
+                ports[(port.client, port.port)] = port
+                names.setdefault("%s:%s" % (client.name, port.name), port)
+
+                if client.card >= 0:
+                    cards.setdefault(client.card, []).append(port)
+
+        self.ports = MappingProxyType(ports)
+        self.port_names = MappingProxyType(names)
+        self._card_ports = MappingProxyType(
+            {cardno: tuple(card_ports) for cardno, card_ports in cards.items()}
+        )
+
+    @classmethod
+    def from_seq(cls, c_seq_p=None, generation=0):
+        """Create snapshot from given sequencer handle or a temporary one."""
+        if c_seq_p is not None:
+            return cls(get_seq_clients(c_seq_p), generation=generation)
+
+        c_seq_p = open_seq()
+
+        try:
+            return cls(get_seq_clients(c_seq_p), generation=generation)
+        finally:
+            get_backend().snd_seq_close(c_seq_p)
+
+    def find_port(self, name):
+        """Look up port by address (``"<client>:<port>"``) or ``"<client name>:<port name>"``.
+
+        Returns a ``SeqPort`` or None.
+
+        """
+        client, _, port = name.partition(":")
+
+        if client.isdigit() and port.isdigit():
+            return self.ports.get((int(client), int(port)))
+
+        return self.port_names.get(name)
+
+    def get_card_ports(self, cardno):
+        """Return tuple of sequencer ports of the sound card with given number."""
+        return self._card_ports.get(cardno, ())
+
+    @property
+    def hardware_ports(self):
+        """Return list of connectable ports of MIDI hardware, sorted by address."""
+        return [
+            port for port in sorted(self.ports.values()) if port.is_hardware and port.exportable
+        ]
+
+    def bridgeable_ports(self, export_hw=False):
+        """Return list of ports the ALSA-MIDI to JACK bridge would export.
+
+        Hardware ports are only included if ``export_hw`` is true.
+
+        """
+        return [
+            port
+            for port in sorted(self.ports.values())
+            if port.exportable and (export_hw or not port.is_hardware)
+        ]
+
+
+class AlsaSeqMonitor:
+    """Keep an ``AlsaSeqInfo`` snapshot up to date using sequencer announce events.
+
+    Announce events are collected until no new event arrived for
+    ``settle_time`` milliseconds. Then a new snapshot is built and passed to
+    ``callback``. The current snapshot is available as ``seqinfo``.
+
+    Raises ``LibAsoundError`` if the sequencer can not be opened, e.g. when
+    the ALSA sequencer kernel module is not loaded.
+
+    """
+
+    def __init__(self, callback=None, settle_time=SETTLE_TIME):
+        self.callback = callback
+        self.settle_time = settle_time
+        self._lib = get_backend()
+        self._timer = None
+        self._sources = []
+        self.handle = open_seq()
+
+        try:
+            port = self._lib.snd_seq_create_simple_port(
+                self.handle,
+                CLIENT_NAME + b" announce",
+                SND_SEQ_PORT_CAP_WRITE | SND_SEQ_PORT_CAP_NO_EXPORT,
+                SND_SEQ_PORT_TYPE_APPLICATION,
+            )
+
+            if port < 0:
+                raise LibAsoundError("Could not create sequencer port.", errno=port)
+
+            check_call(
+                self._lib.snd_seq_connect_from,
+                (self.handle, port, SND_SEQ_CLIENT_SYSTEM, SND_SEQ_PORT_SYSTEM_ANNOUNCE),
+                "Could not subscribe to sequencer announce port:",
+            )
+            count = self._lib.snd_seq_poll_descriptors_count(self.handle, POLLIN)
+            pollfds = (PollFd * max(count, 0))()
+            count = self._lib.snd_seq_poll_descriptors(self.handle, pollfds, len(pollfds), POLLIN)
+            self.seqinfo = AlsaSeqInfo.from_seq(self.handle)
+        except LibAsoundError:
+            self._lib.snd_seq_close(self.handle)
+            raise
+
+        for pollfd in pollfds[: max(count, 0)]:
+            self._sources.append(GLib.io_add_watch(pollfd.fd, GLib.IO_IN, self._handle_events))
+
+        log.debug("Found %i ALSA sequencer client(s).", len(self.seqinfo.clients))
+
+    def _handle_events(self, fd, condition):
+        c_event_p = POINTER(SndSeqEvent)()
+        changed = False
+
+        while True:
+            err = self._lib.snd_seq_event_input(self.handle, byref(c_event_p))
+
+            if err == -errno.EAGAIN:
+                break
+            elif err == -errno.ENOSPC:
+                log.debug("ALSA sequencer input queue overrun.")
+                changed = True
+                continue
+            elif err < 0:
+                log.warning("Could not read ALSA sequencer events: %s", err)
+                break
+
+            event = c_event_p.contents
+
+            if event.type in ANNOUNCE_EVENTS:
+                log.debug(
+                    "ALSA sequencer announce: %s %i:%i",
+                    ANNOUNCE_EVENTS[event.type],
+                    event.addr.client,
+                    event.addr.port,
+                )
+                changed = True
+
+        if changed:
+            if self._timer is not None:
+                GLib.source_remove(self._timer)
+
+            self._timer = GLib.timeout_add(self.settle_time, self.refresh)
+
+        return True
+
+    def refresh(self):
+        """Rebuild the snapshot and pass it to the callback."""
+        self._timer = None
+
+        try:
+            self.seqinfo = AlsaSeqInfo.from_seq(
+                self.handle, generation=self.seqinfo.generation + 1
+            )
+        except LibAsoundError as exc:
+            log.warning("Could not enumerate ALSA sequencer clients: %s", exc)
+            return False
+
+        log.debug(
+            "ALSA sequencer snapshot #%i: %i client(s).",
+            self.seqinfo.generation,
+            len(self.seqinfo.clients),
+        )
+
+        if self.callback:
+            self.callback(self.seqinfo)
+
+        return False
+
+    def close(self):
+        """Remove poll descriptors from the main loop and close the sequencer handle."""
+        if self._timer is not None:
+            GLib.source_remove(self._timer)
+            self._timer = None
+
+        while self._sources:
+            GLib.source_remove(self._sources.pop())
+
+        if self.handle:
+            self._lib.snd_seq_close(self.handle)
+            self.handle = None
+
+
+def main(args=None):
+    ap = argparse.ArgumentParser(
+        prog="python -m jackselect.alsaseq",
+        description="List ALSA sequencer clients and their ports.",
+    )
+    ap.add_argument(
+        "-H", "--hardware", action="store_true", help="Only list ports of MIDI hardware."
+    )
+    ap.add_argument("-j", "--json", action="store_true", help="Print clients and ports as JSON.")
+    ap.add_argument("-v", "--verbose", action="store_true", help="Enable debug logging.")
+    args = ap.parse_args(args if args is not None else sys.argv[1:])
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format="[%(name)s] %(levelname)s: %(message)s",
+    )
+
+    try:
+        seqinfo = AlsaSeqInfo.from_seq()
+    except LibAsoundError as exc:
+        log.error(exc)
+        return 1
+
+    if args.json:
+        print(json.dumps([client.to_dict() for client in seqinfo.clients.values()], indent=2))
+        return
+
+    for port in seqinfo.hardware_ports if args.hardware else sorted(seqinfo.ports.values()):
+        client = seqinfo.clients[port.client]
+        print(
+            "{:>7} {}:{} [{}{}]{}".format(
+                port.address,
+                client.name,
+                port.name,
+                "r" if port.readable else "-",
+                "w" if port.writable else "-",
+                " (card {})".format(client.card) if client.card >= 0 else "",
+            )
+        )
+
+
+if __name__ == "__main__":
+    sys.exit(main() or 0)
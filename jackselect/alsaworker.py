@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+"""Probe ALSA sound cards in a child process with a time limit per card.
+
+Some drivers (e.g. for Bluetooth devices or USB devices with misbehaving
+firmware) can block in ``snd_pcm_open`` or ``snd_pcm_hw_params_any`` despite
+opening the device in non-blocking mode. ``IsolatedProbe`` runs the probe in
+a child process instead, which is killed when probing a card takes longer
+than the given time limit. The card is then put on a blacklist and only
+enumerated from procfs (see ``jackselect.alsainfo.enumerate_cards``) from
+then on.
+
+The child process is this module run as a script. It reads the probe request
+as JSON from its standard input and writes a JSON object per line to its
+standard output, first ``{"probing": <cardno>}`` when it starts probing a
+card and then ``{"cardno": <cardno>, "cards": [<playback>, <capture>]}``
+with the card info as returned by ``AlsaCard.to_dict`` (or ``null``) when it
+is done.
+
+The child process creates its own ALSA backend (see
+``jackselect.alsainfo.load_backend``) from the environment it inherits.
+
+"""
+
+import json
+import logging
+import os
+import selectors
+import subprocess
+import sys
+import threading
+from time import monotonic
+
+from .alsainfo import (
+    AlsaCard,
+    ProbeContext,
+    SndPcmStream,
+    enumerate_cards,
+    get_card_id,
+    get_card_numbers,
+    probe_cards,
+)
+
+
+log = logging.getLogger(__name__)
+
+# Maximum time in seconds for probing a single card
+PROBE_TIMEOUT = 2.0
+# Additional time in seconds allowed for starting the child process
+STARTUP_TIMEOUT = 5.0
+# Maximum time in seconds to wait for the child process to exit
+EXIT_TIMEOUT = 1.0
+
+
+class IsolatedProbe:
+    """Callable with the same signature as ``probe_cards`` probing in a child process.
+
+    ``timeout`` is the maximum time in seconds for probing a single card. If
+    it is exceeded, or the child process dies while probing a card, the child
+    process is killed and the card is blacklisted. Probing of the remaining
+    cards continues in a new child process.
+
+    The blacklist maps card numbers to the card's id. If another card with a
+    different id appears under the same card number, the entry is dropped.
+
+    """
+
+    def __init__(self, timeout=PROBE_TIMEOUT):
+        self.timeout = timeout
+        self.blacklist = {}
+        self._lock = threading.Lock()
+
+    def is_blacklisted(self, cardno):
+        """Return whether the card with given number is blacklisted."""
+        with self._lock:
+            if cardno not in self.blacklist:
+                return False
+
+            if self.blacklist[cardno] != get_card_id(cardno):
+                log.debug("Card #%i changed, removing it from the blacklist.", cardno)
+                del self.blacklist[cardno]
+                return False
+
+            return True
+
+    def add_to_blacklist(self, cardno):
+        """Put card with given number on the blacklist."""
+        with self._lock:
+            self.blacklist[cardno] = get_card_id(cardno)
+
+    def __call__(
+        self, cardno=None, streams=tuple(SndPcmStream), method="range", ctx=None, previous=None
+    ):
+        # 'ctx' is accepted for compatibility with 'probe_cards' and ignored
+        cardnos = get_card_numbers() if cardno is None else [cardno]
+        results = {}
+        pending = []
+
+        for num in cardnos:
+            if self.is_blacklisted(num):
+                log.debug("Card #%i is blacklisted, only enumerating it.", num)
+                self._enumerate(num, streams, results)
+            else:
+                pending.append(num)
+
+        while pending:
+            done = set()
+            failed = self._run_child(pending, streams, method, previous, results, done)
+
+            if failed is None:
+                # cards not probed, because the worker failed outside of probing a card
+                unprobed = [num for num in pending if num not in done]
+                pending = []
+            else:
+                log.warning("Probing card #%i failed or timed out. Blacklisting it.", failed)
+                self.add_to_blacklist(failed)
+                unprobed = [failed]
+                start = pending.index(failed) + 1
+                pending = pending[start:]
+
+            for num in unprobed:
+                self._enumerate(num, streams, results)
+
+        return [results[num] for num in cardnos if num in results]
+
+    def _enumerate(self, cardno, streams, results):
+        # Device records are flagged as stale, so they are not cached
+        enumerated = enumerate_cards(cardno=cardno, streams=streams)
+
+        if enumerated:
+            results[cardno] = tuple(
+                card._replace(devices=[dev._replace(stale=True) for dev in card.devices])
+                if card
+                else None
+                for card in enumerated[0]
+            )
+
+    def _run_child(self, cardnos, streams, method, previous, results, done):
+        """Probe given cards in a child process and store results in ``results`` dict.
+
+        The numbers of the cards probed are added to the ``done`` set. Returns
+        the number of the card, for which probing did not complete, or None.
+
+        """
+        request = {
+            "cardnos": cardnos,
+            "streams": [int(stream) for stream in streams],
+            "method": method,
+            "previous": {
+                num: [card.to_dict() if card else None for card in cards]
+                for num, cards in (previous or {}).items()
+                if num in cardnos
+            },
+            "loglevel": log.getEffectiveLevel(),
+        }
+        env = dict(os.environ)
+        pkgdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, (pkgdir, env.get("PYTHONPATH"))))
+        proc = subprocess.Popen(
+            [sys.executable, "-m", __name__],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            env=env,
+        )
+        log.debug("Started ALSA probe worker process %i for card(s) %r.", proc.pid, cardnos)
+
+        try:
+            proc.stdin.write(json.dumps(request).encode())
+            proc.stdin.close()
+        except OSError as exc:
+            log.debug("Could not send request to ALSA probe worker: %s", exc)
+
+        current = None
+        deadline = monotonic() + STARTUP_TIMEOUT + self.timeout
+        buf = b""
+
+        with selectors.DefaultSelector() as sel:
+            sel.register(proc.stdout, selectors.EVENT_READ)
+
+            while True:
+                remaining = deadline - monotonic()
+
+                if remaining <= 0 or not sel.select(remaining):
+                    log.debug("ALSA probe worker timed out. Killing it.")
+                    _kill(proc)
+                    return current
+
+                data = os.read(proc.stdout.fileno(), 65536)
+
+                if not data:
+                    try:
+                        status = proc.wait(EXIT_TIMEOUT)
+                    except subprocess.TimeoutExpired:
+                        log.warning("ALSA probe worker did not exit. Killing it.")
+                        _kill(proc)
+                    else:
+                        if status:
+                            log.warning("ALSA probe worker exited with status %i.", status)
+
+                    return current
+
+                buf += data
+
+                while b"\n" in buf:
+                    line, buf = buf.split(b"\n", 1)
+
+                    try:
+                        msg = json.loads(line)
+                    except ValueError:
+                        log.warning("Invalid output from ALSA probe worker: %r", line[:200])
+                        _kill(proc)
+                        return current
+
+                    if "probing" in msg:
+                        current = msg["probing"]
+                        deadline = monotonic() + self.timeout
+                    elif msg.get("cardno") is not None:
+                        if msg["cards"]:
+                            results[msg["cardno"]] = tuple(
+                                AlsaCard.from_dict(card) if card else None
+                                for card in msg["cards"]
+                            )
+
+                        done.add(msg["cardno"])
+                        current = None
+
+
+def _kill(proc):
+    """Kill child process and reap it, in a background thread if it does not exit in time.
+
+    A process blocked in a driver call (uninterruptible sleep) only exits
+    when the call returns, so waiting for it could block indefinitely.
+
+    """
+    proc.kill()
+
+    try:
+        proc.wait(EXIT_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        log.warning("ALSA probe worker process %i is stuck. Not waiting for it.", proc.pid)
+        threading.Thread(target=proc.wait, name="alsaworker-reaper", daemon=True).start()
+
+
+def _send(msg):
+    sys.stdout.write(json.dumps(msg) + "\n")
+    sys.stdout.flush()
+
+
+def main():
+    """Probe the cards given in the request read from stdin and write results to stdout."""
+    request = json.load(sys.stdin)
+    logging.basicConfig(
+        level=request.get("loglevel", logging.WARNING),
+        format="[%(name)s] %(levelname)s: %(message)s",
+    )
+    streams = tuple(SndPcmStream(stream) for stream in request["streams"])
+    previous = {
+        int(num): tuple(AlsaCard.from_dict(card) if card else None for card in cards)
+        for num, cards in request.get("previous", {}).items()
+    }
+
+    with ProbeContext() as ctx:
+        for cardno in request["cardnos"]:
+            _send({"probing": cardno})
+            probed = probe_cards(
+                cardno=cardno,
+                streams=streams,
+                method=request.get("method", "range"),
+                ctx=ctx,
+                previous=previous,
+            )
+            _send(
+                {
+                    "cardno": cardno,
+                    "cards": [card.to_dict() if card else None for card in probed[0]]
+                    if probed
+                    else None,
+                }
+            )
+
+
+if __name__ == "__main__":
+    sys.exit(main() or 0)
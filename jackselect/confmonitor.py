@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""Watch configuration files for changes using GIO file monitors."""
+
+import logging
+import os
+
+from gi.repository import Gio, GLib
+
+
+log = logging.getLogger(__name__)
+
+# Time in milliseconds to wait for further file events before reporting a change
+SETTLE_TIME = 50
+
+CHANGE_EVENTS = (
+    Gio.FileMonitorEvent.CHANGES_DONE_HINT,
+    Gio.FileMonitorEvent.CREATED,
+    Gio.FileMonitorEvent.DELETED,
+    Gio.FileMonitorEvent.MOVED_IN,
+    Gio.FileMonitorEvent.MOVED_OUT,
+    Gio.FileMonitorEvent.RENAMED,
+)
+
+
+class ConfigMonitor:
+    """Call ``callback`` when one of the given files is created, changed or removed.
+
+    The directories containing the files are watched instead of the files
+    themselves, so files which do not exist yet, and files replaced by
+    writing a temporary file and renaming it to the file name (like QjackCtl
+    and most editors save files), are handled too. Events are collected until
+    no new event arrived for ``settle_time`` milliseconds and then reported
+    with a single call of ``callback`` without arguments.
+
+    Only existing directories are watched, since GIO polls for missing ones.
+    For a missing directory its nearest existing parent directory is watched
+    instead, until the directory is created.
+
+    """
+
+    def __init__(self, paths, callback, settle_time=SETTLE_TIME):
+        self.callback = callback
+        self.settle_time = settle_time
+        self._timer = None
+        self._monitors = {}
+        self._paths = {os.path.abspath(path) for path in paths}
+        self._dirs = {os.path.dirname(path) for path in self._paths}
+        self._update_watches()
+
+    def _get_watch_dirs(self):
+        watch_dirs = set()
+
+        for dirname in self._dirs:
+            while not os.path.isdir(dirname) and os.path.dirname(dirname) != dirname:
+                dirname = os.path.dirname(dirname)
+
+            watch_dirs.add(dirname)
+
+        return watch_dirs
+
+    def _update_watches(self):
+        watch_dirs = self._get_watch_dirs()
+
+        for dirname in set(self._monitors).difference(watch_dirs):
+            self._monitors.pop(dirname).cancel()
+            log.debug("Stopped watching directory '%s'.", dirname)
+
+        for dirname in sorted(watch_dirs.difference(self._monitors)):
+            try:
+                monitor = Gio.File.new_for_path(dirname).monitor_directory(
+                    Gio.FileMonitorFlags.WATCH_MOVES, None
+                )
+            except GLib.Error as exc:
+                log.warning("Could not watch directory '%s': %s", dirname, exc)
+                continue
+
+            monitor.connect("changed", self._handle_event)
+            self._monitors[dirname] = monitor
+
+            if dirname in self._dirs:
+                log.debug("Watching directory '%s' for configuration changes.", dirname)
+            else:
+                log.debug("Watching directory '%s' for configuration directories.", dirname)
+
+    def _is_config_dir(self, path):
+        # whether path is a configuration directory or one of its parents
+        return any(
+            dirname == path or dirname.startswith(path.rstrip(os.sep) + os.sep)
+            for dirname in self._dirs
+        )
+
+    def _handle_event(self, monitor, file, other_file, event_type):
+        if event_type not in CHANGE_EVENTS:
+            return
+
+        names = [file.get_path()]
+
+        if other_file is not None:
+            names.append(other_file.get_path())
+
+        if any(self._is_config_dir(name) for name in names):
+            # a configuration directory (or one of its parents) appeared or vanished
+            self._update_watches()
+        elif not self._paths.intersection(names):
+            return
+
+        log.debug("Configuration file event: %s %s", event_type.value_nick, names[-1])
+
+        if self._timer is not None:
+            GLib.source_remove(self._timer)
+
+        self._timer = GLib.timeout_add(self.settle_time, self._flush)
+
+    def _flush(self):
+        self._timer = None
+        self.callback()
+        return False
+
+    def close(self):
+        """Stop watching."""
+        if self._timer is not None:
+            GLib.source_remove(self._timer)
+            self._timer = None
+
+        while self._monitors:
+            self._monitors.popitem()[1].cancel()
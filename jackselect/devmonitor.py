@@ -2,23 +2,139 @@
 """Set up an udev monitor to be notified about changes in attached sound devices."""
 
 import logging
+import re
+from time import monotonic
 
+from gi.repository import GLib
 from pyudev import Context, Monitor
 from .pyudev_gobject import MonitorObserver
 
 
 log = logging.getLogger(__name__)
 
+# Time in milliseconds to wait for further events before reporting changes
+SETTLE_TIME = 250
+# Maximum time in milliseconds changes are held back during a continuous event burst
+MAX_SETTLE_TIME = 2000
+# udev tag given to sound card devices (but not their sub-devices) by systemd's udev rules
+CARD_TAG = "systemd"
+
+
+def get_cardno(device):
+    """Return number of the sound card a udev sound device belongs to or None."""
+    match = re.search(r"/card(\d+)(/|$)", device.device_path)
+    return int(match.group(1)) if match else None
+
+
+def is_card_event(device):
+    """Return whether udev event is an add, change or remove event of a sound card device."""
+    return device.action in ("add", "change", "remove") and bool(
+        re.match(r"card\d+$", device.sys_name)
+    )
+
+
+def cards_have_tag(context, tag):
+    """Return whether all present sound card devices have the given udev tag.
+
+    Returns False if there are no sound cards.
+
+    """
+    cards = [
+        device
+        for device in context.list_devices(subsystem="sound")
+        if re.match(r"card\d+$", device.sys_name)
+    ]
+    return bool(cards) and all(tag in device.tags for device in cards)
+
 
 class AlsaDevMonitor:
-    def __init__(self, callback):
+    """Monitor the udev sound subsystem and report changed sound cards.
+
+    Plugging or removing a sound card causes a burst of udev events for the
+    card and each of its control, PCM, MIDI etc. devices. The events are
+    collected until no new event arrived for ``settle_time`` milliseconds (but
+    at most for ``max_settle_time`` milliseconds) and then merged per card.
+    ``callback`` is then called once with a dict mapping the numbers of all
+    cards with events to ``"remove"``, if the card was removed, or to
+    ``"change"`` otherwise.
+
+    Only events of the card devices themselves are passed on by the observer.
+    The device type can not be used to filter events in the kernel, since
+    sound card devices have none, but libudev matches the udev tags of devices
+    in the socket filter it attaches to the netlink socket. So if all present
+    cards have the tag systemd's udev rules give to sound card devices, the
+    monitor is filtered by this tag and events of sub-devices don't wake up
+    the process at all. On systems without this tag, they are dropped by the
+    observer before emitting a signal.
+
+    Instead of a netlink monitor, another event source compatible with
+    ``pyudev.Monitor`` can be passed as ``monitor``, e.g. a
+    ``jackselect.udevreplay.ReplayMonitor``. It is used as is.
+
+    """
+
+    def __init__(
+        self, callback, settle_time=SETTLE_TIME, max_settle_time=MAX_SETTLE_TIME, monitor=None
+    ):
+        self.callback = callback
+        self.settle_time = settle_time
+        self.max_settle_time = max_settle_time
+        self._changes = {}
+        self._first_event = None
+        self._timer = None
+        self._nevents = 0
         # set up udev device monitor
-        context = Context()
-        self._monitor = Monitor.from_netlink(context)
-        self._monitor.filter_by(subsystem="sound")
-        self._observer = MonitorObserver(self._monitor)
-        self._observer.connect("device-event", callback)
+        if monitor is None:
+            context = Context()
+            monitor = Monitor.from_netlink(context)
+            monitor.filter_by(subsystem="sound")
+
+            if cards_have_tag(context, CARD_TAG):
+                log.debug("Filtering sound device events by udev tag '%s'.", CARD_TAG)
+                monitor.filter_by_tag(CARD_TAG)
+
+        self._monitor = monitor
+        self._observer = MonitorObserver(self._monitor, event_filter=is_card_event)
+        self._observer.connect("device-event", self._handle_event)
 
     def start(self):
         log.debug("Starting AlsaDevMonitor...")
         self._monitor.start()
+
+    def _handle_event(self, observer, device):
+        cardno = get_cardno(device)
+
+        if cardno is None or device.action not in ("add", "change", "remove"):
+            return
+
+        if device.action == "remove" and device.sys_name == "card%i" % cardno:
+            self._changes[cardno] = "remove"
+        elif device.action == "add" or cardno not in self._changes:
+            # a card removed and plugged again within the settle time changed
+            self._changes[cardno] = "change"
+
+        self._nevents += 1
+        now = monotonic()
+
+        if self._first_event is None:
+            self._first_event = now
+
+        if self._timer is not None:
+            GLib.source_remove(self._timer)
+
+        held = (now - self._first_event) * 1000
+        self._timer = GLib.timeout_add(
+            max(0, min(self.settle_time, self.max_settle_time - held)), self._flush
+        )
+
+    def _flush(self):
+        changes, self._changes = self._changes, {}
+        log.debug(
+            "Sound device events settled: %i event(s) for card(s) %s.",
+            self._nevents,
+            ", ".join("#%i (%s)" % item for item in sorted(changes.items())),
+        )
+        self._first_event = self._timer = None
+        self._nevents = 0
+        self.callback(changes)
+        return False
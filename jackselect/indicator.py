@@ -73,6 +73,7 @@ class Indicator:
         active=False,
         menu=None,
         data=None,
+        tooltip=None,
     ):
         """Add mouse right click menu item.
 
@@ -83,6 +84,7 @@ class Indicator:
           icon (str): name of icon stored in application package
           active (bool): whether the menu entry can be activated (default: True)
           data (obj): arbitrary data to associate with the menu entry
+          tooltip (str): text shown when the mouse pointer hovers over the entry
 
         """
         if icon:
@@ -101,6 +103,9 @@ class Indicator:
         m_item.set_sensitive(enabled)
         m_item.data = data
 
+        if tooltip:
+            m_item.set_tooltip_text(tooltip)
+
         if menu:
             menu.append(m_item)
         else:
@@ -116,10 +121,10 @@ class Indicator:
         self.menu.append(m_item)
         return submenu
 
-    def add_separator(self):
-        """Add separator between labels in the popup menu."""
+    def add_separator(self, menu=None):
+        """Add separator between labels in the popup menu or the given sub menu."""
         m_item = Gtk.SeparatorMenuItem()
-        self.menu.append(m_item)
+        (menu or self.menu).append(m_item)
 
     def on_popup_menu_open(self, widget=None, button=None, *args):
         """Some action requested opening the popup menu."""
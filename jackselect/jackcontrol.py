@@ -2,6 +2,7 @@
 """Control and configure a JACK server via D-BUS."""
 
 import logging
+from collections import namedtuple
 
 import dbus
 
@@ -46,6 +47,54 @@ SETTINGS = {
 }
 
 
+class PlanStep(namedtuple("PlanStep", ("component", "parameter", "value"))):
+    """A step of a preset activation plan.
+
+    Sets the JACK ``parameter`` of ``component`` ("engine" or "driver") to
+    ``value``, which is already of the D-Bus type of the parameter, or resets
+    the parameter to its default value, if ``value`` is None.
+
+    """
+
+    __slots__ = ()
+
+
+def compile_preset(settings):
+    """Return activation plan for given JACK settings of a preset as a tuple of ``PlanStep``s.
+
+    The plan contains a step for each parameter in ``SETTINGS``, in order.
+    Values are converted to the D-Bus type of their parameter. Parameters
+    not given in ``settings`` or with values, which can not be converted, are
+    reset.
+
+    """
+    plan = []
+
+    for component in ("engine", "driver"):
+        csettings = settings.get(component, {})
+
+        for setting, stype in SETTINGS[component]:
+            value = csettings.get(setting)
+
+            if value is None:
+                dbus_value = None
+            else:
+                try:
+                    dbus_value = stype(value)
+                except (TypeError, ValueError, OverflowError) as exc:
+                    log.warning(
+                        "Invalid value %r for setting '%s', resetting it instead: %s",
+                        value,
+                        setting,
+                        exc,
+                    )
+                    dbus_value = None
+
+            plan.append(PlanStep(component, setting, dbus_value))
+
+    return tuple(plan)
+
+
 class JackBaseInterface(DBUSBaseInterface):
     service = "org.jackaudio.service"
     object_path = "/org/jackaudio/Controller"
@@ -163,53 +212,92 @@ class JackCfgInterface(JackBaseInterface):
         else:
             return bool(self._if.SetParameterValue(["driver", parameter], value))
 
-    def activate_preset(self, settings):
-        for component in ("engine", "driver"):
-            csettings = settings.get(component, {})
+    def read_parameters(self, component, parameters=None):
+        """Return dict of current values of the parameters of given component.
 
-            for setting in SETTINGS[component]:
-                if isinstance(setting, tuple):
-                    setting, stype = setting
-                else:
-                    stype = None
+        ``component`` is "engine" or "driver". The dict maps parameter names
+        to ``(is_set, default, value)`` tuples as returned by the
+        ``GetParameterValue`` D-Bus method. If ``parameters`` is given, only
+        the values of the parameters with names in it are read.
 
-                value = csettings.get(setting)
+        """
+        try:
+            names = self._if.ReadContainer([component])[1]
+        except dbus.DBusException as exc:
+            log.warning("Could not read JACK %s parameters: %s", component, exc)
+            return {}
 
-                if value is None:
-                    log.debug("Resetting %s.%s", component, setting)
-                    self._if.ResetParameterValue([component, setting])
-                    continue
+        params = {}
 
-                if stype:
-                    dbus_value = stype(value)
-                elif isinstance(value, bool):
-                    dbus_value = dbus.Boolean(value)
-                elif isinstance(value, int):
-                    dbus_value = dbus.UInt32(value)
-                elif isinstance(value, str):
-                    dbus_value = dbus.String(value)
-                else:
-                    log.warning(
-                        "Unknown type %s for setting '%s' = %r.",
-                        type(value),
-                        setting,
-                        value,
-                    )
-                    dbus_value = value
+        for name in names:
+            if parameters is not None and name not in parameters:
+                continue
+
+            try:
+                params[str(name)] = tuple(self._if.GetParameterValue([component, name]))
+            except dbus.DBusException as exc:
+                log.debug("Could not read JACK parameter %s.%s: %s", component, name, exc)
+
+        return params
+
+    def activate_preset(self, plan):
+        """Execute activation plan of a preset as returned by ``compile_preset``.
+
+        The current parameters of each component are read once, when the
+        first step for the component is executed, and only parameters, whose
+        value differs from the value in the plan, are set, or reset, if they
+        are set and the plan has no value for them. Since changing the engine
+        driver changes the parameters of the driver component, all engine
+        steps have to come before the driver steps in the plan.
+
+        Returns the number of parameters changed.
 
-                if component == "engine":
-                    setter = self.set_engine_parameter
-                elif component == "driver":
-                    setter = self.set_driver_parameter
+        """
+        current = {}
+        changed = 0
 
-                log.debug("Setting %s.%s = %r", component, setting, value)
-                result = setter(setting, dbus_value)
+        for component, setting, value in plan:
+            if component not in current:
+                current[component] = self.read_parameters(
+                    component, {step.parameter for step in plan if step.component == component}
+                )
 
-                if result not in (0, 3):
+            param = current[component].get(setting)
+
+            if param is None:
+                if value is not None:
                     log.error(
-                        "Setting %s setting '%s' failed (value %r), return value %s",
+                        "Setting %s setting '%s' failed (value %r): not supported.",
                         component,
                         setting,
                         value,
-                        result,
                     )
+                continue
+
+            is_set, default, current_value = param
+
+            try:
+                if value is None:
+                    if not is_set:
+                        continue
+
+                    log.debug("Resetting %s.%s", component, setting)
+                    self._if.ResetParameterValue([component, setting])
+                elif value != current_value:
+                    log.debug("Setting %s.%s = %r", component, setting, value)
+                    self._if.SetParameterValue([component, setting], value)
+                else:
+                    continue
+            except dbus.DBusException as exc:
+                log.error(
+                    "Setting %s setting '%s' failed (value %r): %s",
+                    component,
+                    setting,
+                    value,
+                    exc,
+                )
+            else:
+                changed += 1
+
+        log.debug("Changed %i of %i JACK parameters.", changed, len(plan))
+        return changed
@@ -11,27 +11,34 @@ os.environ["NO_AT_BRIDGE"] = "1"  # noqa
 import gi
 
 gi.require_version("Gtk", "3.0")  # noqa
-from gi.repository import Gtk, GObject
+from gi.repository import Gtk, GLib, GObject
 
 import dbus
 from xdg import BaseDirectory as xdgbase
 
 from .a2jcontrol import A2JCtlInterface
-from .alsainfo import AlsaInfo
+from .alsacache import AlsaInfoCache
+from .alsactlmonitor import AlsaCtlMonitor, is_rate_control, parse_rate
+from .alsainfo import AlsaInfo, LibAsoundError, SndPcmStream
+from .alsaprober import AlsaProber
+from .alsaseq import AlsaSeqMonitor
+from .alsaworker import IsolatedProbe
+from .confmonitor import ConfigMonitor
 from .devmonitor import AlsaDevMonitor
 from .indicator import Indicator
-from .jackcontrol import JackCfgInterface, JackCtlInterface
+from .jackcontrol import JackCfgInterface, JackCtlInterface, compile_preset
 from .jackselect_service import DBUS_NAME, DBUS_INTERFACE, DBUS_PATH, JackSelectService
-from .qjackctlconf import get_qjackctl_presets
+from .presetcache import PresetCache
+from .qjackctlconf import QjackCtlPresets
 from .version import __version__
 
 
 log = logging.getLogger("jack-select")
 
 INTERVAL_GET_STATS = 500
-INTERVAL_CHECK_CONF = 1000
 INTERVAL_RESTART = 1000
 DEFAULT_CONFIG = ("rncbc.org", "QjackCtl.conf")
+JACK_DEFAULT_NPERIODS = 2
 SETTINGS = ("jack-select", "settings.ini")
 
 
@@ -71,25 +78,56 @@ class JackSelectApp:
         self._a2jctl = None
         self._a2j_autostart = a2j_autostart
         self._a2j_export_hw = a2j_export_hw
+        # auto-start deferred on JACK start until there are ALSA sequencer ports to bridge
+        self._a2j_autostart_pending = False
+
+        # QjackCtl presets are loaded after the ALSA device info, but the
+        # first ALSA device info snapshot may already refer to them
+        self.qjackctl_config = config
+        self.preset_cache = PresetCache()
+        self.qjackctl_presets = None
+        self.presets = None
+        self.activation_plans = {}
+        self.active_preset = None
+
+        self.alsainfo = None
+        self.alsa_prober = None
+        self.alsa_probe_func = None
+        self.alsactlmonitor = None
+        self.alsaseqmonitor = None
+        # sample rate mismatch warnings by card number
+        self.clock_notices = {}
 
         if self.alsa_monitor:
             # get ALSA devices and their parameters
+            self.alsa_cache = AlsaInfoCache()
+            probe_timeout = self.app_settings.getint("general", "probe_timeout")
+
+            if probe_timeout > 0:
+                # probe in child processes to guard against hanging drivers
+                self.alsa_probe_func = IsolatedProbe(timeout=probe_timeout / 1000)
+
+            if self.app_settings.getboolean("general", "async_probe"):
+                self.alsa_prober = AlsaProber(
+                    self.handle_alsainfo_update,
+                    cache=self.alsa_cache,
+                    probe_func=self.alsa_probe_func,
+                )
+
             self.handle_device_change(init=True)
         else:
             self.alsainfo = None
 
         # load QjackCtl presets
-        self.qjackctl_config = config
-
-        self.presets = None
-        self.active_preset = None
         self.load_presets()
 
         # Create Jack control and config D-BUS interfaces
         self.dbus_connect()
 
-        # set up periodic functions to check presets & jack status
-        GObject.timeout_add(INTERVAL_CHECK_CONF, self.load_presets)
+        # reload presets when the configuration file is changed
+        self.confmonitor = ConfigMonitor(self.get_config_paths(), self.load_presets)
+
+        # set up periodic function to check jack status
         GObject.timeout_add(INTERVAL_GET_STATS, self.get_jack_stats)
         self.jackctl.is_started(self.update_jack_status)
 
@@ -100,6 +138,16 @@ class JackSelectApp:
             # set up udev device monitor
             self.alsadevmonitor = AlsaDevMonitor(self.handle_device_change)
             self.alsadevmonitor.start()
+            # watch clock controls of the sound card(s) used by the active preset
+            self.alsactlmonitor = AlsaCtlMonitor(self.handle_clock_change)
+
+            # keep track of ALSA sequencer clients and ports for the ALSA-MIDI bridge
+            try:
+                self.alsaseqmonitor = AlsaSeqMonitor(self.handle_seq_change)
+            except LibAsoundError as exc:
+                log.warning("Could not monitor ALSA sequencer: %s", exc)
+            else:
+                self.create_menu()
 
     def dbus_connect(self):
         """Create Jack control and config D-BUS interfaces."""
@@ -156,25 +204,7 @@ class JackSelectApp:
             self.write_settings()
 
     def load_settings(self):
-        self.app_settings = configparser.ConfigParser()
-        self.app_settings.read_dict(
-            {
-                "general": {
-                    "alsa_monitor": "yes",
-                    "ignore_default": "no",
-                },
-                "a2jmidi": {
-                    "autostart": "no",
-                    "export_hw": "yes",
-                },
-            }
-        )
-
-        settings_file = xdgbase.load_first_config(*SETTINGS)
-
-        if settings_file:
-            log.debug("Loading settings from '%s'.", settings_file)
-            self.app_settings.read(settings_file)
+        self.app_settings = read_settings()
 
     def write_settings(self):
         try:
@@ -185,68 +215,165 @@ class JackSelectApp:
         except OSError as exc:
             log.error("Could not write settings file '%s': %s", settings_file, exc)
 
-    def load_presets(self, force=False):
+    def get_config_paths(self):
+        """Return list of the paths where the QjackCtl configuration file is looked for."""
         if self.qjackctl_config in (None, DEFAULT_CONFIG):
-            qjackctl_config = xdgbase.load_first_config(*DEFAULT_CONFIG)
-        else:
-            if os.access(self.qjackctl_config, os.R_OK):
-                qjackctl_config = self.qjackctl_config
-            else:
-                qjackctl_config = None
+            return [os.path.join(path, *DEFAULT_CONFIG) for path in xdgbase.xdg_config_dirs]
+
+        return [self.qjackctl_config]
+
+    def load_presets(self, force=False):
+        """Load presets from the QjackCtl configuration file and update the menu.
+
+        If the presets did not change since they were last loaded, the menu
+        is only rebuilt if ``force`` is true.
+
+        """
+        qjackctl_config = find_qjackctl_config(self.qjackctl_config)
 
         if qjackctl_config:
-            mtime = os.path.getmtime(qjackctl_config)
-            changed = mtime > getattr(self, "_conf_mtime", 0)
-
-            if changed:
-                log.debug("JACK configuration file mtime changed or previously unknown.")
-
-            if force or changed or self.presets is None:
-                log.debug("(Re-)Reading configuration.")
-                (
-                    preset_names,
-                    self.jack_settings,
-                    self.default_preset,
-                ) = get_qjackctl_presets(qjackctl_config, self.ignore_default)
-                self.presets = {name: name.replace("_", " ") for name in preset_names}
-                self.create_menu()
+            if self.qjackctl_presets is None or self.qjackctl_presets.filename != qjackctl_config:
+                log.debug("Reading configuration from '%s'.", qjackctl_config)
+                self.qjackctl_presets = QjackCtlPresets(
+                    qjackctl_config, self.ignore_default, cache=self.preset_cache
+                )
 
-            self._conf_mtime = mtime
+            try:
+                changes = self.qjackctl_presets.load()
+            except OSError as exc:
+                log.warning("Could not read configuration file: %s", exc)
+                changes = None
+
+            for action in ("added", "removed", "changed"):
+                if changes and getattr(changes, action):
+                    names = ", ".join(sorted(getattr(changes, action)))
+                    log.debug("Preset(s) %s: %s", action, names)
+
+            if changes and self.active_preset in changes.changed:
+                log.info(
+                    "Settings of active preset '%s' changed. Activate it again to apply them.",
+                    self.active_preset,
+                )
+
+            if changes or self.presets is None:
+                self.jack_settings = self.qjackctl_presets.settings
+                # only compile (and warn about) presets, which are new or changed
+                plans = {
+                    name: plan
+                    for name, plan in self.activation_plans.items()
+                    if name in self.jack_settings
+                }
+                outdated = set(self.jack_settings).difference(plans)
+
+                if changes:
+                    outdated.update(changes.added, changes.changed)
+
+                for name in outdated:
+                    plans[name] = compile_preset(self.jack_settings[name])
+
+                self.activation_plans = plans
+                self.default_preset = self.qjackctl_presets.default_preset
+                self.presets = {
+                    name: name.replace("_", " ") for name in self.qjackctl_presets.preset_names
+                }
+                self.create_menu()
+            elif force:
+                self.create_menu()
         elif self.presets or self.presets is None:
             log.warning("Could not access configuration file.")
 
             if __debug__ and self.presets:
                 log.debug("Removing stored presets from memory.")
 
+            self.qjackctl_presets = None
             self.presets = {}
             self.jack_settings = {}
+            self.activation_plans = {}
             self.default_preset = None
             self.create_menu()
 
-        return True  # keep function scheduled
+    def get_alsa_problems(self, preset, probe=False):
+        """Return list of reasons why the ALSA settings of given preset can't work.
 
-    def check_alsa_settings(self, preset):
+        Checks that the ALSA devices used by the preset are present and, if
+        their capabilities are known, that they support the sample rate,
+        period size, number of periods and channel counts set by the preset.
+
+        If ``probe`` is true, the capabilities of devices, which have only been
+        enumerated so far, are probed first.
+
+        """
         engine = self.jack_settings[preset]["engine"]
         driver = self.jack_settings[preset]["driver"]
         if engine["driver"] != "alsa":
-            return True
+            return []
 
         dev = driver.get("device")
-        if dev and dev not in self.alsainfo.devices:
-            log.debug("Device '%s' used by preset '%s' not found.", dev, preset)
-            return False
+        if dev and not self.alsainfo.find_device(dev):
+            return ["Device '%s' not found." % dev]
+
+        problems = []
+
+        for stream, param, label, channels in (
+            (SndPcmStream.PLAYBACK, "playback", "Playback", "outchannels"),
+            (SndPcmStream.CAPTURE, "capture", "Capture", "inchannels"),
+        ):
+            name = driver.get(param) or dev
+
+            if not name:
+                continue
+
+            ref = self.alsainfo.find_device(name, stream, probe=probe)
+
+            if not ref:
+                if driver.get(param):
+                    problems.append("%s device '%s' not found." % (label, name))
+
+                continue
+
+            if ref.device:
+                problems.extend(
+                    "%s device '%s': %s" % (label, name, problem)
+                    for problem in check_device_capabilities(
+                        ref.device,
+                        rate=driver.get("rate"),
+                        period=driver.get("period"),
+                        nperiods=driver.get("nperiods"),
+                        channels=driver.get(channels),
+                    )
+                )
 
-        dev = driver.get("playback")
-        if dev and dev not in self.alsainfo.playback_devices:
-            log.debug("Playback device '%s' used by preset '%s' not found.", dev, preset)
-            return False
+        return problems
 
-        dev = driver.get("capture")
-        if dev and dev not in self.alsainfo.capture_devices:
-            log.debug("Capture device '%s' used by preset '%s' not found.", dev, preset)
-            return False
+    def get_preset_cards(self, preset):
+        """Return set of numbers of the sound cards used by the ALSA devices of given preset."""
+        settings = self.jack_settings.get(preset)
 
-        return True
+        if not self.alsainfo or not settings or settings["engine"]["driver"] != "alsa":
+            return set()
+
+        driver = settings["driver"]
+        cardnos = set()
+
+        for stream, param in (
+            (SndPcmStream.PLAYBACK, "playback"),
+            (SndPcmStream.CAPTURE, "capture"),
+        ):
+            name = driver.get(param) or driver.get("device")
+            ref = self.alsainfo.find_device(name, stream) if name else None
+
+            if ref:
+                cardnos.add(ref.card.cardno)
+
+        return cardnos
+
+    def check_alsa_settings(self, preset):
+        problems = self.get_alsa_problems(preset, probe=True)
+
+        for problem in problems:
+            log.debug("Preset '%s': %s", preset, problem)
+
+        return not problems
 
     def create_menu(self):
         log.debug("Building menu.")
@@ -258,8 +385,18 @@ class JackSelectApp:
 
             callback = self.activate_preset
             for name, label in sorted(self.presets.items()):
-                disabled = self.alsainfo and not self.check_alsa_settings(name)
-                self.gui.add_menu_item(callback, label, enabled=not disabled, data=name)
+                problems = self.get_alsa_problems(name) if self.alsainfo else None
+
+                for problem in problems or ():
+                    log.debug("Preset '%s': %s", name, problem)
+
+                self.gui.add_menu_item(
+                    callback,
+                    label,
+                    enabled=not problems,
+                    data=name,
+                    tooltip="\n".join(problems) if problems else None,
+                )
 
         else:
             self.gui.add_menu_item(None, "No presets found", enabled=False)
@@ -295,6 +432,24 @@ class JackSelectApp:
                 active=self.a2j_autostart,
                 menu=self.menu_a2jbridge,
             )
+
+            if self.alsaseqmonitor:
+                self.gui.add_separator(menu=self.menu_a2jbridge)
+                seqinfo = self.alsaseqmonitor.seqinfo
+
+                for port in seqinfo.hardware_ports:
+                    self.gui.add_menu_item(
+                        None,
+                        "%s: %s" % (seqinfo.clients[port.client].name, port.name),
+                        enabled=False,
+                        menu=self.menu_a2jbridge,
+                        tooltip="ALSA sequencer port %s" % port.address,
+                    )
+
+                if not seqinfo.hardware_ports:
+                    self.gui.add_menu_item(
+                        None, "No MIDI hardware found", enabled=False, menu=self.menu_a2jbridge
+                    )
         else:
             self.menu_a2jbridge = None
 
@@ -319,6 +474,7 @@ class JackSelectApp:
                 self.gui.set_icon("stopped.png")
                 self.tooltext = "JACK server is stopped."
                 log.info(self.tooltext)
+                self._a2j_autostart_pending = False
 
             self.menu_stop.set_sensitive(value)
             self.update_a2jbridge_status()
@@ -339,6 +495,10 @@ class JackSelectApp:
                     "yes" if self.jack_status.get("is_realtime") else "no"
                 )
                 self.tooltext += "load: %(load)i%% xruns: %(xruns)i" % self.jack_status
+
+                for cardno in sorted(self.clock_notices):
+                    notice = GLib.markup_escape_text(self.clock_notices[cardno])
+                    self.tooltext += "\n<i>%s</i>" % notice
             except KeyError:
                 self.tooltext = "No status available."
 
@@ -371,20 +531,128 @@ class JackSelectApp:
                 self.menu_a2j_startstop.set_sensitive(False)
                 self.menu_a2j_export_hw.set_sensitive(True)
 
-    def handle_device_change(self, observer=None, device=None, init=False):
-        if device:
-            dev = device.device_path.split("/")[-1]
+    def create_alsainfo(self):
+        """Return new ALSA device info, probing device capabilities on demand."""
+        return AlsaInfo(
+            deferred=False, cache=self.alsa_cache, lazy=True, probe_func=self.alsa_probe_func
+        )
+
+    def handle_device_change(self, changes=None, init=False):
+        """Update ALSA device info for changed sound cards.
 
-        if init or (device.action in ("change", "remove") and dev.startswith("card")):
+        ``changes`` is a dict mapping card numbers to ``"change"`` or
+        ``"remove"`` as passed by ``AlsaDevMonitor`` after a burst of device
+        events has settled.
+
+        """
+        if init and self.alsa_prober:
+            log.debug("Collecting ALSA device info in the background...")
+            self.alsa_prober.probe()
+            return
+        elif init:
             try:
-                log.debug("Sound device change signalled. Collecting ALSA " "device info...")
-                self.alsainfo = AlsaInfo(deferred=False)
+                log.debug("Collecting ALSA device info...")
+                self.alsainfo = self.create_alsainfo()
             except Exception as exc:
                 log.warn("Could not get ALSA device list: %s", exc)
                 self.alsainfo = None
 
-            if device and device.action != "init":
-                self.load_presets(force=True)
+            return
+
+        if not changes:
+            return
+
+        if self.alsa_prober:
+            log.debug(
+                "Sound card(s) %s changed. Re-probing in the background...",
+                ", ".join("#%i" % cardno for cardno in sorted(changes)),
+            )
+            self.alsa_prober.probe(sorted(changes))
+            return
+
+        try:
+            if self.alsainfo is None:
+                log.debug("Sound device change signalled. Collecting ALSA device info...")
+                self.alsainfo = self.create_alsainfo()
+            else:
+                for cardno, action in sorted(changes.items()):
+                    if action == "remove":
+                        log.debug("Sound card #%i removed.", cardno)
+                        self.alsainfo.remove_card(cardno)
+                    else:
+                        log.debug("Sound card #%i changed. Updating ALSA device info...", cardno)
+                        self.alsainfo.update_card(cardno)
+        except Exception as exc:
+            log.warn("Could not get ALSA device list: %s", exc)
+            self.alsainfo = None
+
+        self.load_presets(force=True)
+        self.watch_clock_controls()
+
+    def handle_alsainfo_update(self, alsainfo):
+        """Replace ALSA device info with new snapshot from background probe."""
+        log.debug("ALSA device info snapshot #%i ready.", alsainfo.generation)
+        self.alsainfo = alsainfo
+
+        if self.presets is not None:
+            self.create_menu()
+
+        self.watch_clock_controls()
+
+    def watch_clock_controls(self):
+        """Watch the clock controls of the sound card(s) used by the active preset."""
+        if self.alsactlmonitor:
+            cardnos = self.get_preset_cards(self.active_preset) if self.active_preset else ()
+            self.alsactlmonitor.watch(cardnos)
+
+    def handle_clock_change(self, cardno, name, value):
+        """Report change of a sample rate or clock control of the active preset's card.
+
+        Cards with external clocking may change their sample rate without a
+        device change, so warn if it doesn't match the active preset anymore.
+        The warning is shown in the tooltip until the rate matches again.
+
+        """
+        log.info("Sound card #%i: control '%s' changed to: %s", cardno, name, value)
+        settings = self.jack_settings.get(self.active_preset) if self.active_preset else None
+        preset_rate = settings["driver"].get("rate") if settings else None
+        rate = parse_rate(value) if is_rate_control(name) else None
+
+        if not (rate and preset_rate):
+            return
+
+        if rate != preset_rate:
+            log.warning(
+                "Sample rate of sound card #%i changed to %i Hz, but preset '%s' uses %i Hz.",
+                cardno,
+                rate,
+                self.active_preset,
+                preset_rate,
+            )
+            self.clock_notices[cardno] = "Card #%i runs at %i Hz!" % (cardno, rate)
+        elif self.clock_notices.pop(cardno, None):
+            log.info(
+                "Sample rate of sound card #%i matches preset '%s' again.",
+                cardno,
+                self.active_preset,
+            )
+
+    def handle_seq_change(self, seqinfo):
+        """Update menu with new ALSA sequencer snapshot and auto-start bridge if needed.
+
+        The bridge is only auto-started here, if auto-starting it was deferred
+        when the JACK server started, since there were no ports to bridge.
+
+        """
+        log.debug(
+            "ALSA sequencer ports changed: %i MIDI hardware port(s).", len(seqinfo.hardware_ports)
+        )
+
+        if self.presets is not None:
+            self.create_menu()
+
+        if self._a2j_autostart_pending and self.jack_status.get("is_started"):
+            self.a2jbridge_autostart()
 
     def handle_jackctl_signal(self, *args, signal=None, **kw):
         log.debug("JackCtl signal received: %r", signal)
@@ -463,13 +731,19 @@ class JackSelectApp:
 
         settings = self.jack_settings.get(preset)
 
-        if settings:
+        if settings and self.alsainfo and not self.check_alsa_settings(preset):
+            log.error("Preset '%s' is not supported by the available ALSA devices.", preset)
+            # device capabilities may have been probed just now
+            self.create_menu()
+        elif settings:
             if self.jackcfg:
-                self.jackcfg.activate_preset(settings)
+                self.jackcfg.activate_preset(self.activation_plans[preset])
                 log.info("Activated preset: %s", preset)
                 self.stop_jack_server()
                 GObject.timeout_add(INTERVAL_RESTART, self.start_jack_server)
                 self.active_preset = preset
+                self.clock_notices = {}
+                self.watch_clock_controls()
         else:
             log.error("Unknown preset '%s'. Ignoring it.", preset)
 
@@ -492,6 +766,8 @@ class JackSelectApp:
                 log.error("Could not stop JACK server: %s", exc)
 
     def on_start_stop_a2jbridge(self, *args):
+        # the user's choice overrides a deferred auto-start
+        self._a2j_autostart_pending = False
         self.start_stop_a2jbridge()
 
     def start_stop_a2jbridge(self, start_stop=None):
@@ -521,14 +797,127 @@ class JackSelectApp:
 
     def a2jbridge_autostart(self):
         if self.a2jctl and self.a2j_autostart and not self.a2jctl.is_started():
+            if self.alsaseqmonitor and not self.alsaseqmonitor.seqinfo.bridgeable_ports(
+                self.a2j_export_hw
+            ):
+                log.debug("No ALSA sequencer ports to bridge. Deferring a2jmidid auto-start.")
+                self._a2j_autostart_pending = True
+                return
+
+            self._a2j_autostart_pending = False
             log.debug("a2jmidid auto-start triggered.")
             self.start_stop_a2jbridge(True)
 
     def quit(self, *args):
+        if self.alsa_prober:
+            self.alsa_prober.shutdown()
+
+        self.confmonitor.close()
+
+        if self.alsactlmonitor:
+            self.alsactlmonitor.close()
+
+        if self.alsaseqmonitor:
+            self.alsaseqmonitor.close()
+
         log.debug("Exiting main loop.")
         Gtk.main_quit()
 
 
+def check_device_capabilities(device, rate=None, period=None, nperiods=None, channels=None):
+    """Return list of problems with given JACK driver settings for an ALSA PCM device.
+
+    Only settings which are not None and device capabilities which could be
+    probed are checked. The device's buffer sizes are only probed for the
+    sizes in ``PCM_BUFFER_SIZES``, so other total buffer sizes are not checked.
+
+    """
+    problems = []
+
+    if rate and device.supports_rate(rate) is False:
+        problems.append("sample rate %i Hz not supported." % rate)
+
+    if nperiods and device.periods is not None:
+        pmin, pmax = device.periods
+
+        if not pmin <= nperiods <= pmax:
+            problems.append("%i periods not supported (%i-%i)." % (nperiods, pmin, pmax))
+
+    if period:
+        size = period * (nperiods or JACK_DEFAULT_NPERIODS)
+
+        if device.supports_buffer_size(size) is False:
+            problems.append("buffer size %i frames not supported." % size)
+
+    if channels and device.channels is not None and channels not in device.channels:
+        problems.append("%i channels not supported." % channels)
+
+    return problems
+
+
+def read_settings():
+    """Return jack-select application settings with defaults for missing options."""
+    settings = configparser.ConfigParser()
+    settings.read_dict(
+        {
+            "general": {
+                "alsa_monitor": "yes",
+                "async_probe": "yes",
+                "probe_timeout": "2000",
+                "ignore_default": "no",
+            },
+            "a2jmidi": {
+                "autostart": "no",
+                "export_hw": "yes",
+            },
+        }
+    )
+
+    settings_file = xdgbase.load_first_config(*SETTINGS)
+
+    if settings_file:
+        log.debug("Loading settings from '%s'.", settings_file)
+        settings.read(settings_file)
+
+    return settings
+
+
+def find_qjackctl_config(config=None):
+    """Return path of the QjackCtl configuration file to use or None if it is not accessible."""
+    if config in (None, DEFAULT_CONFIG):
+        return xdgbase.load_first_config(*DEFAULT_CONFIG)
+    elif os.access(config, os.R_OK):
+        return config
+
+
+def list_presets(config=None, ignore_default=None):
+    """Print names of the presets in the QjackCtl configuration file, marking the default one.
+
+    The presets are taken from the preset cache, if it is up-to-date, so no
+    D-Bus connection, GUI or parsing of the configuration file is needed.
+
+    """
+    if ignore_default is None:
+        ignore_default = read_settings().getboolean("general", "ignore_default")
+
+    qjackctl_config = find_qjackctl_config(config)
+
+    if not qjackctl_config:
+        log.error("Could not access configuration file.")
+        return 1
+
+    presets = QjackCtlPresets(qjackctl_config, ignore_default, cache=PresetCache())
+
+    try:
+        presets.load()
+    except OSError as exc:
+        log.error("Could not read configuration file: %s", exc)
+        return 1
+
+    for name in presets.preset_names:
+        print("%s%s" % (name, " *" if name == presets.default_preset else ""))
+
+
 def get_dbus_client(bus=None):
     if bus is None:
         bus = dbus.SessionBus()
@@ -582,6 +971,12 @@ def main(args=None):
         help="Ignore the nameless '(default)' preset if any other presets are stored in the "
         "configuration.",
     )
+    ap.add_argument(
+        "-l",
+        "--list",
+        action="store_true",
+        help="List presets, marking the default preset with '*', and exit.",
+    )
     ap.add_argument(
         "-v",
         "--verbose",
@@ -597,6 +992,9 @@ def main(args=None):
         format="[%(name)s] %(levelname)s: %(message)s",
     )
 
+    if args.list:
+        return list_presets(args.config, args.ignore_default)
+
     # the mainloop needs to be set before creating the session bus instance
     DBusGMainLoop(set_as_default=True)
     bus = dbus.SessionBus()
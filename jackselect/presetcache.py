@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""Persistent on-disk cache of the presets read from QjackCtl's configuration file.
+
+The cache stores the presets converted to JACK settings together with the
+size and modification time of the configuration file and the fingerprints
+of its preset sections (see ``jackselect.qjackctlconf.QjackCtlPresets``). As
+long as the size and modification time of the file match, the presets are
+taken from the cache without reading the file. If they don't match, but the
+preset sections of the file are unchanged, the presets are still taken from
+the cache without converting them again.
+
+The cache is a JSON file. Byte string values of settings are stored as
+``{"__bytes__": "<latin-1 string>"}`` objects.
+
+"""
+
+import json
+import logging
+import os
+
+from xdg import BaseDirectory as xdgbase
+
+from .version import __version__
+
+
+log = logging.getLogger(__name__)
+
+CACHE_VERSION = 3
+CACHE_FILE = ("jack-select", "presets.json")
+
+
+def _encode(obj):
+    if isinstance(obj, bytes):
+        return {"__bytes__": obj.decode("latin-1")}
+
+    raise TypeError("Object of type %s is not JSON serializable" % type(obj).__name__)
+
+
+def _decode(obj):
+    if len(obj) == 1 and isinstance(obj.get("__bytes__"), str):
+        return obj["__bytes__"].encode("latin-1")
+
+    return obj
+
+
+class PresetCache:
+    """Cache of presets per configuration file stored in a JSON file.
+
+    The cache file is stored under ``<XDG_CACHE_HOME>/jack-select/`` by
+    default. Cache files written by other versions of this class or of
+    jack-select are ignored.
+
+    """
+
+    def __init__(self, filename=None):
+        if filename is None:
+            filename = os.path.join(xdgbase.xdg_cache_home, *CACHE_FILE)
+
+        self.filename = filename
+        self._entries = {}
+        self._dirty = False
+        self.load()
+
+    @staticmethod
+    def _key(path, ignore_default):
+        return "%s:%s" % ("nodefault" if ignore_default else "default", os.path.abspath(path))
+
+    def get(self, path, ignore_default=False):
+        """Return cache entry for presets of given configuration file or None.
+
+        The entry is a dict with the keys ``size``, ``mtime``, ``fingerprint``,
+        ``preset_fingerprints``, ``preset_names``, ``settings`` and
+        ``default_preset``.
+
+        """
+        return self._entries.get(self._key(path, ignore_default))
+
+    def put(self, path, ignore_default, entry):
+        """Store cache entry for presets of given configuration file."""
+        key = self._key(path, ignore_default)
+
+        if self._entries.get(key) != entry:
+            self._entries[key] = entry
+            self._dirty = True
+
+    def load(self):
+        """Load cache entries from cache file, ignoring stale or invalid files."""
+        try:
+            with open(self.filename) as fp:
+                data = json.load(fp, object_hook=_decode)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as exc:
+            log.warning("Could not read preset cache '%s': %s", self.filename, exc)
+            return
+
+        if (
+            not isinstance(data, dict)
+            or data.get("version") != CACHE_VERSION
+            or data.get("jack_select_version") != __version__
+        ):
+            log.debug("Preset cache '%s' is outdated. Ignoring it.", self.filename)
+            return
+
+        log.debug("Loaded preset cache from '%s'.", self.filename)
+        self._entries = data.get("entries", {})
+
+    def save(self):
+        """Write cache entries to cache file, if they changed since loading."""
+        if not self._dirty:
+            return
+
+        log.debug("Writing preset cache to '%s'.", self.filename)
+        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+        tmpfile = self.filename + ".tmp"
+
+        with open(tmpfile, "w") as fp:
+            json.dump(
+                {
+                    "version": CACHE_VERSION,
+                    "jack_select_version": __version__,
+                    "entries": self._entries,
+                },
+                fp,
+                default=_encode,
+            )
+
+        os.replace(tmpfile, self.filename)
+        self._dirty = False
@@ -53,6 +53,9 @@ class MonitorObserver(GObject.GObject):
     >>> observer.connect('device-event', device_event)
     >>> monitor.start()
 
+    If ``event_filter`` is given, it is called with each device received and
+    only events for devices for which it returns true are emitted.
+
     """
 
     __gsignals__ = {
@@ -69,8 +72,9 @@ class MonitorObserver(GObject.GObject):
         ),
     }
 
-    def __init__(self, monitor):
+    def __init__(self, monitor, event_filter=None):
         super().__init__()
+        self.event_filter = event_filter
         self._setup_observer(monitor)
 
     def _setup_observer(self, monitor):
@@ -101,9 +105,13 @@ class MonitorObserver(GObject.GObject):
 
     def _process_udev_event(self, source, condition):
         if condition == GLib.IO_IN:
-            device = self.monitor.poll(timeout=0)
-            if device is not None:
-                self._emit_event(device)
+            # handle all queued events, so a burst of events needs only one wakeup
+            while True:
+                device = self.monitor.poll(timeout=0)
+                if device is None:
+                    break
+                if self.event_filter is None or self.event_filter(device):
+                    self._emit_event(device)
         return True
 
     def _emit_event(self, device):
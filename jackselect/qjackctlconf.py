@@ -1,8 +1,11 @@
 # -*- coding: utf-8 -*-
 """Read JACK presets and their settings from QjackCtl's configuration file."""
 
-import configparser
+import hashlib
 import logging
+import os
+import re
+from collections import namedtuple
 
 
 log = logging.getLogger(__name__)
@@ -69,89 +72,334 @@ NULL_DEFAULT_VALUES = (
     "wait",
 )
 DEFAULT_PRESET = "(default)"
+# Sections of QjackCtl.conf and the keys in them used by jack-select (None for all)
+PRESET_KEYS = {"Settings": None, "Presets": ("DefPreset",)}
+# Key/value delimiter like configparser.ConfigParser.OPTCRE
+OPTION_RX = re.compile(r"(?P<option>.*?)\s*[=:]\s*(?P<value>.*)$")
 
 
-def get_qjackctl_presets(qjackctl_conf, ignore_default=False):
-    config = configparser.ConfigParser()
-    config.optionxform = lambda option: option
-    config.read(qjackctl_conf)
+class PresetChanges(namedtuple("PresetChanges", ("added", "removed", "changed", "default"))):
+    """Names of the presets added, removed and changed by a reload.
+
+    ``default`` is true if the default preset changed.
+
+    """
+
+    __slots__ = ()
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.changed or self.default)
+
+
+def scan_sections(filename, sections=PRESET_KEYS):
+    """Read the settings of selected sections from an INI file in a single pass.
+
+    ``sections`` is a dict mapping the names of the sections to read to a
+    collection of the keys to read from it or None for all keys. Lines of the
+    other sections are skipped without parsing them.
+
+    Returns a tuple of a digest of the raw contents of the selected sections
+    (see ``fingerprint``) and a dict mapping section names to dicts of the
+    keys read and their raw values. Keys and values are parsed like
+    ``configparser.ConfigParser`` with case-sensitive keys and no
+    interpolation does.
+
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    headers = {("[%s]" % name).encode(): name for name in sections}
+    result = {}
+    current = keys = key = None
+
+    with open(filename, "rb") as fp:
+        for line in fp:
+            if line.startswith(b"["):
+                section = headers.get(line.strip())
+                key = None
+
+                if section is not None:
+                    current = result.setdefault(section, {})
+                    keys = sections[section]
+                else:
+                    current = None
+
+            if current is None:
+                continue
+
+            digest.update(line)
+
+            if line.startswith(b"["):
+                continue
+
+            text = line.decode("utf-8", errors="replace")
+            stripped = text.strip()
+
+            if not stripped or stripped[0] in "#;":
+                continue
+            elif text[0].isspace() and key is not None:
+                # continuation line of a multi-line value
+                current[key] += "\n" + stripped
+                continue
+
+            match = OPTION_RX.match(stripped)
+
+            if match:
+                key = match.group("option").rstrip()
+
+                if keys is None or key in keys:
+                    current[key] = match.group("value").strip()
+                else:
+                    key = None
+
+    return digest.hexdigest(), result
+
+
+def convert_value(param, value):
+    """Convert raw value of a QjackCtl setting to a value for the JACK D-BUS parameter(s).
+
+    ``param`` is the (lower-case) QjackCtl settings key without the preset
+    name. Returns a tuple of the component name (``"engine"`` or
+    ``"driver"``) and a list of JACK parameter names and values.
+
+    """
+    param = PARAM_MAPPING.get(param, param)
+
+    if isinstance(param, tuple):
+        component, param = param
+    else:
+        component = "driver"
+
+    if not isinstance(param, (tuple, list)):
+        param = (param,)
+
+    if value == "false":
+        value = False
+    elif value == "true":
+        value = True
+    # Dirty way of stripping string quoting
+    # it's not clear when values get quoted in Qt settings files
+    elif len(value) >= 2 and (
+        (value.startswith("'") and value.endswith("'"))
+        or (value.startswith('"') and value.endswith('"'))
+    ):
+        value = value[1:-1]
+    elif value == "":
+        value = None
+    else:
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            pass
+
+    values = []
+
+    for p in param:
+        if p in VALUE_MAPPING:
+            value = VALUE_MAPPING[p].get(value, value)
+        elif p in ALLOWED_VALUES and value not in ALLOWED_VALUES[p]:
+            value = None
+        elif p in NULL_DEFAULT_VALUES and value == 0:
+            value = None
+
+        values.append((p, value))
+
+    return component, values
+
+
+def group_settings(items):
+    """Group raw (key, value) pairs of the Settings section by preset name.
+
+    Returns a dict mapping preset names to a sorted list of (lower-case
+    param, raw value) pairs.
+
+    """
+    presets = {}
 
-    preset_names = set()
+    for name, value in sorted(items):
+        try:
+            preset_name, param = name.split("\\", 1)
+        except ValueError:
+            # The default (nameless) preset was saved.
+            # It uses settings keys without a preset name prefix.
+            param = name
+            preset_name = DEFAULT_PRESET
+
+        presets.setdefault(preset_name, []).append((param.lower(), value))
+
+    return presets
+
+
+def parse_preset(params):
+    """Return JACK settings of a preset from its list of (param, raw value) pairs.
+
+    The settings are a dict mapping component names to dicts of JACK
+    parameters and their values.
+
+    """
     settings = {}
 
-    if "Settings" in config:
-        for name in sorted(config["Settings"]):
-            try:
-                preset_name, param = name.split("\\", 1)
-            except ValueError:
-                # The default (nameless) preset was saved.
-                # It uses settings keys without a preset name prefix.
-                param = name
-                preset_name = DEFAULT_PRESET
-
-            preset_names.add(preset_name)
-            param = param.lower()
-            value = config.get("Settings", name)
-            param = PARAM_MAPPING.get(param, param)
-
-            if isinstance(param, tuple):
-                component, param = param
-            else:
-                component = "driver"
-
-            if preset_name not in settings:
-                settings[preset_name] = {}
-
-            if component not in settings[preset_name]:
-                settings[preset_name][component] = {}
-
-            if not isinstance(param, (tuple, list)):
-                param = (param,)
-
-            if value == "false":
-                value = False
-            elif value == "true":
-                value = True
-            # Dirty way of stripping string quoting
-            # it's not clear when values get quoted in Qt settings files
-            elif len(value) >= 2 and (
-                (value.startswith("'") and value.endswith("'"))
-                or (value.startswith('"') and value.endswith('"'))
-            ):
-                value = value[1:-1]
-            elif value == "":
-                value = None
+    for param, value in params:
+        component, values = convert_value(param, value)
+        settings.setdefault(component, {}).update(values)
+
+    return settings
+
+
+def fingerprint(data):
+    """Return a hex digest of the given bytes or of the repr of any other object."""
+    if not isinstance(data, bytes):
+        data = repr(data).encode()
+
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class QjackCtlPresets:
+    """JACK presets read from QjackCtl's configuration file, which can be reloaded.
+
+    Only the Settings and Presets sections of the file are read (see
+    ``scan_sections``). Each ``load`` compares a fingerprint of the raw
+    contents of these sections with the previous one and does nothing else,
+    if they are identical, e.g. when QjackCtl saved the file only because its
+    window geometry or other unrelated settings changed. Otherwise the block
+    of settings of each preset is fingerprinted and only presets, whose block
+    changed, are converted to JACK settings again.
+
+    If a ``jackselect.presetcache.PresetCache`` instance is passed as
+    ``cache``, the first ``load`` takes the presets from the cache without
+    reading the file, if its size and modification time match the cached
+    ones, or without converting them, if the fingerprint of the preset
+    sections matches. The cache is updated after each ``load``.
+
+    The attributes ``preset_names``, ``settings`` and ``default_preset`` hold
+    the result of the last load like the return values of
+    ``get_qjackctl_presets``.
+
+    """
+
+    def __init__(self, filename, ignore_default=False, cache=None):
+        self.filename = filename
+        self.ignore_default = ignore_default
+        self.cache = cache
+        self.preset_names = []
+        self.settings = {}
+        self.default_preset = None
+        self.fingerprint = None
+        self.preset_fingerprints = {}
+
+    def load(self):
+        """(Re-)load presets and return a ``PresetChanges`` instance.
+
+        The changes are empty (and false) if the relevant sections of the file
+        did not change. Raises ``OSError`` if the file can not be read.
+
+        """
+        stat = os.stat(self.filename)
+        entry = None
+
+        if self.cache is not None:
+            entry = self.cache.get(self.filename, self.ignore_default)
+
+        if (
+            entry
+            and self.fingerprint is None
+            and (entry["size"], entry["mtime"]) == (stat.st_size, stat.st_mtime_ns)
+        ):
+            log.debug("Using cached presets for '%s'.", self.filename)
+            return self._update(entry)
+
+        digest, sections = scan_sections(self.filename)
+
+        if digest == self.fingerprint:
+            log.debug("Presets in '%s' unchanged.", self.filename)
+            changes = PresetChanges(frozenset(), frozenset(), frozenset(), False)
+        elif entry and self.fingerprint is None and digest == entry["fingerprint"]:
+            log.debug("Presets in '%s' unchanged since cached.", self.filename)
+            changes = self._update(entry)
+        else:
+            changes = self._update(self._parse(digest, sections))
+
+        self._store(stat)
+        return changes
+
+    def _parse(self, digest, sections):
+        presets = group_settings(sections.get("Settings", {}).items())
+
+        if self.ignore_default and DEFAULT_PRESET in presets and len(presets) > 1:
+            del presets[DEFAULT_PRESET]
+
+        fingerprints = {name: fingerprint(params) for name, params in presets.items()}
+        settings = {}
+
+        for name, params in presets.items():
+            if self.preset_fingerprints.get(name) == fingerprints[name]:
+                settings[name] = self.settings[name]
             else:
-                try:
-                    value = int(value)
-                except (TypeError, ValueError):
-                    pass
+                settings[name] = parse_preset(params)
+
+        default_preset = sections.get("Presets", {}).get("DefPreset")
 
-            for p in param:
-                if p in VALUE_MAPPING:
-                    value = VALUE_MAPPING[p].get(value, value)
-                elif p in ALLOWED_VALUES and value not in ALLOWED_VALUES[p]:
-                    value = None
-                elif p in NULL_DEFAULT_VALUES and value == 0:
-                    value = None
+        if default_preset not in presets:
+            default_preset = None
 
-                settings[preset_name][component][p] = value
+        if not default_preset and DEFAULT_PRESET in presets:
+            default_preset = DEFAULT_PRESET
 
-    if ignore_default and DEFAULT_PRESET in settings and len(settings) > 1:
-        del settings[DEFAULT_PRESET]
+        return {
+            "fingerprint": digest,
+            "preset_fingerprints": fingerprints,
+            "preset_names": list(presets),
+            "settings": settings,
+            "default_preset": default_preset,
+        }
 
-        if DEFAULT_PRESET in preset_names:
-            preset_names.remove(DEFAULT_PRESET)
+    def _update(self, state):
+        fingerprints = state["preset_fingerprints"]
+        old = self.preset_fingerprints
+        changes = PresetChanges(
+            frozenset(fingerprints).difference(old),
+            frozenset(old).difference(fingerprints),
+            frozenset(
+                name for name, digest in fingerprints.items() if old.get(name, digest) != digest
+            ),
+            state["default_preset"] != self.default_preset,
+        )
+        self.fingerprint = state["fingerprint"]
+        self.preset_fingerprints = fingerprints
+        self.preset_names = list(state["preset_names"])
+        self.settings = state["settings"]
+        self.default_preset = state["default_preset"]
+        return changes
 
-    default_preset = config.get("Presets", "DefPreset", fallback=None)
+    def _store(self, stat):
+        if self.cache is None:
+            return
 
-    if default_preset not in preset_names:
-        default_preset = None
+        entry = {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime_ns,
+            "fingerprint": self.fingerprint,
+            "preset_fingerprints": self.preset_fingerprints,
+            "preset_names": self.preset_names,
+            "settings": self.settings,
+            "default_preset": self.default_preset,
+        }
+        self.cache.put(self.filename, self.ignore_default, entry)
+
+        try:
+            self.cache.save()
+        except OSError as exc:
+            log.warning("Could not write preset cache '%s': %s", self.cache.filename, exc)
+
+
+def get_qjackctl_presets(qjackctl_conf, ignore_default=False):
+    """Return list of preset names, dict of their JACK settings and the default preset name."""
+    presets = QjackCtlPresets(qjackctl_conf, ignore_default)
 
-    if not default_preset and DEFAULT_PRESET in preset_names:
-        default_preset = DEFAULT_PRESET
+    try:
+        presets.load()
+    except OSError as exc:
+        log.debug("Could not read '%s': %s", qjackctl_conf, exc)
 
-    return list(preset_names), settings, default_preset
+    return presets.preset_names, presets.settings, presets.default_preset
 
 
 def _test():
@@ -0,0 +1,339 @@
+# -*- coding: utf-8 -*-
+"""Record udev sound device events to a file and replay them.
+
+Recordings allow to reproduce and benchmark the handling of hotplug event
+storms by ``AlsaDevMonitor`` without physically plugging hardware.
+
+A recording is a file with one JSON object per line for each event with the
+time in seconds since the start of the recording and the attributes and
+properties of the device::
+
+    {"time": 0.0123, "action": "add", "device_path": "/devices/.../sound/card2",
+     "sys_name": "card2", "subsystem": "sound", "device_type": null,
+     "properties": {...}, "tags": ["systemd"]}
+
+``ReplayMonitor`` feeds recorded events back at real or accelerated speed
+through the same ``MonitorObserver`` used for live events.
+
+Usage::
+
+    python -m jackselect.udevreplay record [-d SECONDS] FILE
+    python -m jackselect.udevreplay replay [-s SPEED] [--tag-filter] FILE
+
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import sys
+from collections import deque
+from time import monotonic
+
+from gi.repository import GLib
+
+from .devmonitor import CARD_TAG, MAX_SETTLE_TIME, SETTLE_TIME, AlsaDevMonitor
+
+
+log = logging.getLogger(__name__)
+
+
+class RecordedDevice:
+    """A udev device event read from a recording.
+
+    Provides the attributes of ``pyudev.Device`` used by jack-select.
+
+    """
+
+    __slots__ = (
+        "time",
+        "action",
+        "device_path",
+        "sys_name",
+        "subsystem",
+        "device_type",
+        "properties",
+        "tags",
+    )
+
+    def __init__(self, time, action, device_path, sys_name, subsystem="sound", **kwargs):
+        self.time = time
+        self.action = action
+        self.device_path = device_path
+        self.sys_name = sys_name
+        self.subsystem = subsystem
+        self.device_type = kwargs.get("device_type")
+        self.properties = dict(kwargs.get("properties") or {})
+        self.tags = frozenset(kwargs.get("tags") or ())
+
+    def __repr__(self):
+        return "RecordedDevice(time={!r}, action={!r}, device_path={!r})".format(
+            self.time, self.action, self.device_path
+        )
+
+    @classmethod
+    def from_device(cls, device, time):
+        """Create a recorded event from a ``pyudev.Device`` received at given time."""
+        return cls(
+            time,
+            device.action,
+            device.device_path,
+            device.sys_name,
+            subsystem=device.subsystem,
+            device_type=device.device_type,
+            properties=dict(device.properties),
+            tags=list(device.tags),
+        )
+
+    def to_dict(self):
+        """Return event as a dict suitable for serialisation to JSON."""
+        event = {name: getattr(self, name) for name in self.__slots__}
+        event["tags"] = sorted(self.tags)
+        return event
+
+
+def load_recording(filename):
+    """Return list of ``RecordedDevice`` events read from recording file."""
+    with open(filename) as fp:
+        return [RecordedDevice(**json.loads(line)) for line in fp if line.strip()]
+
+
+def record(filename, duration=None, subsystem="sound"):
+    """Record udev events of given subsystem to file until duration or Ctrl-C.
+
+    Returns the number of events recorded.
+
+    """
+    from pyudev import Context, Monitor
+
+    monitor = Monitor.from_netlink(Context())
+    monitor.filter_by(subsystem=subsystem)
+    monitor.start()
+    start = monotonic()
+    count = 0
+
+    with open(filename, "w") as fp:
+        try:
+            while True:
+                timeout = None
+
+                if duration is not None:
+                    timeout = duration - (monotonic() - start)
+
+                    if timeout <= 0:
+                        break
+
+                device = monitor.poll(timeout=timeout)
+
+                if device is not None:
+                    event = RecordedDevice.from_device(device, round(monotonic() - start, 6))
+                    log.debug("Recorded event: %s %s", event.action, event.device_path)
+                    fp.write(json.dumps(event.to_dict()) + "\n")
+                    fp.flush()
+                    count += 1
+        except KeyboardInterrupt:
+            pass
+
+    return count
+
+
+class ReplayMonitor:
+    """Event source replaying recorded udev events, compatible with ``pyudev.Monitor``.
+
+    Events are delivered through a pipe, so the monitor can be watched with
+    ``GLib.io_add_watch`` like a netlink monitor. Each event is delivered when
+    its recorded time divided by ``speed`` has passed since ``start`` was
+    called. The filters set with ``filter_by`` and ``filter_by_tag`` are
+    applied like the socket filter of a netlink monitor.
+
+    ``on_done`` is called when all events have been delivered.
+
+    """
+
+    def __init__(self, events, speed=1.0, on_done=None):
+        if not speed > 0:
+            raise ValueError("Replay speed must be positive: {!r}".format(speed))
+
+        self.events = sorted(events, key=lambda event: event.time)
+        self.speed = speed
+        self.on_done = on_done
+        self.delivered = 0
+        self.last_event_time = None
+        self._subsystems = set()
+        self._tags = set()
+        self._queue = deque()
+        self._index = 0
+        self._start = None
+        self._rfd, self._wfd = os.pipe()
+
+    def fileno(self):
+        return self._rfd
+
+    def filter_by(self, subsystem, device_type=None):
+        self._subsystems.add((subsystem, device_type))
+
+    def filter_by_tag(self, tag):
+        self._tags.add(tag)
+
+    def _matches(self, event):
+        if self._subsystems and not any(
+            event.subsystem == subsystem and device_type in (None, event.device_type)
+            for subsystem, device_type in self._subsystems
+        ):
+            return False
+
+        return not self._tags or bool(self._tags & event.tags)
+
+    def start(self):
+        self._start = monotonic()
+        self._schedule()
+
+    def _schedule(self):
+        if self._index >= len(self.events):
+            if self.on_done:
+                self.on_done()
+            return
+
+        delay = self.events[self._index].time / self.speed - (monotonic() - self._start)
+        GLib.timeout_add(max(0, int(delay * 1000)), self._inject)
+
+    def _inject(self):
+        elapsed = monotonic() - self._start
+
+        while self._index < len(self.events):
+            event = self.events[self._index]
+
+            if event.time / self.speed > elapsed:
+                break
+
+            self._index += 1
+
+            if self._matches(event):
+                self._queue.append(event)
+                self.last_event_time = monotonic()
+                os.write(self._wfd, b"\0")
+
+        self._schedule()
+        return False
+
+    def poll(self, timeout=None):
+        if not self._queue:
+            return None
+
+        os.read(self._rfd, 1)
+        self.delivered += 1
+        return self._queue.popleft()
+
+    def close(self):
+        os.close(self._rfd)
+        os.close(self._wfd)
+
+
+def replay(events, speed=1.0, tag_filter=False, settle_time=SETTLE_TIME):
+    """Replay events through an ``AlsaDevMonitor`` and return statistics.
+
+    Returns a dict, which can be serialised as JSON, with the number of events
+    replayed, passed by the monitor filters and delivered to the observer,
+    a list of the card changes reported to the callback (i.e. the refreshes
+    the application would do) and the refresh latency in milliseconds, i.e.
+    the time from the last event before each refresh to the refresh.
+
+    """
+    loop = GLib.MainLoop()
+    refreshes = []
+    latencies = []
+
+    def on_change(changes):
+        latencies.append((monotonic() - monitor.last_event_time) * 1000.0)
+        refreshes.append({str(cardno): action for cardno, action in sorted(changes.items())})
+
+    def on_done():
+        # wait for the last changes to settle before quitting
+        GLib.timeout_add(MAX_SETTLE_TIME + settle_time, loop.quit)
+
+    monitor = ReplayMonitor(events, speed=speed, on_done=on_done)
+    monitor.filter_by(subsystem="sound")
+
+    if tag_filter:
+        monitor.filter_by_tag(CARD_TAG)
+
+    devmonitor = AlsaDevMonitor(on_change, settle_time=settle_time, monitor=monitor)
+    devmonitor.start()
+    loop.run()
+    monitor.close()
+
+    return {
+        "events": len(events),
+        "passed": sum(1 for event in events if monitor._matches(event)),
+        "delivered": monitor.delivered,
+        "refreshes": refreshes,
+        "latency": {
+            "min": round(min(latencies), 3),
+            "mean": round(sum(latencies) / len(latencies), 3),
+            "max": round(max(latencies), 3),
+        }
+        if latencies
+        else None,
+    }
+
+
+def _positive_float(value):
+    try:
+        number = float(value)
+    except ValueError:
+        number = 0.0
+
+    if not (number > 0 and math.isfinite(number)):
+        raise argparse.ArgumentTypeError("must be a positive number: {!r}".format(value))
+
+    return number
+
+
+def main(args=None):
+    ap = argparse.ArgumentParser(
+        prog="python -m jackselect.udevreplay",
+        description="Record udev sound device events or replay them through AlsaDevMonitor.",
+    )
+    ap.add_argument("-v", "--verbose", action="store_true", help="Enable debug logging.")
+    subparsers = ap.add_subparsers(dest="command", required=True)
+    ap_record = subparsers.add_parser("record", help="Record events until Ctrl-C.")
+    ap_record.add_argument(
+        "-d", "--duration", type=float, metavar="SECONDS", help="Stop recording after SECONDS."
+    )
+    ap_record.add_argument("filename", metavar="FILE", help="Recording file to write.")
+    ap_replay = subparsers.add_parser(
+        "replay", help="Replay events and print refresh statistics as JSON."
+    )
+    ap_replay.add_argument(
+        "-s",
+        "--speed",
+        type=_positive_float,
+        default=1.0,
+        help="Replay speed factor (default: %(default)s).",
+    )
+    ap_replay.add_argument(
+        "--tag-filter",
+        action="store_true",
+        help="Filter events by the udev tag of sound cards like the netlink monitor does "
+        "on systems using systemd.",
+    )
+    ap_replay.add_argument("filename", metavar="FILE", help="Recording file to replay.")
+    args = ap.parse_args(args if args is not None else sys.argv[1:])
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format="[%(name)s] %(levelname)s: %(message)s",
+    )
+
+    if args.command == "record":
+        count = record(args.filename, duration=args.duration)
+        print("{} event(s) recorded.".format(count))
+    else:
+        events = load_recording(args.filename)
+        result = replay(events, speed=args.speed, tag_filter=args.tag_filter)
+        print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    sys.exit(main() or 0)
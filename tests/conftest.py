@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+"""Common test set-up.
+
+The tests use the simulated libasound backend (see ``jackselect.alsafake``),
+so they run on machines without sound hardware or alsa-lib.
+
+"""
+
+import os
+
+
+os.environ["JACKSELECT_ALSA_BACKEND"] = "fake"
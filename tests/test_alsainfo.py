@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""Tests for probing ALSA devices with the simulated libasound backend."""
+
+import pytest
+
+from jackselect import alsainfo
+from jackselect.alsafake import FakeLibAsound
+
+
+def make_device(devno, playback=None, capture=None):
+    device = {"devno": devno, "id": "PCM%i" % devno, "name": "PCM %i" % devno}
+
+    if playback is not None:
+        device["playback"] = playback
+
+    if capture is not None:
+        device["capture"] = capture
+
+    return device
+
+
+CARDS = [
+    {
+        "id": "Multi",
+        "devices": [
+            make_device(
+                0,
+                playback={"channels": [1, 2, 6, 8, 10], "rates": [22050, 44100, 96000, 192000]},
+                capture={
+                    "channels": [2, 4, 16],
+                    "rates": [8000, 48000],
+                    "buffer_sizes": [96, 3000],
+                },
+            ),
+            make_device(1, playback={"channels": [2], "rates": [32000]}),
+        ],
+    },
+    {
+        "id": "SRC",
+        "devices": [
+            make_device(
+                0,
+                playback={"channels": [2], "rates": {"min": 44100, "max": 96000, "openmin": True}},
+                capture={"channels": [1, 2], "rates": {"min": 8000, "max": 48000, "openmax": True}},
+            ),
+            make_device(
+                1,
+                playback={"rates": {"min": 4000, "max": 200000}, "buffer_sizes": [16, 1000000]},
+            ),
+        ],
+    },
+]
+
+
+@pytest.fixture
+def backend():
+    old = alsainfo.set_backend(FakeLibAsound(CARDS))
+    yield
+    alsainfo.set_backend(old)
+
+
+def get_caps(cards):
+    return {
+        (card.id, dev.devno, dev.stream): (dev.channels, dev.rates, dev.buffer_sizes)
+        for streamcards in cards
+        for card in streamcards
+        for dev in card.devices
+    }
+
+
+def test_probe_methods_agree(backend):
+    assert alsainfo.compare_probe_methods() == []
+    assert alsainfo.probe_cards(method="range") == alsainfo.probe_cards(method="exhaustive")
+
+
+def test_probe_range(backend):
+    caps = get_caps(alsainfo.probe_cards(method="range"))
+    playback = alsainfo.SndPcmStream.PLAYBACK
+    capture = alsainfo.SndPcmStream.CAPTURE
+
+    assert caps[("Multi", 0, playback)][:2] == ((1, 2, 6, 8, 10), (22050, 44100, 96000, 192000))
+    assert caps[("Multi", 0, capture)] == ((2, 4, 16), (8000, 48000), (128, 256, 512, 1024, 2048))
+    # open interval bounds are not supported
+    assert caps[("SRC", 0, playback)][1] == (48000, 64000, 88200, 96000)
+    assert caps[("SRC", 0, capture)][1] == (8000, 11025, 16000, 22050, 32000, 44100)
+    assert caps[("SRC", 1, playback)][1] == alsainfo.PCM_RATES
+    assert caps[("SRC", 1, playback)][2] == alsainfo.PCM_BUFFER_SIZES
+
+
+def test_enumerate_without_hardware(backend):
+    info = alsainfo.AlsaInfo(deferred=False, lazy=True)
+    assert sorted(info.cards) == [0, 1]
+    assert [card[0].id for card in alsainfo.enumerate_cards()] == ["Multi", "SRC"]
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""Tests for probing ALSA sound cards in background threads."""
+
+import time
+
+import pytest
+
+pytest.importorskip("gi")
+
+from gi.repository import GLib  # noqa: E402
+
+from jackselect import alsainfo  # noqa: E402
+from jackselect.alsafake import FakeLibAsound  # noqa: E402
+from jackselect.alsaprober import AlsaProber  # noqa: E402
+
+
+@pytest.fixture
+def fake():
+    backend = FakeLibAsound.generate(2)
+    old = alsainfo.set_backend(backend)
+    yield backend
+    alsainfo.set_backend(old)
+
+
+def wait_for(condition, timeout=5.0):
+    loop = GLib.MainLoop()
+    deadline = time.monotonic() + timeout
+
+    def check():
+        if condition() or time.monotonic() > deadline:
+            loop.quit()
+            return False
+
+        return True
+
+    GLib.timeout_add(10, check)
+    loop.run()
+    assert condition()
+
+
+def test_busy_card_probed_again(fake):
+    snapshots = []
+    prober = AlsaProber(snapshots.append)
+    fake.set_busy(1)
+
+    try:
+        prober.probe()
+        # enumerated and probed snapshot
+        wait_for(lambda: len(snapshots) == 2)
+        assert snapshots[-1].is_probed(0)
+        assert not snapshots[-1].is_probed(1)
+
+        fake.set_busy(1, busy=False)
+        prober.probe([0])
+        wait_for(lambda: len(snapshots) == 3)
+        assert snapshots[-1].is_probed(1)
+        assert not any(dev.stale for dev in snapshots[-1].cards[1][0].devices)
+    finally:
+        prober.shutdown()
+
+
+def test_no_probe_context_for_isolated_probe(fake, monkeypatch):
+    calls = []
+
+    def probe_func(cardno=None, ctx=None, previous=None):
+        calls.append(ctx)
+        return alsainfo.probe_cards(cardno=cardno, previous=previous)
+
+    monkeypatch.setattr("jackselect.alsaprober.ProbeContext", None)
+    snapshots = []
+    prober = AlsaProber(snapshots.append, probe_func=probe_func)
+
+    try:
+        prober.probe()
+        wait_for(lambda: len(snapshots) == 2)
+    finally:
+        prober.shutdown()
+
+    assert calls == [None, None]
+    assert sorted(snapshots[-1].cards) == [0, 1]
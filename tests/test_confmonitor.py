@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""Tests for watching configuration files for changes."""
+
+import os
+
+import pytest
+
+pytest.importorskip("gi")
+
+from gi.repository import Gio  # noqa: E402
+
+from jackselect import confmonitor  # noqa: E402
+
+
+class FakeFile:
+    def __init__(self, path):
+        self.path = path
+
+    def get_path(self):
+        return self.path
+
+    def monitor_directory(self, flags, cancellable):
+        return FakeMonitor(self.path)
+
+
+class FakeMonitor:
+    def __init__(self, path):
+        self.path = path
+        self.cancelled = False
+
+    def connect(self, signal, handler):
+        self.handler = handler
+
+    def cancel(self):
+        self.cancelled = True
+
+    def emit(self, path, event_type):
+        self.handler(self, FakeFile(path), None, event_type)
+
+
+class FakeFileClass:
+    new_for_path = FakeFile
+
+
+@pytest.fixture
+def fake_gio(monkeypatch):
+    monkeypatch.setattr(confmonitor.Gio, "File", FakeFileClass)
+
+
+def test_watch_parent_of_missing_directory(tmp_path, fake_gio):
+    configdir = tmp_path / "rncbc.org"
+    filename = str(configdir / "QjackCtl.conf")
+    monitor = confmonitor.ConfigMonitor([filename], lambda: None)
+
+    try:
+        assert set(monitor._monitors) == {str(tmp_path)}
+        parent = monitor._monitors[str(tmp_path)]
+
+        # unrelated directories are ignored
+        (tmp_path / "other").mkdir()
+        parent.emit(str(tmp_path / "other"), Gio.FileMonitorEvent.CREATED)
+        assert monitor._monitors == {str(tmp_path): parent}
+
+        configdir.mkdir()
+        parent.emit(str(configdir), Gio.FileMonitorEvent.CREATED)
+        assert set(monitor._monitors) == {str(configdir)}
+        assert parent.cancelled
+
+        configdir.rmdir()
+        monitor._monitors[str(configdir)].emit(str(configdir), Gio.FileMonitorEvent.DELETED)
+        assert set(monitor._monitors) == {str(tmp_path)}
+    finally:
+        monitor.close()
+
+
+def test_watch_nearest_existing_parent(tmp_path, fake_gio):
+    filename = os.path.join(str(tmp_path), "a", "b", "QjackCtl.conf")
+    monitor = confmonitor.ConfigMonitor([filename], lambda: None)
+
+    try:
+        assert set(monitor._monitors) == {str(tmp_path)}
+        (tmp_path / "a" / "b").mkdir(parents=True)
+        monitor._monitors[str(tmp_path)].emit(str(tmp_path / "a"), Gio.FileMonitorEvent.CREATED)
+        assert set(monitor._monitors) == {str(tmp_path / "a" / "b")}
+    finally:
+        monitor.close()
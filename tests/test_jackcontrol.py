@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""Tests for configuring a JACK server via the jackdbus Configure interface."""
+
+import pytest
+
+dbus = pytest.importorskip("dbus")
+
+from jackselect.jackcontrol import JackCfgInterface, compile_preset  # noqa: E402
+
+
+DRIVER_PARAMS = {
+    "alsa": {
+        "device": (False, "hw:0", "hw:0"),
+        "rate": (True, 48000, 44100),
+        "period": (True, 1024, 256),
+        "dither": (False, dbus.Byte(ord("n")), dbus.Byte(ord("n"))),
+    },
+    "dummy": {
+        "rate": (False, 48000, 48000),
+        "period": (False, 1024, 1024),
+    },
+}
+
+
+class FakeConfigure:
+    """Records calls to the methods of the jackdbus Configure interface."""
+
+    def __init__(self, driver="alsa"):
+        self.calls = []
+        self.params = {
+            "engine": {
+                "driver": (True, "dummy", driver),
+                "realtime": (False, True, True),
+                "name": (True, "default", "studio"),
+            },
+            "driver": dict(DRIVER_PARAMS[driver]),
+        }
+
+    def ReadContainer(self, path):
+        self.calls.append(("ReadContainer", path[0]))
+        return (True, list(self.params[path[0]]))
+
+    def GetParameterValue(self, path):
+        self.calls.append(("GetParameterValue",) + tuple(path))
+        return self.params[path[0]][path[1]]
+
+    def SetParameterValue(self, path, value):
+        self.calls.append(("SetParameterValue",) + tuple(path))
+        component, name = path
+        self.params[component][name] = (True, self.params[component][name][1], value)
+
+        if path == ["engine", "driver"]:
+            self.params["driver"] = dict(DRIVER_PARAMS[value])
+
+    def ResetParameterValue(self, path):
+        self.calls.append(("ResetParameterValue",) + tuple(path))
+        component, name = path
+        default = self.params[component][name][1]
+        self.params[component][name] = (False, default, default)
+
+
+def make_interface(fake):
+    cfg = JackCfgInterface.__new__(JackCfgInterface)
+    cfg._if = fake
+    return cfg
+
+
+def changes(fake):
+    return [call for call in fake.calls if call[0] in ("SetParameterValue", "ResetParameterValue")]
+
+
+def test_only_differing_parameters_set():
+    fake = FakeConfigure()
+    plan = compile_preset(
+        {
+            "engine": {"driver": "alsa", "realtime": True, "name": "studio"},
+            "driver": {"device": "hw:USB", "rate": 44100, "period": 128, "dither": b"n"},
+        }
+    )
+
+    assert make_interface(fake).activate_preset(plan) == 2
+    assert changes(fake) == [
+        ("SetParameterValue", "driver", "device"),
+        ("SetParameterValue", "driver", "period"),
+    ]
+    assert fake.params["driver"]["device"][2] == "hw:USB"
+    assert fake.params["driver"]["period"][2] == 128
+
+
+def test_only_set_parameters_reset():
+    fake = FakeConfigure()
+    plan = compile_preset({"engine": {"driver": "alsa"}, "driver": {}})
+
+    assert make_interface(fake).activate_preset(plan) == 3
+    assert changes(fake) == [
+        ("ResetParameterValue", "engine", "name"),
+        ("ResetParameterValue", "driver", "period"),
+        ("ResetParameterValue", "driver", "rate"),
+    ]
+
+
+def test_driver_read_after_engine_driver_changed():
+    fake = FakeConfigure()
+    plan = compile_preset({"engine": {"driver": "dummy"}, "driver": {"rate": 96000}})
+
+    assert make_interface(fake).activate_preset(plan) == 3
+    set_driver = fake.calls.index(("SetParameterValue", "engine", "driver"))
+    read_driver = fake.calls.index(("ReadContainer", "driver"))
+    assert set_driver < read_driver
+    assert fake.calls.count(("ReadContainer", "driver")) == 1
+    # parameters of the new driver are used
+    assert fake.params["driver"] == {"rate": (True, 48000, 96000), "period": (False, 1024, 1024)}
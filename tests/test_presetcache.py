@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""Tests for the on-disk cache of presets read from QjackCtl's configuration file."""
+
+import json
+
+import pytest
+
+pytest.importorskip("xdg")
+
+from jackselect import qjackctlconf  # noqa: E402
+from jackselect.presetcache import PresetCache  # noqa: E402
+from jackselect.qjackctlconf import QjackCtlPresets, get_qjackctl_presets  # noqa: E402
+
+from test_qjackctlconf import make_config  # noqa: E402
+
+
+def test_cached_presets(tmp_path, monkeypatch):
+    filename = make_config(tmp_path / "QjackCtl.conf")
+    cachefile = str(tmp_path / "presets.json")
+    cache = PresetCache(cachefile)
+    QjackCtlPresets(filename, cache=cache).load()
+    expected = get_qjackctl_presets(filename)
+
+    # cached presets are not converted again
+    monkeypatch.setattr(qjackctlconf, "parse_preset", None)
+    presets = QjackCtlPresets(filename, cache=PresetCache(cachefile))
+    changes = presets.load()
+    assert changes.added == set(presets.preset_names)
+    assert (presets.preset_names, presets.settings, presets.default_preset) == expected
+    assert presets.settings["Studio"]["driver"]["dither"] == b"s"
+
+    # reloading an unchanged file does not rewrite the cache
+    cache = PresetCache(cachefile)
+    QjackCtlPresets(filename, cache=cache).load()
+    assert not cache._dirty
+
+
+def test_outdated_cache_ignored(tmp_path):
+    filename = make_config(tmp_path / "QjackCtl.conf")
+    cachefile = str(tmp_path / "presets.json")
+    QjackCtlPresets(filename, cache=PresetCache(cachefile)).load()
+
+    with open(cachefile) as fp:
+        data = json.load(fp)
+
+    data["jack_select_version"] = "0.0"
+
+    with open(cachefile, "w") as fp:
+        json.dump(data, fp)
+
+    cache = PresetCache(cachefile)
+    assert cache.get(filename) is None
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""Tests for reading presets from QjackCtl's configuration file."""
+
+import configparser
+
+import pytest
+
+from jackselect.qjackctlconf import (
+    ALLOWED_VALUES,
+    DEFAULT_PRESET,
+    NULL_DEFAULT_VALUES,
+    PARAM_MAPPING,
+    VALUE_MAPPING,
+    QjackCtlPresets,
+    get_qjackctl_presets,
+)
+
+
+SETTINGS = r"""[Settings]
+Server=jackd
+Driver=alsa
+Interface=hw:0
+Frames=256
+Periods=2
+SampleRate=44100
+Studio\Driver=alsa
+Studio\Interface="hw:USB,0"
+Studio\ServerName='studio'
+Studio\Frames=128
+Studio\Periods=3
+Studio\SampleRate=48000
+Studio\Chan=2
+Studio\Realtime=true
+Studio\Verbose=false
+Studio\ClockSource=h
+Studio\Dither=2
+Studio\SelfConnectMode=1
+Studio\MidiDriver=seq
+Studio\PortMax=0
+Studio\Timeout=500
+; QjackCtl does not write comments, but configparser skips them
+Live\Driver=dummy
+Live\SampleRate=96000
+Live\Frames=1024
+Live\MidiDriver=bogus
+Live\InDevice=
+Live\OutLatency=0
+"""
+
+PRESETS = r"""[Presets]
+DefPreset={default}
+Preset1=Studio
+Preset2=Live
+"""
+
+
+def make_config(path, settings=SETTINGS, default="Studio", filler=2000):
+    """Write a QjackCtl configuration with large unrelated sections around the presets."""
+    geometry = "[Geometry]\n" + "".join(
+        "Window%i\\pos=@Point(%i %i)\n" % (i, i, i) for i in range(filler)
+    )
+    history = "[History]\n" + "".join("ServerCmd%i=jackd -d alsa\n" % i for i in range(filler))
+    path.write_text(
+        "\n".join((geometry, settings, PRESETS.format(default=default), history)),
+        encoding="utf-8",
+    )
+    return str(path)
+
+
+def configparser_presets(filename, ignore_default=False):
+    """Read presets with ``configparser`` like jack-select did before ``scan_sections``."""
+    config = configparser.ConfigParser(interpolation=None)
+    config.optionxform = lambda option: option
+    config.read(filename)
+
+    preset_names = set()
+    settings = {}
+
+    for name in sorted(config["Settings"]) if "Settings" in config else ():
+        try:
+            preset_name, param = name.split("\\", 1)
+        except ValueError:
+            param = name
+            preset_name = DEFAULT_PRESET
+
+        preset_names.add(preset_name)
+        value = config.get("Settings", name)
+        param = PARAM_MAPPING.get(param.lower(), param.lower())
+
+        if isinstance(param, tuple):
+            component, param = param
+        else:
+            component = "driver"
+
+        preset = settings.setdefault(preset_name, {})
+        preset.setdefault(component, {})
+
+        if value == "false":
+            value = False
+        elif value == "true":
+            value = True
+        elif len(value) >= 2 and value[0] == value[-1] and value[0] in "'\"":
+            value = value[1:-1]
+        elif value == "":
+            value = None
+        else:
+            try:
+                value = int(value)
+            except ValueError:
+                pass
+
+        for p in param if isinstance(param, tuple) else (param,):
+            if p in VALUE_MAPPING:
+                value = VALUE_MAPPING[p].get(value, value)
+            elif p in ALLOWED_VALUES and value not in ALLOWED_VALUES[p]:
+                value = None
+            elif p in NULL_DEFAULT_VALUES and value == 0:
+                value = None
+
+            preset[component][p] = value
+
+    if ignore_default and DEFAULT_PRESET in settings and len(settings) > 1:
+        del settings[DEFAULT_PRESET]
+        preset_names.discard(DEFAULT_PRESET)
+
+    default_preset = config.get("Presets", "DefPreset", fallback=None)
+
+    if default_preset not in preset_names:
+        default_preset = None
+
+    if not default_preset and DEFAULT_PRESET in preset_names:
+        default_preset = DEFAULT_PRESET
+
+    return sorted(preset_names), settings, default_preset
+
+
+@pytest.mark.parametrize("ignore_default", (False, True))
+@pytest.mark.parametrize("default", ("Studio", "Live", "Missing", ""))
+def test_same_as_configparser(tmp_path, ignore_default, default):
+    filename = make_config(tmp_path / "QjackCtl.conf", default=default)
+    names, settings, default_preset = get_qjackctl_presets(filename, ignore_default)
+
+    assert (sorted(names), settings, default_preset) == configparser_presets(
+        filename, ignore_default
+    )
+    assert (DEFAULT_PRESET in names) is not ignore_default
+
+
+def test_values(tmp_path):
+    names, settings, default_preset = get_qjackctl_presets(make_config(tmp_path / "Q.conf"))
+
+    assert default_preset == "Studio"
+    assert settings["Studio"]["driver"]["device"] == "hw:USB,0"
+    assert settings["Studio"]["engine"]["name"] == "studio"
+    assert settings["Studio"]["driver"]["dither"] == b"s"
+    assert settings["Studio"]["driver"]["self-connect-mode"] == b"e"
+    assert settings["Studio"]["engine"]["port-max"] is None
+    assert settings["Live"]["driver"]["midi-driver"] is None
+    assert settings["Live"]["driver"]["capture"] is None
+
+
+def test_load_changes(tmp_path):
+    path = tmp_path / "QjackCtl.conf"
+    presets = QjackCtlPresets(make_config(path))
+
+    changes = presets.load()
+    assert changes.added == {DEFAULT_PRESET, "Studio", "Live"}
+    assert not (changes.removed or changes.changed)
+    assert changes.default
+
+    # unrelated sections changed
+    make_config(path, filler=10)
+    changes = presets.load()
+    assert not changes
+    assert not (changes.added or changes.removed or changes.changed or changes.default)
+
+    make_config(path, settings=SETTINGS.replace(r"Studio\Frames=128", r"Studio\Frames=64"))
+    changes = presets.load()
+    assert changes.changed == {"Studio"}
+    assert not (changes.added or changes.removed or changes.default)
+    assert presets.settings["Studio"]["driver"]["period"] == 64
+
+    make_config(path, settings=SETTINGS + "Extra\\Driver=dummy\n", default="Extra")
+    changes = presets.load()
+    assert changes.added == {"Extra"}
+    assert changes.changed == {"Studio"}
+    assert changes.default
+    assert presets.default_preset == "Extra"
+
+    make_config(path, settings=SETTINGS.replace("Live\\", "Other\\"))
+    changes = presets.load()
+    assert changes.added == {"Other"}
+    assert changes.removed == {"Live", "Extra"}
+    assert presets.default_preset == "Studio"
+    assert sorted(presets.preset_names) == sorted(configparser_presets(str(path))[0])